@@ -1,19 +1,35 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Request, request, jsonify, render_template, Response, stream_with_context, g, send_from_directory
 from flask_cors import CORS  # Import CORS
-from functools import wraps
-import io
+from functools import wraps, lru_cache, partial
+from plotly.offline import get_plotlyjs
 import csv
 import pdfplumber
 import re
 import os
+import tempfile
+import hmac
+import hashlib
 import logging
 from flask_caching import Cache
-from dashboard import generate_dashboard, forecast_spending
-from extract import extract_transactions
+from dashboard import forecast_spending, build_widget, generate_dashboard, get_month_snapshots, WIDGETS, PLOTLY_JS_VERSION, PLOTLY_JS_URL
+from dashboard_cache import scoped_cache_key
+from refresher import DashboardRefresher
+from extract import extract_transactions, ParseTimeout
+from model import train_incremental
+from metrics import span, observe, begin_request, end_request, server_timing, render_prometheus
+from profiling import profile_call, PROFILE_DIR
+from indexes import for_ledger
+from recipients import RecipientIndex, SORT_FIELDS
+from recurring import RecurringIndex
+from anomalies import AnomalyIndex
+from budgets import BudgetIndex
+import threading
 import datetime
+import json
+import time
 
 # Import configuration from utils instead of loading directly
-from utils import CONFIG
+from utils import CONFIG, ledger_version, append_transactions
 
 app = Flask(__name__)
 # Enable CORS with more permissive settings
@@ -22,12 +38,76 @@ CORS(app, supports_credentials=True, expose_headers=['X-API-Key'])
 API_KEY = CONFIG.get("API_KEY", "")
 CSV_FILE = CONFIG.get("CSV_FILE", "Dataset/account.csv")
 
-# Cache configuration
+# -----------------------
+# Upload Spooling
+# -----------------------
+# Requests larger than this are refused (413) from their Content-Length, before the body is read
+MAX_CONTENT_LENGTH = CONFIG.get("MAX_CONTENT_LENGTH", 50 * 2 ** 20)
+# Uploaded files past this size are spooled to a temporary file instead of memory
+UPLOAD_SPOOL_BYTES = CONFIG.get("UPLOAD_SPOOL_BYTES", 2 ** 20)
+PDF_MAGIC = b"%PDF-"
+PDF_HEADER_BYTES = 1024  # Readers accept a PDF header anywhere in the first KB
+
+class SpooledRequest(Request):
+    """Request whose file uploads are bounded in memory no matter their size"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, dir=CONFIG.get("UPLOAD_TMP_DIR"))
+
+app.request_class = SpooledRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
+
+# Cache configuration: a filesystem cache shared by all workers on this host.
+# Entries are keyed on the ledger version, so they never need to expire;
+# least recently used entries are evicted past CACHE_THRESHOLD.
 cache = Cache(app, config={
-    'CACHE_TYPE': 'simple',
-    'CACHE_DEFAULT_TIMEOUT': 300  # 5 minutes cache timeout
+    'CACHE_TYPE': 'dashboard_cache.LRUFileSystemCache',
+    'CACHE_DIR': CONFIG.get("CACHE_DIR", os.path.join(os.path.dirname(CSV_FILE), ".cache")),
+    'CACHE_THRESHOLD': CONFIG.get("CACHE_THRESHOLD", 64),
+    'CACHE_DEFAULT_TIMEOUT': CONFIG.get("CACHE_TIMEOUT", 0)
 })
 
+# Each widget is cached separately. The last built widgets are served (marked
+# stale) while a single background rebuild catches up with a changed ledger.
+# The lock file lives outside CACHE_DIR so cache pruning never removes it.
+# The plotly.js version is part of the key: cached charts call into that asset.
+dashboard_refresher = DashboardRefresher(
+    cache,
+    scoped_cache_key("dashboard", "latest", API_KEY, {"plotly_js": PLOTLY_JS_VERSION}),
+    WIDGETS,
+    build_widget,
+    CSV_FILE,
+    lock_path=os.path.join(os.path.dirname(CSV_FILE), ".dashboard.lock")
+)
+
+# Pre-warm on startup and whenever the ledger changes outside of /upload.
+# The watcher is started by the serving process (see start_dashboard_watcher),
+# never as a side effect of importing this module.
+DASHBOARD_REFRESH_INTERVAL = CONFIG.get("DASHBOARD_REFRESH_INTERVAL", 30)
+
+def start_dashboard_watcher():
+    """Starts the dashboard pre-warm watcher in this process (once; later calls are no-ops)"""
+    if DASHBOARD_REFRESH_INTERVAL:
+        dashboard_refresher.watch(DASHBOARD_REFRESH_INTERVAL)
+
+# -----------------------
+# Ledger Indexes
+# -----------------------
+# Summaries kept current at ingest by folding in only the appended rows
+recipient_index = for_ledger(RecipientIndex, CSV_FILE)
+recurring_index = for_ledger(RecurringIndex, CSV_FILE)
+anomaly_index = for_ledger(AnomalyIndex, CSV_FILE)
+budget_index = for_ledger(BudgetIndex, CSV_FILE)
+LEDGER_INDEXES = [recipient_index, recurring_index, anomaly_index, budget_index]
+
+def update_ledger_indexes():
+    """Fold newly appended ledger rows into every index; one failing index doesn't block the others"""
+    for index in LEDGER_INDEXES:
+        try:
+            index.update()
+        except Exception:
+            logger.exception(f"💥 Updating the {index.name} index failed.")
+
 # -----------------------
 # Logging Configuration
 # -----------------------
@@ -55,6 +135,30 @@ def _jinja2_filter_now(fmt):
 def inject_now():
     return {'now': datetime.datetime.now()}
 
+# -----------------------
+# Request Timing
+# -----------------------
+@app.before_request
+def ensure_dashboard_watcher():
+    """WSGI servers import the app without running __main__; start the watcher in the worker that serves"""
+    start_dashboard_watcher()
+
+@app.before_request
+def start_request_timer():
+    g.start_time = time.perf_counter()
+    begin_request()
+
+@app.after_request
+def add_server_timing(response):
+    """Expose where this request spent its time in the Server-Timing header"""
+    spans = end_request()
+    start = g.get("start_time")
+    if start is not None:
+        total = time.perf_counter() - start
+        observe("request", total, endpoint=request.endpoint or "unknown", status=response.status_code)
+        response.headers["Server-Timing"] = server_timing(spans, total)
+    return response
+
 # -----------------------
 # Access Information
 # -----------------------
@@ -73,10 +177,20 @@ def get_ip_address():
 # -----------------------
 # Token-Based Auth
 # -----------------------
-def requires_api_key(f):
+def requires_api_key(f, token_scope=None):
+    """
+    Requires the X-API-Key header. With `token_scope`, a ?token= issued by
+    issue_stream_token for that scope is accepted instead, for EventSource
+    clients that can't set headers; the API key itself never goes in a URL.
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get("X-API-Key")
+        if not token and token_scope and request.args.get("token"):
+            if not valid_stream_token(request.args["token"], token_scope):
+                logger.warning(f"🔐 Invalid or expired {token_scope} token.")
+                return jsonify({"error": "Invalid or expired token"}), 401
+            return f(*args, **kwargs)
         if not token:
             logger.warning("🔐 No API key provided in request.")
             return jsonify({"error": "API key required"}), 401
@@ -90,6 +204,80 @@ def requires_api_key(f):
         return f(*args, **kwargs)
     return decorated
 
+# -----------------------
+# Stream Tokens
+# -----------------------
+# Short-lived, single-purpose tokens signed with the API key: "<expiry>.<hmac>".
+# Without an API key every request is rejected, and so is every token: an empty
+# signing key would let anyone mint one.
+STREAM_TOKEN_TTL = CONFIG.get("STREAM_TOKEN_TTL", 60)
+
+def _token_signature(scope, expires):
+    return hmac.new(API_KEY.encode(), f"{scope}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+def issue_stream_token(scope):
+    """Returns a (token, expiry timestamp) pair valid for STREAM_TOKEN_TTL seconds and only for `scope`"""
+    if not API_KEY:
+        raise ValueError("Stream tokens require an API_KEY")
+    expires = int(time.time()) + STREAM_TOKEN_TTL
+    return f"{expires}.{_token_signature(scope, expires)}", expires
+
+def valid_stream_token(token, scope):
+    if not API_KEY:
+        return False
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _token_signature(scope, int(expires)))
+
+# A separate bearer token for the Prometheus scraper, so the scrape config never holds the API key
+METRICS_TOKEN = CONFIG.get("METRICS_TOKEN", "")
+
+def requires_metrics_token(f):
+    """Accepts "Authorization: Bearer <METRICS_TOKEN>" when one is configured, else the X-API-Key header"""
+    with_api_key = requires_api_key(f)
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if METRICS_TOKEN and scheme.lower() == "bearer" and hmac.compare_digest(token, METRICS_TOKEN):
+            return f(*args, **kwargs)
+        return with_api_key(*args, **kwargs)
+    return decorated
+
+# -----------------------
+# On-demand Profiling
+# -----------------------
+# Off unless the server opts in; a profiled /dashboard refits every forecast
+PROFILING_ENABLED = CONFIG.get("PROFILING_ENABLED", False)
+
+def profiling_requested():
+    return PROFILING_ENABLED and request.args.get("profile") in ("1", "true", "sample")
+
+def profiled(f):
+    """
+    Runs the view under the profiler when called with ?profile=1 (cProfile) or
+    ?profile=sample (sampling, collapsed stacks), and adds the profile report
+    to the JSON response. The profile file is kept under PROFILE_DIR.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not profiling_requested():
+            return f(*args, **kwargs)
+        
+        mode = "sample" if request.args.get("profile") == "sample" else "cprofile"
+        result, report = profile_call(lambda: f(*args, **kwargs), request.endpoint, mode=mode)
+        report["url"] = f"/profiles/{report['file']}"
+        logger.info(f"🧪 Profiled {request.path}: {report['wall_seconds']}s, peak memory {report['peak_memory_bytes'] / 1e6:.1f} MB -> {report['file']}")
+        
+        response = app.make_response(result)
+        body = response.get_json(silent=True)
+        if isinstance(body, dict):
+            body["profile"] = report
+            response.set_data(json.dumps(body))
+        return response
+    return decorated
+
 # -----------------------
 # API Key Check Endpoint
 # -----------------------
@@ -109,11 +297,42 @@ def check_api_key():
         
     return jsonify({"valid": valid})
 
+# -----------------------
+# Background Retraining
+# -----------------------
+retrain_lock = threading.Lock()
+
+def retrain_classifier():
+    """Run one incremental training pass; overlapping uploads share a single run"""
+    if not retrain_lock.acquire(blocking=False):
+        return
+    try:
+        report = train_incremental(CSV_FILE)
+        if report:
+            logger.info(f"🤖 Classifier v{report['version']} trained on {report['new_rows']} rows in {report['train_seconds']}s")
+    except Exception:
+        logger.exception("💥 Incremental classifier training failed.")
+    finally:
+        retrain_lock.release()
+
 # -----------------------
 # Upload Endpoint
 # -----------------------
+def looks_like_pdf(stream):
+    """Check the PDF header in the first bytes of an upload, then rewind it"""
+    head = stream.read(PDF_HEADER_BYTES)
+    stream.seek(0)
+    return PDF_MAGIC in head
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    limit = app.config["MAX_CONTENT_LENGTH"]
+    logger.warning(f"⛔ Upload refused: larger than {limit} bytes.")
+    return jsonify({"error": f"File is larger than {limit / 2 ** 20:g} MB"}), 413
+
 @app.route("/upload", methods=["POST"])
 @requires_api_key
+@profiled
 def upload_pdf():
     file = request.files.get("file")
 
@@ -125,39 +344,60 @@ def upload_pdf():
         logger.warning("⛔ Uploaded file is not a PDF.")
         return jsonify({"error": "File is not a PDF"}), 400
 
+    if not looks_like_pdf(file.stream):
+        logger.warning(f"⛔ Uploaded file has no PDF header: {file.filename}")
+        return jsonify({"error": "File is not a PDF"}), 400
+
     try:
         logger.info(f"📥 Received file: {file.filename}")
-        pdf_bytes = file.read()
-
-        # Extract text from PDF
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            full_text = "\n".join(
-                page.extract_text() for page in pdf.pages if page.extract_text()
-            )
 
+        # Extract text from the spooled upload, one page in memory at a time
+        with span("pdf_extract") as s, pdfplumber.open(file.stream) as pdf:
+            texts = []
+            for page in pdf.pages:
+                text = page.extract_text()
+                if text:
+                    texts.append(text)
+                page.close()
+            full_text = "\n".join(texts)
+            s["rows"] = len(pdf.pages)
 
         # Extract transactions
         unknown_files = []
-        transactions = extract_transactions(full_text, file.filename, unknown_files)
+        with span("extract_transactions") as s:
+            transactions = extract_transactions(full_text, file.filename, unknown_files)
+            s["rows"] = len(transactions)
 
         if not transactions:
             logger.warning(f"⚠️ No transactions extracted from: {file.filename}")
             return jsonify({"error": f"Could not process file: {file.filename}"}), 422
 
         # Append to CSV
-        file_exists = os.path.isfile(CSV_FILE)
-        with open(CSV_FILE, "a", newline="") as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(["Date", "Amount", "Type", "Description", "Bank"])
-            writer.writerows(transactions)
+        with span("csv_append", rows=len(transactions)):
+            append_transactions(CSV_FILE, transactions)
 
         logger.info(f"✅ Saved {len(transactions)} transactions from: {file.filename}")
+
+        # Indexes only read the rows just appended
+        with span("ledger_indexes", rows=len(transactions)):
+            update_ledger_indexes()
+
+        # Start rebuilding right away; until then /dashboard serves the previous result as stale
+        dashboard_refresher.refresh_async()
+
+        # Fold the new rows into the online classifier without blocking the response
+        if CONFIG.get("RETRAIN_ON_UPLOAD", False):
+            threading.Thread(target=retrain_classifier, daemon=True).start()
+
         return jsonify({
             "message": f"Processed and saved {len(transactions)} transactions.",
             "filename": file.filename
         })
 
+    except ParseTimeout as e:
+        logger.warning(f"⏱️ {e}")
+        return jsonify({"error": str(e)}), 422
+
     except Exception as e:
         logger.exception("💥 Unexpected error during PDF processing.")
         return jsonify({"error": str(e)}), 500
@@ -167,26 +407,236 @@ def upload_pdf():
 # -----------------------
 @app.route("/dashboard", methods=["GET"])
 @requires_api_key
-@cache.cached(timeout=300)
+@profiled
 def dashboard_data():
     try:
         # Check if CSV file exists
         if not os.path.isfile(CSV_FILE):
             return jsonify({"error": "No transaction data found"}), 404
-            
-        # Generate dashboard data
-        dashboard = generate_dashboard(CSV_FILE)
-        return jsonify(dashboard)
+        
+        # A profiled request rebuilds everything so the profile shows the real work
+        if profiling_requested():
+            return jsonify({**generate_dashboard(CSV_FILE, fresh=True), "stale": False, "plotly_js": PLOTLY_JS_URL})
+        
+        # Cached dashboard, rebuilt in the background when the ledger changes
+        dashboard, stale = dashboard_refresher.current()
+        return jsonify({**dashboard, "stale": stale, "plotly_js": PLOTLY_JS_URL})
         
     except Exception as e:
         logger.exception("Error generating dashboard data")
         return jsonify({"error": str(e)}), 500
 
+# -----------------------
+# Per-widget Dashboard Endpoints
+# -----------------------
+@app.route("/dashboard/manifest", methods=["GET"])
+@requires_api_key
+def dashboard_manifest():
+    """List the widgets the frontend can fetch in parallel, cheapest first"""
+    return jsonify({
+        "data_version": ledger_version(CSV_FILE),
+        "plotly_js": PLOTLY_JS_URL,
+        "widgets": [{"name": name, "url": f"/dashboard/{name}"} for name in WIDGETS]
+    })
+
+@app.route("/dashboard/months", methods=["GET"])
+@requires_api_key
+def dashboard_months():
+    """Per-month income, expense, savings and category totals; closed months come from snapshots"""
+    try:
+        if not os.path.isfile(CSV_FILE):
+            return jsonify({"error": "No transaction data found"}), 404
+        
+        return jsonify({"months": get_month_snapshots(CSV_FILE).summaries()})
+        
+    except Exception as e:
+        logger.exception("Error generating monthly summaries")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/dashboard/<widget>", methods=["GET"])
+@requires_api_key
+def dashboard_widget(widget):
+    if widget not in WIDGETS:
+        return jsonify({"error": f"Unknown widget: {widget}"}), 404
+    
+    try:
+        if not os.path.isfile(CSV_FILE):
+            return jsonify({"error": "No transaction data found"}), 404
+        
+        data, stale = dashboard_refresher.widget(widget)
+        return jsonify({"widget": widget, "data": data, "stale": stale})
+        
+    except Exception as e:
+        logger.exception(f"Error generating dashboard widget {widget}")
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------
+# Streaming Dashboard Endpoint
+# -----------------------
+@app.route("/dashboard/stream/token", methods=["POST"])
+@requires_api_key
+def dashboard_stream_token():
+    """A short-lived ?token= for /dashboard/stream (EventSource can't send the X-API-Key header)"""
+    token, expires = issue_stream_token("dashboard-stream")
+    return jsonify({"token": token, "expires": expires})
+
+@app.route("/dashboard/stream", methods=["GET"])
+@partial(requires_api_key, token_scope="dashboard-stream")
+def dashboard_stream():
+    """
+    Server-Sent Events stream: an "assets" event with the plotly.js URL, then
+    one "widget" event per dashboard widget, emitted as soon as it is ready
+    (summary stats first, forecasts last), followed by a "done" event.
+    ?widgets=a,b limits the stream to those widgets.
+    """
+    if not os.path.isfile(CSV_FILE):
+        return jsonify({"error": "No transaction data found"}), 404
+    
+    requested = request.args.get("widgets")
+    names = [name for name in WIDGETS if not requested or name in requested.split(",")]
+    
+    def events():
+        # Chart fragments need the shared plotly.js asset; announce it before any widget
+        yield f"event: assets\ndata: {json.dumps({'plotly_js': PLOTLY_JS_URL})}\n\n"
+        for name in names:
+            try:
+                data, stale = dashboard_refresher.widget(name)
+                payload = {"widget": name, "data": data, "stale": stale}
+                yield f"event: widget\ndata: {json.dumps(payload)}\n\n"
+            except Exception as e:
+                logger.exception(f"Error generating dashboard widget {name}")
+                yield f"event: widget-error\ndata: {json.dumps({'widget': name, 'error': str(e)})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Don't let a reverse proxy hold events back
+    })
+
+# -----------------------
+# Shared Chart Assets
+# -----------------------
+@lru_cache(maxsize=1)
+def plotly_js_bundle():
+    return get_plotlyjs().encode("utf-8")
+
+@app.route("/assets/plotly-<version>.min.js", methods=["GET"])
+def plotly_js(version):
+    """
+    The plotly.js bundle every chart fragment calls into. Public like any other
+    library script; the version is in the URL, so browsers may cache it forever.
+    """
+    if version != PLOTLY_JS_VERSION:
+        return jsonify({"error": f"Unknown plotly.js version: {version}"}), 404
+    
+    response = Response(plotly_js_bundle(), mimetype="application/javascript")
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    response.add_etag()
+    return response.make_conditional(request)
+
+# -----------------------
+# Recipients Endpoint
+# -----------------------
+@app.route("/recipients", methods=["GET"])
+@requires_api_key
+def recipient_stats():
+    """Top transfer recipients (?top=10&sort=count|total|last_date), or one recipient with ?name="""
+    sort = request.args.get("sort", "count")
+    if sort not in SORT_FIELDS:
+        return jsonify({"error": f"sort must be one of: {', '.join(SORT_FIELDS)}"}), 400
+    
+    try:
+        name = request.args.get("name")
+        if name:
+            record = recipient_index.lookup(name)
+            if record is None:
+                return jsonify({"error": f"Unknown recipient: {name}"}), 404
+            return jsonify(record)
+        
+        top = request.args.get("top", 10, type=int)
+        return jsonify({"recipients": recipient_index.top(top, by=sort)})
+        
+    except Exception as e:
+        logger.exception("Error reading the recipient index")
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------
+# Recurring Charges Endpoint
+# -----------------------
+@app.route("/recurring", methods=["GET"])
+@requires_api_key
+def recurring_charges():
+    """Detected recurring charges and subscriptions; ?active=1 keeps only those still expected"""
+    try:
+        active_only = request.args.get("active", "0").lower() in ("1", "true", "yes")
+        return jsonify({"recurring": recurring_index.charges(active_only=active_only)})
+        
+    except Exception as e:
+        logger.exception("Error reading the recurring charges index")
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------
+# Anomalies Endpoint
+# -----------------------
+@app.route("/anomalies", methods=["GET"])
+@requires_api_key
+def anomalies():
+    """Unusually large charges, most recent first (?limit=50&since=YYYY-MM-DD); ?stats=1 adds per-category stats"""
+    try:
+        limit = request.args.get("limit", 50, type=int)
+        result = {"anomalies": anomaly_index.flagged(limit=limit, since=request.args.get("since"))}
+        if request.args.get("stats", "0").lower() in ("1", "true", "yes"):
+            result["categories"] = anomaly_index.category_stats()
+        return jsonify(result)
+        
+    except Exception as e:
+        logger.exception("Error reading the anomaly index")
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------
+# Budgets Endpoint
+# -----------------------
+@app.route("/budgets", methods=["GET"])
+@requires_api_key
+def budgets():
+    """Spend, burn rate and projected overspend against the configured BUDGETS (?month=YYYY-MM, default this month)"""
+    month = request.args.get("month")
+    if month and not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", month):
+        return jsonify({"error": "month must be YYYY-MM"}), 400
+    
+    try:
+        return jsonify(budget_index.status(month))
+        
+    except Exception as e:
+        logger.exception("Error reading the budget index")
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------
+# Metrics Endpoint
+# -----------------------
+@app.route("/metrics", methods=["GET"])
+@requires_metrics_token
+def prometheus_metrics():
+    """Prometheus scrape target (set METRICS_TOKEN and use it as the scrape config's bearer token)"""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+# -----------------------
+# Profile Downloads
+# -----------------------
+@app.route("/profiles/<path:filename>", methods=["GET"])
+@requires_api_key
+def download_profile(filename):
+    """Download a stored profile (.pstats for pstats/snakeviz, .collapsed for flamegraphs)"""
+    return send_from_directory(os.path.abspath(PROFILE_DIR), filename, as_attachment=True)
+
 # -----------------------
 # Run the server
 # -----------------------
 if __name__ == "__main__":
     ip_address = get_ip_address()
     logger.info(f"🚀 Starting server on http://{ip_address}:5000")
+    # With the debug reloader, only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_dashboard_watcher()
     app.run(debug=True, host="0.0.0.0")
 
@@ -0,0 +1,91 @@
+import pandas as pd
+
+# Grain of the running aggregate: one row per day and category
+ROLLUP_KEYS = ["Date", "Category"]
+ROLLUP_SUMS = ["Amount_Cents", "Normalized_Cents"]
+
+
+def rollup(df):
+    """
+    Collapses categorized ledger rows to one row per day and category.
+
+    Args:
+        df: Categorized DataFrame with 'Date', 'Category', 'Amount_Cents' and
+            'Normalized_Cents' columns
+
+    Returns:
+        DataFrame with the ROLLUP_KEYS, the summed cents and a 'Count' of rows
+    """
+    keys = [df["Date"].dt.normalize(), df["Category"].astype(str)]
+    grouped = df.groupby(keys, observed=True)
+    out = grouped[ROLLUP_SUMS].sum()
+    out["Count"] = grouped.size()
+    return out.reset_index()
+
+
+def rollup_frame(df):
+    """Adds the float 'Amount' and 'Normalized_Amount' columns charts read to rollup rows"""
+    # Sums are exact in cents; the float columns are derived once at the end
+    df["Amount"] = df["Amount_Cents"] / 100
+    df["Normalized_Amount"] = df["Normalized_Cents"] / 100
+    return df
+
+
+def merge_rollups(frames):
+    """Adds up rollup frames that may share (day, category) keys"""
+    combined = pd.concat(frames, ignore_index=True)
+    return combined.groupby(ROLLUP_KEYS, sort=False)[ROLLUP_SUMS + ["Count"]].sum().reset_index()
+
+
+class LedgerAggregates:
+    """
+    Running aggregates of a ledger that is read one chunk at a time.
+
+    The day x category rollup grows with the length of the history, not with
+    the number of transactions, so category totals, monthly sums,
+    income/expense totals and the calendar matrix can all be derived from it
+    with bounded memory. The most recent rows are also kept for widgets that
+    list individual transactions.
+    """
+
+    def __init__(self, recent_rows=5000):
+        self.recent_rows = recent_rows
+        self.rows = 0
+        self._rollup = None
+        self._recent = None
+
+    def fold(self, chunk):
+        """Adds one categorized chunk to the running aggregates"""
+        if chunk.empty:
+            return self
+        self.rows += len(chunk)
+
+        part = rollup(chunk)
+        if self._rollup is None:
+            self._rollup = part
+        else:
+            self._rollup = merge_rollups([self._rollup, part])
+
+        recent = chunk.nlargest(self.recent_rows, "Date", keep="last")
+        if self._recent is not None:
+            recent = pd.concat([self._recent, recent]).nlargest(self.recent_rows, "Date", keep="last")
+        self._recent = recent
+        return self
+
+    def frame(self):
+        """
+        Returns:
+            The rollup as a ledger-shaped DataFrame sorted by date; summing any
+            amount column over it gives the same totals as the full ledger
+        """
+        if self._rollup is None:
+            df = pd.DataFrame(columns=ROLLUP_KEYS + ROLLUP_SUMS + ["Count"])
+        else:
+            df = self._rollup.sort_values(ROLLUP_KEYS, kind="stable").reset_index(drop=True)
+        return rollup_frame(df)
+
+    def recent(self):
+        """The most recent `recent_rows` transactions, oldest first"""
+        if self._recent is None:
+            return pd.DataFrame()
+        return self._recent.sort_values("Date", kind="stable")
@@ -0,0 +1,209 @@
+import math
+import logging
+
+import numpy as np
+import pandas as pd
+
+from utils import CONFIG, EXCLUDE_CATEGORIES
+from indexes import LedgerIndex
+from recurring import merchant_key
+
+logger = logging.getLogger(__name__)
+
+# A charge this many standard deviations above its category's or merchant's mean is flagged
+ANOMALY_Z_SCORE = CONFIG.get("ANOMALY_Z_SCORE", 3.5)
+# Earlier charges needed before a category or merchant mean is trusted
+ANOMALY_MIN_HISTORY = CONFIG.get("ANOMALY_MIN_HISTORY", 10)
+# Percentile of its category above which a first charge from a new merchant is flagged
+ANOMALY_PERCENTILE = CONFIG.get("ANOMALY_PERCENTILE", 99)
+PERCENTILE_MIN_COUNT = 100
+# Standard deviations are floored at this share of the mean, so a merchant that
+# always charged the same amount isn't flagged for a few cents of difference
+MIN_STD_RATIO = 0.1
+# Flagged transactions kept, most recent last
+ANOMALY_KEEP = CONFIG.get("ANOMALY_KEEP", 500)
+
+# Percentile sketch: log-spaced buckets of cents, each GAMMA times wider than
+# the last, so any quantile is within 1% of the exact value in O(buckets) space
+SKETCH_GAMMA = 1.02
+LOG_GAMMA = math.log(SKETCH_GAMMA)
+
+
+def sketch_buckets(cents):
+    """Sketch bucket of each amount (in cents)"""
+    return np.floor(np.log(np.maximum(cents, 1)) / LOG_GAMMA).astype(int)
+
+
+def sketch_quantile(sketch, q):
+    """
+    Args:
+        sketch: Dict of bucket -> count
+        q: Quantile in [0, 100]
+
+    Returns:
+        Approximate q-th percentile in cents, or None for an empty sketch
+    """
+    buckets = sorted((int(bucket), count) for bucket, count in sketch.items())
+    total = sum(count for _, count in buckets)
+    if not total:
+        return None
+    rank = q / 100 * (total - 1)
+    seen = 0
+    for bucket, count in buckets:
+        seen += count
+        if seen > rank:
+            return SKETCH_GAMMA ** (bucket + 0.5)
+    return SKETCH_GAMMA ** (buckets[-1][0] + 0.5)
+
+
+def running_stats(keys, x, prior):
+    """
+    Mean and standard deviation of the earlier values in each row's group,
+    as a row-by-row Welford update would see them, computed for a whole chunk.
+
+    Each row's in-chunk prefix is summed around its group's chunk mean, so
+    the sums of squares stay as small as the deviations and don't cancel;
+    the stats carried over from earlier chunks (`prior`) are then combined
+    with that prefix using Chan et al.'s parallel update.
+
+    Args:
+        keys: Series of group keys
+        x: Float Series of values, aligned with `keys`
+        prior: Dict of key -> [count, mean, M2] before this chunk
+
+    Returns:
+        Tuple of (count, mean, std) Series, aligned with `x`
+    """
+    groups = x.groupby(keys)
+    center = groups.transform("mean")
+    d = x - center
+    n_b = groups.cumcount().astype(float)
+    sum_b = d.groupby(keys).cumsum() - d
+    squares_b = (d * d).groupby(keys).cumsum() - d * d
+    safe_n_b = n_b.where(n_b > 0, 1.0)
+    mean_b = center + sum_b / safe_n_b
+    m2_b = (squares_b - sum_b ** 2 / safe_n_b).clip(lower=0)
+
+    n_a = keys.map(lambda key: prior[key][0] if key in prior else 0).astype(float)
+    mean_a = keys.map(lambda key: prior[key][1] if key in prior else 0.0).astype(float)
+    m2_a = keys.map(lambda key: prior[key][2] if key in prior else 0.0).astype(float)
+
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    safe_n = n.where(n > 0, 1.0)
+    mean = mean_a + delta * n_b / safe_n
+    m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / safe_n
+    return n, mean, np.sqrt(m2 / safe_n)
+
+
+def fold_stats(keys, x, stats):
+    """Adds a chunk's values to the per-key [count, mean, M2] in `stats` (Chan et al.)"""
+    grouped = x.groupby(keys)
+    chunk = pd.DataFrame({"n": grouped.size(), "mean": grouped.mean(), "m2": grouped.var(ddof=0) * grouped.size()})
+    for key, n_b, mean_b, m2_b in chunk.itertuples():
+        n_a, mean_a, m2_a = stats.get(key, (0, 0.0, 0.0))
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        stats[key] = [int(n), mean_a + delta * n_b / n, m2_a + m2_b + delta ** 2 * n_a * n_b / n]
+
+
+class AnomalyIndex(LedgerIndex):
+    """
+    Flags unusually large charges as they are ingested.
+
+    Keeps a running count, mean and M2 (Welford) per category and per
+    merchant, and a percentile sketch per category. Each new charge is
+    scored against the charges before it, so scoring an upload costs the
+    same whatever the ledger's length. Percentile thresholds are refreshed
+    once per chunk (up to INDEX_CHUNKSIZE rows), not after every row.
+    """
+
+    name = "anomalies"
+
+    def empty(self):
+        return {"categories": {}, "merchants": {}, "sketches": {}, "flagged": []}
+
+    def fold(self, data, chunk):
+        rows = chunk[~chunk["Category"].isin(EXCLUDE_CATEGORIES)]
+        if rows.empty:
+            return
+        x = rows["Amount_Cents"].astype(float)
+        categories = rows["Category"].astype(str)
+        merchants = merchant_key(rows["Description"])
+
+        n_c, mean_c, std_c = running_stats(categories, x, data["categories"])
+        n_m, mean_m, std_m = running_stats(merchants, x, data["merchants"])
+        z_c = ((x - mean_c) / np.maximum(std_c, MIN_STD_RATIO * mean_c)).where(n_c > 0, 0.0)
+        z_m = ((x - mean_m) / np.maximum(std_m, MIN_STD_RATIO * mean_m)).where(n_m > 0, 0.0)
+        category_flag = (n_c >= ANOMALY_MIN_HISTORY) & (z_c > ANOMALY_Z_SCORE)
+        merchant_flag = (n_m >= ANOMALY_MIN_HISTORY) & (z_m > ANOMALY_Z_SCORE)
+
+        thresholds = {
+            category: sketch_quantile(sketch, ANOMALY_PERCENTILE)
+            for category, sketch in data["sketches"].items()
+            if sum(sketch.values()) >= PERCENTILE_MIN_COUNT
+        }
+        threshold = categories.map(thresholds).astype(float)
+        new_merchant_flag = (n_m == 0) & (x > threshold)
+
+        flagged = category_flag | merchant_flag | new_merchant_flag
+        for i in np.flatnonzero(flagged.to_numpy()):
+            reasons = []
+            if category_flag.iat[i]:
+                reasons.append(f"{z_c.iat[i]:.1f} standard deviations above the {categories.iat[i]} average")
+            if merchant_flag.iat[i]:
+                reasons.append(f"{z_m.iat[i]:.1f} standard deviations above this merchant's average")
+            if new_merchant_flag.iat[i]:
+                reasons.append(f"first charge from this merchant, above the {categories.iat[i]} "
+                               f"{ANOMALY_PERCENTILE}th percentile (${threshold.iat[i] / 100:,.2f})")
+            data["flagged"].append({
+                "date": rows["Date"].iat[i].strftime("%Y-%m-%d"),
+                "description": rows["Description"].iat[i],
+                "amount": x.iat[i] / 100,
+                "category": categories.iat[i],
+                "merchant": merchants.iat[i],
+                "score": round(float(max(z_c.iat[i], z_m.iat[i])), 2),
+                "reasons": reasons,
+            })
+        del data["flagged"][:-ANOMALY_KEEP]
+        if flagged.any():
+            logger.warning(f"🚨 Flagged {int(flagged.sum())} unusual transactions.")
+
+        fold_stats(categories, x, data["categories"])
+        fold_stats(merchants, x, data["merchants"])
+        buckets = pd.Series(sketch_buckets(x.to_numpy()), index=x.index).astype(str)
+        for (category, bucket), count in buckets.groupby([categories, buckets]).size().items():
+            sketch = data["sketches"].setdefault(category, {})
+            sketch[bucket] = sketch.get(bucket, 0) + int(count)
+
+    def flagged(self, limit=50, since=None):
+        """
+        Args:
+            limit: Most recent flagged transactions to return
+            since: Only transactions on or after this "YYYY-MM-DD" date
+
+        Returns:
+            List of flagged transactions, most recently ingested first
+        """
+        rows = self.update()["flagged"]
+        if since:
+            rows = [row for row in rows if row["date"] >= since]
+        return rows[::-1][:limit]
+
+    def category_stats(self):
+        """
+        Returns:
+            Dict of category -> count, mean, std and p50/p95/p99 (in dollars)
+            of its charges
+        """
+        data = self.update()
+        stats = {}
+        for category, (n, mean, m2) in data["categories"].items():
+            sketch = data["sketches"].get(category, {})
+            stats[category] = {
+                "count": n,
+                "mean": round(mean / 100, 2),
+                "std": round(math.sqrt(m2 / n) / 100, 2),
+                **{f"p{q}": round(sketch_quantile(sketch, q) / 100, 2) for q in (50, 95, 99)},
+            }
+        return stats
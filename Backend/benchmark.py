@@ -0,0 +1,403 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import statistics
+import subprocess
+import tempfile
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pdfplumber
+
+import utils
+import classifier
+import dashboard
+from utils import CATEGORY_RULES, categorize_frame, read_ledger, clean_ledger, append_transactions
+from dashboard import WIDGETS, INDEX_WIDGETS, prepare_dashboard_frame
+from recurring import RecurringIndex
+from extract import extract_transactions, extract_transactions_pnc, extract_transactions_discover_card
+
+# Merchants the keyword rules don't know, so "Other" and the ML fallback get exercised
+UNKNOWN_MERCHANTS = ["KWIK TRIP", "SHELL OIL", "SPEEDWAY", "PANERA BREAD", "BEST BUY", "HOME DEPOT",
+                     "WALGREENS", "JOANN FABRIC", "PETSMART", "GREAT CLIPS"]
+
+BANKS = ["PNC", "Chase", "Chase Credit Card", "Discover", "American Express", "Apple Card", "Goldman Sachs Savings"]
+TYPES = ["Purchase", "Credit", "Debit", "Payment", "Deposits and Other Additions",
+         "Banking/Debit Card Withdrawals and Purchases", "Online and Electronic Banking Deductions"]
+
+
+# -----------------------
+# Synthetic data
+# -----------------------
+def merchant_pool(rng, size=2000):
+    """Merchant descriptions built from the categorization keywords, with store numbers"""
+    keywords = [keyword for _, keywords in CATEGORY_RULES for keyword in keywords if "{" not in keyword]
+    keywords += UNKNOWN_MERCHANTS
+    chosen = rng.choice(keywords, size=size)
+    numbers = rng.integers(1, 9999, size=size)
+    return np.array([f"{keyword.upper()} #{number}" for keyword, number in zip(chosen, numbers)])
+
+
+def generate_ledger(rows, path, seed=42, months=36):
+    """
+    Writes a synthetic ledger CSV in the same layout /upload appends to.
+
+    Merchants follow a Zipf-like popularity curve, so a few descriptions repeat
+    heavily like in real statements. Amounts are log-normal.
+
+    Args:
+        rows: Number of transactions
+        path: CSV path to write
+        seed: Random seed, so runs are comparable across commits
+        months: Length of the history ending today
+    """
+    rng = np.random.default_rng(seed)
+    merchants = merchant_pool(rng)
+    popularity = 1.0 / np.arange(1, len(merchants) + 1)
+    popularity /= popularity.sum()
+
+    end = pd.Timestamp(datetime.date.today())
+    start = end - pd.DateOffset(months=months)
+    days = (end - start).days
+    dates = start + pd.to_timedelta(rng.integers(0, days + 1, size=rows), unit="D")
+
+    df = pd.DataFrame({
+        "Date": dates.strftime("%Y-%m-%d"),
+        "Amount": np.round(rng.lognormal(mean=3.0, sigma=1.2, size=rows), 2),
+        "Type": rng.choice(TYPES, size=rows),
+        "Description": merchants[rng.choice(len(merchants), size=rows, p=popularity)],
+        "Bank": rng.choice(BANKS, size=rows),
+    })
+    df.sort_values("Date", inplace=True, kind="stable")
+    df.to_csv(path, index=False, float_format="%.2f")
+    return path
+
+
+def generate_statement_text(bank, transactions, seed=42):
+    """
+    Builds statement text in the layout each bank's extractor expects.
+
+    Args:
+        bank: One of the keys of STATEMENT_BANKS
+        transactions: Number of transaction lines
+        seed: Random seed
+
+    Returns:
+        Statement text as pdfplumber would extract it
+    """
+    rng = np.random.default_rng(seed)
+    merchants = merchant_pool(rng, size=200)
+    descs = merchants[rng.integers(0, len(merchants), size=transactions)]
+    amounts = np.round(rng.lognormal(mean=3.0, sigma=1.2, size=transactions), 2)
+    months = rng.integers(1, 13, size=transactions)
+    days = rng.integers(1, 29, size=transactions)
+    short = [f"{m:02d}/{d:02d}" for m, d in zip(months, days)]
+    year2 = [f"{m:02d}/{d:02d}/24" for m, d in zip(months, days)]
+    year4 = [f"{m:02d}/{d:02d}/2024" for m, d in zip(months, days)]
+
+    if bank == "PNC":
+        third = max(transactions // 3, 1)
+        lines = ["PNC Bank Virtual Wallet Statement", "Deposits and Other Additions", "Date Amount Description"]
+        lines += [f"{d} {a:,.2f} {desc}" for d, a, desc in zip(short[:third], amounts[:third], descs[:third])]
+        lines += ["Banking/Debit Card Withdrawals and Purchases", "Date Amount Description"]
+        lines += [f"{d} {a:,.2f} {desc}" for d, a, desc in zip(short[third:2 * third], amounts[third:2 * third], descs[third:2 * third])]
+        lines += ["Online and Electronic Banking Deductions", "Date Amount Description"]
+        lines += [f"{d} {a:,.2f} {desc}" for d, a, desc in zip(short[2 * third:], amounts[2 * third:], descs[2 * third:])]
+        lines += ["Daily Balance Detail"]
+    elif bank == "Chase Credit Card":
+        lines = ["New Balance $1,234.56", "Payment Due Date 05/01/24"]
+        lines += [f"{d} {desc} {a:.2f}" for d, a, desc in zip(short, amounts, descs)]
+    elif bank == "Chase":
+        lines = ["JPMorgan Chase Bank, N.A. Chase.com"]
+        lines += [f"{d} {desc} -{a:,.2f} {a * 10:,.2f}" for d, a, desc in zip(short, amounts, descs)]
+    elif bank == "Discover":
+        lines = ["Discover it Card", "Activity Period: 01/01/24 - 12/31/24"]
+        lines += [f"{t} {t} {desc} $ {a:.2f}" for t, a, desc in zip(year2, amounts, descs)]
+    elif bank == "American Express":
+        lines = ["American Express Delta SkyMiles", "Payments Amount", "01/02/24* MOBILE PAYMENT - THANK YOU -$500.00",
+                 "New Charges"]
+        lines += [f"{t} {desc} ${a:,.2f}" for t, a, desc in zip(year2, amounts, descs)]
+    elif bank == "Apple Card":
+        lines = ["Apple Card is issued by Goldman Sachs Bank USA", "Payments", "Date Description Amount",
+                 "01/02/2024 ACH Deposit Internet transfer -$500.00", "Transactions"]
+        lines += [f"{t} {desc} 2% ${a * 0.02:.2f} ${a:.2f}" for t, a, desc in zip(year4, amounts, descs)]
+    elif bank == "Goldman Sachs Savings":
+        lines = ["Goldman Sachs Bank USA Savings Statement"]
+        lines += [f"{t} Daily Cash Deposit ${a:,.2f}" for t, a in zip(year4, amounts)]
+    else:
+        raise ValueError(f"Unknown bank: {bank}")
+
+    return "\n".join(lines)
+
+
+def generate_pathological_text(bank, lines):
+    """
+    Malformed statement text that made the old DOTALL parsers backtrack:
+    rows that never reach their section's end marker (PNC) or their "$"
+    amount (Discover), interleaved with repeated section titles.
+    """
+    if bank == "PNC":
+        body = ["PNC Bank Virtual Wallet Statement"]
+        for i in range(lines):
+            body.append("Deposits and Other Additions" if i % 50 == 0 else f"01/{i % 28 + 1:02d} {i}.00 WRAPPED ROW {i}")
+        body.insert(2, "Date Amount Description")
+    elif bank == "Discover":
+        body = ["Discover it Card", "Activity Period: 01/01/24 - 12/31/24"]
+        body += [f"01/{i % 28 + 1:02d}/24 01/{i % 28 + 1:02d}/24 ROW WITHOUT AMOUNT {i}" for i in range(lines)]
+    else:
+        raise ValueError(f"No pathological input for: {bank}")
+    return "\n".join(body)
+
+
+PATHOLOGICAL_PARSERS = {"PNC": extract_transactions_pnc, "Discover": extract_transactions_discover_card}
+
+STATEMENT_BANKS = ["PNC", "Chase Credit Card", "Chase", "Discover", "American Express", "Apple Card",
+                   "Goldman Sachs Savings"]
+
+
+def write_statement_pdf(text, path, lines_per_page=60):
+    """Writes text as a minimal multi-page PDF that pdfplumber can read back"""
+    lines = text.splitlines()
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    def escape(line):
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = {1: "<< /Type /Catalog /Pages 2 0 R >>", 3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    page_ids = []
+    for i, page_lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        page_ids.append(page_id)
+        stream = "BT /F1 9 Tf 11 TL 36 800 Td " + " ".join(f"({escape(line)}) Tj T*" for line in page_lines) + " ET"
+        objects[content_id] = f"<< /Length {len(stream.encode('latin-1', 'replace'))} >>\nstream\n{stream}\nendstream"
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {len(page_ids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = out.tell()
+        out.write(f"{obj_id} 0 obj\n{objects[obj_id]}\nendobj\n".encode("latin-1", "replace"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii"))
+    for obj_id in sorted(objects):
+        out.write(f"{offsets[obj_id]:010d} 00000 n \n".encode("ascii"))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+
+    with open(path, "wb") as f:
+        f.write(out.getvalue())
+    return path
+
+
+# -----------------------
+# Timing
+# -----------------------
+def timed(func, repeat):
+    """Runs func `repeat` times; returns (last result, timing summary in seconds)"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return result, {"min": round(min(samples), 6), "median": round(statistics.median(samples), 6)}
+
+
+def reset_caches():
+    """Forget everything a previous stage or run could have cached in this process"""
+    utils._category_cache = None
+    classifier.prediction_cache.clear()
+    dashboard.forecast_cache.clear()
+    dashboard.frame_cache.clear()
+
+
+def bench_pipeline(csv_path, repeat=3, forecasts=True, skip=()):
+    """Times each stage of the dashboard pipeline on one ledger"""
+    stages = {}
+
+    def read():
+        return clean_ledger(read_ledger(csv_path))
+
+    df, stages["read"] = timed(read, repeat)
+
+    def categorize_cold():
+        reset_caches()
+        return categorize_frame(df.copy())
+
+    _, stages["categorize_cold"] = timed(categorize_cold, repeat)
+    categorized, stages["categorize_warm"] = timed(lambda: categorize_frame(df.copy()), repeat)
+
+    prepared, stages["prepare"] = timed(lambda: prepare_dashboard_frame(categorized.copy()), repeat)
+    prepared["Standardized_Amount"] = prepared["Normalized_Amount"]
+
+    def build_recurring_index():
+        # A fresh state file each run, so every run folds the whole ledger
+        with tempfile.TemporaryDirectory() as tmp:
+            return RecurringIndex(csv_path, state_file=os.path.join(tmp, "recurring.json")).update()
+
+    if "recurring_charges" not in skip:
+        _, stages["index_build:recurring"] = timed(build_recurring_index, repeat)
+
+    results = {}
+    for name, widget in WIDGETS.items():
+        is_forecast = "forecast" in name
+        if name in skip or (is_forecast and not forecasts):
+            continue
+
+        def run(widget=widget):
+            dashboard.forecast_cache.clear()
+            return widget(prepared)
+
+        if name in INDEX_WIDGETS:
+            # Index widgets read their index from the ledger path; the first run builds it
+            run = partial(widget, csv_path)
+            stage = f"index:{name}"
+        else:
+            stage = f"forecast:{name}" if is_forecast else ("aggregate" if name == "summary_stats" else f"chart:{name}")
+        results[name], stages[stage] = timed(run, repeat)
+
+    _, stages["serialize"] = timed(lambda: json.dumps(results), repeat)
+    return stages
+
+
+def bench_extractors(transactions, repeat=3):
+    """Times PDF text extraction and each bank parser on a synthetic statement"""
+    stages = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for bank in STATEMENT_BANKS:
+            text = generate_statement_text(bank, transactions)
+            pdf_path = write_statement_pdf(text, os.path.join(tmp, f"{bank}.pdf"))
+
+            def pdf_text():
+                with pdfplumber.open(pdf_path) as pdf:
+                    return "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
+
+            extracted, stages[f"pdf_extract:{bank}"] = timed(pdf_text, repeat)
+            rows, stages[f"parse:{bank}"] = timed(
+                lambda: extract_transactions(extracted, "Statement_20240131.pdf", []), repeat)
+            stages[f"parse:{bank}"]["rows"] = len(rows)
+
+            _, stages[f"append:{bank}"] = timed(
+                lambda: append_transactions(os.path.join(tmp, "ledger.csv"), rows), repeat)
+    return stages
+
+
+def bench_pathological(line_counts, repeat=3):
+    """
+    Times the PNC and Discover parsers on growing malformed statements.
+    Linear parsers keep a flat time per line as the input grows.
+    """
+    stages = {}
+    for bank, parse in PATHOLOGICAL_PARSERS.items():
+        for lines in line_counts:
+            text = generate_pathological_text(bank, lines)
+            _, timing = timed(lambda: parse(text, "Statement_20240131.pdf"), repeat)
+            timing["us_per_line"] = round(timing["median"] / lines * 1e6, 3)
+            stages[f"pathological:{bank}:{lines}"] = timing
+    return stages
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(baseline_path, candidate_path):
+    """Prints the median time ratio of every stage present in both result files"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+
+    print(f"{'stage':<50} {'baseline':>10} {'candidate':>10} {'ratio':>7}")
+    for size, stages in candidate["ledgers"].items():
+        for stage, timing in stages.items():
+            before = baseline["ledgers"].get(size, {}).get(stage)
+            if before:
+                ratio = timing["median"] / before["median"] if before["median"] else float("inf")
+                print(f"{size + ' ' + stage:<50} {before['median']:>10.4f} {timing['median']:>10.4f} {ratio:>6.2f}x")
+    for section in ("extractors", "pathological"):
+        for stage, timing in candidate.get(section, {}).items():
+            before = baseline.get(section, {}).get(stage)
+            if before:
+                ratio = timing["median"] / before["median"] if before["median"] else float("inf")
+                print(f"{stage:<50} {before['median']:>10.4f} {timing['median']:>10.4f} {ratio:>6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ledger pipeline on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000],
+                        help="ledger sizes to generate (e.g. 10000 1000000 5000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage")
+    parser.add_argument("--no-forecasts", action="store_true", help="skip the Prophet forecast stages")
+    parser.add_argument("--skip", nargs="*", default=[], help="widgets to skip (e.g. transaction_table)")
+    parser.add_argument("--statement-rows", type=int, default=500,
+                        help="transactions per synthetic bank statement (0 skips the extractor benchmark)")
+    parser.add_argument("--pathological-lines", type=int, nargs="*", default=[2_000, 8_000, 32_000],
+                        help="sizes of the malformed PNC/Discover statements (none skips that benchmark)")
+    parser.add_argument("--out", help="where to write the JSON results (default benchmarks/<time>_<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "ledgers": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep synthetic merchants out of the real categorization cache
+        utils.CONFIG["CATEGORY_CACHE_FILE"] = os.path.join(tmp, "category_cache.json")
+
+        for rows in args.rows:
+            csv_path = generate_ledger(rows, os.path.join(tmp, f"ledger_{rows}.csv"))
+            print(f"⏱️  Benchmarking {rows:,} rows...")
+            report["ledgers"][str(rows)] = bench_pipeline(
+                csv_path, repeat=args.repeat, forecasts=not args.no_forecasts, skip=set(args.skip))
+
+    if args.statement_rows:
+        print(f"⏱️  Benchmarking extractors on {args.statement_rows:,}-transaction statements...")
+        report["extractors"] = bench_extractors(args.statement_rows, repeat=args.repeat)
+
+    if args.pathological_lines:
+        print("⏱️  Benchmarking parsers on malformed statements...")
+        report["pathological"] = bench_pathological(args.pathological_lines, repeat=args.repeat)
+
+    out = args.out or os.path.join("benchmarks", f"{datetime.datetime.now():%Y%m%d-%H%M%S}_{commit}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for size, stages in report["ledgers"].items():
+        for stage, timing in stages.items():
+            print(f"{size:>9} {stage:<40} {timing['median']:>9.4f}s")
+    for stage, timing in report.get("extractors", {}).items():
+        print(f"{'':>9} {stage:<40} {timing['median']:>9.4f}s")
+    for stage, timing in report.get("pathological", {}).items():
+        print(f"{'':>9} {stage:<40} {timing['median']:>9.4f}s {timing['us_per_line']:>8.2f}µs/line")
+    print(f"✅ Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
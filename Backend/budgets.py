@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import calendar
+import datetime
+import logging
+
+from utils import CONFIG, EXPENSE_CATEGORIES, ledger_state_path, write_json_atomic
+from indexes import LedgerIndex
+
+logger = logging.getLogger(__name__)
+
+# Monthly budget in dollars per expense category, e.g. {"Food & Dining": 400, "Shopping": 150}
+BUDGETS = {category: float(amount) for category, amount in CONFIG.get("BUDGETS", {}).items()
+           if category in EXPENSE_CATEGORIES}
+for category in set(CONFIG.get("BUDGETS", {})) - set(BUDGETS):
+    logger.warning(f"⚠️ Ignoring budget for '{category}', which is not an expense category.")
+
+# Projected share of the budget at which a category is reported "at_risk"
+BUDGET_WARN_RATIO = CONFIG.get("BUDGET_WARN_RATIO", 0.9)
+
+# -----------------------
+# Forecast Totals
+# -----------------------
+# Month totals predicted by the dashboard forecasts are saved so budgets can read
+# them without refitting: one file per ledger and forecast, so workers never
+# overwrite each other's, nor forecasts of another ledger (e.g. the benchmark's)
+def forecast_path(csv_path, name):
+    return ledger_state_path(csv_path, os.path.join("forecasts", re.sub(r"[^a-z0-9]+", "_", name.lower()) + ".json"))
+
+
+def load_forecast(csv_path, name):
+    """Returns {"YYYY-MM": predicted dollars} of the last `name` forecast of the ledger fitted by any worker"""
+    try:
+        with open(forecast_path(csv_path, name), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record_forecast(csv_path, name, forecast):
+    """
+    Saves the monthly totals of a fitted forecast. A failed write is logged,
+    not raised, so it never breaks the forecast widget.
+
+    Args:
+        csv_path: Ledger the forecast was fitted on
+        name: "overall" or a category
+        forecast: Prophet prediction with 'ds' (month start) and 'yhat'
+    """
+    totals = dict(zip(forecast["ds"].dt.strftime("%Y-%m"), forecast["yhat"].round(2).clip(lower=0)))
+    try:
+        write_json_atomic(forecast_path(csv_path, name), totals)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not save the {name} forecast totals: {e}")
+
+
+# -----------------------
+# Month-to-date Spend
+# -----------------------
+class BudgetIndex(LedgerIndex):
+    """
+    Spend per month and expense category: "YYYY-MM" -> category -> cents.
+
+    Folded in at ingest, so a budget check reads one month's counters
+    instead of grouping the whole ledger.
+    """
+
+    name = "budgets"
+
+    def empty(self):
+        return {}
+
+    def fold(self, data, chunk):
+        rows = chunk[chunk["Category"].isin(EXPENSE_CATEGORIES)]
+        if rows.empty:
+            return
+        months = rows["Date"].dt.strftime("%Y-%m")
+        grouped = rows.groupby([months, rows["Category"].astype(str)])["Amount_Cents"].sum()
+        for (month, category), cents in grouped.items():
+            spent = data.setdefault(month, {})
+            spent[category] = spent.get(category, 0) + int(cents)
+
+    def status(self, month=None, today=None):
+        """
+        Budget status of one month.
+
+        The projection extrapolates the month's burn rate so far; where a
+        dashboard forecast has been fitted for the month, its prediction is
+        returned alongside and the larger of the two is used for overspend.
+
+        Args:
+            month: "YYYY-MM" (defaults to the current month)
+            today: Reference date (defaults to today)
+
+        Returns:
+            Dict with the month, days elapsed and in month, a record per
+            budgeted category and the overall total
+        """
+        today = today or datetime.date.today()
+        month = month or today.strftime("%Y-%m")
+        year, number = map(int, month.split("-"))
+        days_in_month = calendar.monthrange(year, number)[1]
+        if month == today.strftime("%Y-%m"):
+            days_elapsed = today.day
+        else:
+            days_elapsed = days_in_month if month < today.strftime("%Y-%m") else 0
+
+        spent = self.update().get(month, {})
+
+        def record(budget, cents, forecast):
+            spent_amount = cents / 100
+            burn_rate = spent_amount / days_elapsed if days_elapsed else 0.0
+            projected = burn_rate * days_in_month
+            expected = max(projected, forecast or 0.0, spent_amount)
+            if spent_amount > budget:
+                status = "over"
+            elif expected >= BUDGET_WARN_RATIO * budget:
+                status = "at_risk"
+            else:
+                status = "ok"
+            return {
+                "budget": budget,
+                "spent": round(spent_amount, 2),
+                "remaining": round(budget - spent_amount, 2),
+                "burn_rate": round(burn_rate, 2),
+                "projected": round(projected, 2),
+                "forecast": forecast,
+                "projected_overspend": round(max(expected - budget, 0.0), 2),
+                "status": status,
+            }
+
+        categories = {
+            category: record(budget, spent.get(category, 0), load_forecast(self.csv_path, category).get(month))
+            for category, budget in BUDGETS.items()
+        }
+        total = record(
+            sum(BUDGETS.values()), sum(spent.get(category, 0) for category in BUDGETS),
+            load_forecast(self.csv_path, "overall").get(month) if set(BUDGETS) == set(EXPENSE_CATEGORIES) else None,
+        )
+        return {
+            "month": month,
+            "days_elapsed": days_elapsed,
+            "days_in_month": days_in_month,
+            "categories": categories,
+            "total": total,
+        }
@@ -0,0 +1,367 @@
+import os
+import re
+import json
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.special import expit, softmax
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import normalize
+
+from utils import clean_text, set_normalized_amounts, CONFIG
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Model artifacts live next to this module, wherever the server is started from
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(MODEL_DIR, "category_classifier_model.pkl")
+VECTORIZER_PATH = os.path.join(MODEL_DIR, "tfidf_vectorizer.pkl")
+ARRAY_MODEL_DIR = os.path.join(MODEL_DIR, "category_classifier")
+
+# Versioned artifacts written by model.py's incremental pipeline
+MODEL_STORE = CONFIG.get("MODEL_STORE", os.path.join(MODEL_DIR, "models"))
+MANIFEST_PATH = os.path.join(MODEL_STORE, "manifest.json")
+
+# Predictions below this probability keep the rule engine's "Other" label
+CONFIDENCE_THRESHOLD = float(CONFIG.get("ML_CONFIDENCE_THRESHOLD", 0.5))
+PREDICTION_CACHE_SIZE = int(CONFIG.get("ML_CACHE_SIZE", 10000))
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping of cleaned description -> category"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def load_manifest():
+    """Reads the model store manifest, or returns an empty one"""
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"latest": None, "rows_trained": 0, "versions": []}
+
+
+# -----------------------
+# Array-backed model format
+# -----------------------
+# A model directory holds meta.json plus plain .npy arrays that are opened with
+# mmap_mode="r", so every worker process shares one page-cached copy and
+# loading never unpickles arbitrary objects:
+#   coef_data/coef_indices/coef_indptr.npy  CSR coefficients, (n_features, n_rows)
+#   intercept.npy                           per-row intercepts
+#   vocab.npy, idf.npy                      sorted TF-IDF vocabulary and its idf weights
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+
+class ArrayVectorizer:
+    """TF-IDF transform over a sorted, memory-mapped vocabulary array"""
+
+    def __init__(self, vocab, idf):
+        self.vocab = vocab
+        self.idf = idf
+        self._token_re = re.compile(TOKEN_PATTERN)
+
+    def transform(self, texts):
+        tokens = []
+        rows = []
+        for i, text in enumerate(texts):
+            found = self._token_re.findall(text.lower())
+            tokens.extend(found)
+            rows.extend([i] * len(found))
+
+        n_features = len(self.vocab)
+        if not tokens or n_features == 0:
+            return sparse.csr_matrix((len(texts), n_features))
+
+        # One binary search over the sorted vocabulary for every token in the batch
+        tokens = np.array(tokens)
+        positions = np.minimum(np.searchsorted(self.vocab, tokens), n_features - 1)
+        known = self.vocab[positions] == tokens
+
+        counts = sparse.csr_matrix(
+            (np.ones(known.sum()), (np.asarray(rows)[known], positions[known])),
+            shape=(len(texts), n_features)
+        )
+        return normalize(counts.multiply(self.idf).tocsr())
+
+
+class ArrayModel:
+    """Linear classifier scoring from memory-mapped CSR coefficients"""
+
+    def __init__(self, coef, intercept, classes, multinomial):
+        self.coef = coef
+        self.intercept = intercept
+        self.classes_ = np.asarray(classes)
+        self.multinomial = multinomial
+
+    def predict_proba(self, X):
+        scores = np.asarray((X @ self.coef).todense()) + self.intercept
+        if self.multinomial:
+            return softmax(scores, axis=1)
+        probabilities = expit(scores)
+        if probabilities.shape[1] == 1:
+            return np.hstack([1 - probabilities, probabilities])
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+
+def export_array_model(model, vectorizer, out_dir):
+    """
+    Writes a fitted linear classifier and its vectorizer in the array-backed format.
+
+    Args:
+        model: Fitted LogisticRegression or SGDClassifier(loss="log_loss")
+        vectorizer: The TfidfVectorizer or HashingVectorizer the model was trained with
+        out_dir: Directory to write the arrays and meta.json to
+    """
+    params = vectorizer.get_params()
+    if isinstance(vectorizer, TfidfVectorizer):
+        if (params["analyzer"], params["ngram_range"], params["token_pattern"], params["tokenizer"],
+                params["preprocessor"], params["sublinear_tf"], params["norm"], params["lowercase"]) != \
+                ("word", (1, 1), TOKEN_PATTERN, None, None, False, "l2", True):
+            raise ValueError("Only default word-level TfidfVectorizer settings can be exported")
+        meta = {"vectorizer": "tfidf"}
+    elif isinstance(vectorizer, HashingVectorizer):
+        meta = {"vectorizer": "hashing", "hashing_params": {
+            "n_features": params["n_features"],
+            "alternate_sign": params["alternate_sign"],
+            "norm": params["norm"],
+        }}
+    else:
+        raise ValueError(f"Unsupported vectorizer: {type(vectorizer).__name__}")
+
+    meta["classes"] = [str(c) for c in model.classes_]
+    meta["multinomial"] = bool(
+        isinstance(model, LogisticRegression)
+        and len(model.classes_) > 2
+        and model.solver != "liblinear"
+        and getattr(model, "multi_class", "auto") != "ovr"
+    )
+
+    os.makedirs(out_dir, exist_ok=True)
+    coef = sparse.csr_matrix(model.coef_.T)
+    np.save(os.path.join(out_dir, "coef_data.npy"), coef.data)
+    np.save(os.path.join(out_dir, "coef_indices.npy"), coef.indices)
+    np.save(os.path.join(out_dir, "coef_indptr.npy"), coef.indptr)
+    np.save(os.path.join(out_dir, "intercept.npy"), np.asarray(model.intercept_, dtype=np.float64))
+    meta["coef_shape"] = list(coef.shape)
+
+    if meta["vectorizer"] == "tfidf":
+        order = sorted(vectorizer.vocabulary_.items())
+        vocab = np.array([term for term, _ in order])
+        idf = vectorizer.idf_[[index for _, index in order]]
+        np.save(os.path.join(out_dir, "vocab.npy"), vocab)
+        np.save(os.path.join(out_dir, "idf.npy"), idf)
+
+    # meta.json is written last so a half-written directory is never loaded
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_array_model(model_dir):
+    """
+    Opens an array-backed model directory with memory-mapped arrays.
+
+    Args:
+        model_dir: Directory written by export_array_model
+
+    Returns:
+        Tuple of (model, vectorizer) exposing predict_proba / transform
+    """
+    with open(os.path.join(model_dir, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+
+    def array(name):
+        return np.load(os.path.join(model_dir, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+
+    coef = sparse.csr_matrix(
+        (array("coef_data"), array("coef_indices"), array("coef_indptr")),
+        shape=tuple(meta["coef_shape"]),
+        copy=False
+    )
+    model = ArrayModel(coef, array("intercept"), meta["classes"], meta["multinomial"])
+
+    if meta["vectorizer"] == "tfidf":
+        vectorizer = ArrayVectorizer(array("vocab"), array("idf"))
+    else:
+        # Hashing needs no fitted state, only its parameters
+        vectorizer = HashingVectorizer(**meta["hashing_params"])
+
+    return model, vectorizer
+
+
+prediction_cache = LRUCache(PREDICTION_CACHE_SIZE)
+
+_model = None
+_vectorizer = None
+_loaded_version = None
+_load_failed = False
+_load_lock = threading.Lock()
+
+
+def load_classifier():
+    """
+    Lazily loads the trained classifier and vectorizer.
+
+    Loads whichever artifact the manifest lists last: an incremental version
+    from the model store, or the full-refit model once model.py has refitted
+    it since. A newly published version is picked up on the next call.
+
+    Returns:
+        Tuple of (model, vectorizer), or (None, None) if the artifacts can't be loaded
+    """
+    global _model, _vectorizer, _loaded_version, _load_failed
+
+    manifest = load_manifest()
+    version = manifest["latest"]
+
+    with _load_lock:
+        if version != _loaded_version:
+            # A new model was published; earlier predictions are stale
+            _model, _load_failed = None, False
+            prediction_cache.clear()
+
+        if _model is None and not _load_failed:
+            try:
+                latest = manifest["versions"][-1] if version is not None else None
+                if latest is not None and latest.get("kind", "incremental") == "incremental":
+                    array_dir = os.path.join(MODEL_STORE, latest["array_artifact"])
+                    _model, _vectorizer = load_array_model(array_dir)
+                    logger.info(f"🤖 Loaded incremental category classifier v{version}")
+                elif os.path.isfile(os.path.join(ARRAY_MODEL_DIR, "meta.json")):
+                    _model, _vectorizer = load_array_model(ARRAY_MODEL_DIR)
+                    logger.info(f"🤖 Loaded category classifier from {ARRAY_MODEL_DIR}")
+                else:
+                    _model = joblib.load(MODEL_PATH)
+                    _vectorizer = joblib.load(VECTORIZER_PATH)
+                    logger.info(f"🤖 Loaded category classifier from {MODEL_DIR}")
+                _loaded_version = version
+            except Exception as e:
+                logger.warning(f"⚠️ Category classifier unavailable, keeping rule-based categories: {e}")
+                _model, _vectorizer = None, None
+                _loaded_version = version
+                _load_failed = True
+
+    return _model, _vectorizer
+
+
+def predict_categories(cleaned_descriptions):
+    """
+    Predicts categories for a batch of cleaned, de-duplicated descriptions.
+
+    Cached descriptions are answered from the LRU cache; the rest go through a
+    single vectorizer.transform + predict_proba call.
+
+    Args:
+        cleaned_descriptions: Iterable of unique cleaned description strings
+
+    Returns:
+        Dict mapping each description to its category ("Other" when the model
+        isn't confident enough or isn't available)
+    """
+    with span("ml_predict") as s:
+        predictions = {}
+        misses = []
+        for desc in cleaned_descriptions:
+            cached = prediction_cache.get(desc)
+            if cached is None:
+                misses.append(desc)
+            else:
+                predictions[desc] = cached
+        s["rows"] = len(misses)
+        s["cache"] = "miss" if misses else "hit"
+
+        if not misses:
+            return predictions
+
+        model, vectorizer = load_classifier()
+        if model is None:
+            predictions.update({desc: "Other" for desc in misses})
+            return predictions
+
+        probabilities = model.predict_proba(vectorizer.transform(misses))
+        best = probabilities.argmax(axis=1)
+        confidence = probabilities[np.arange(len(misses)), best]
+        labels = np.where(confidence >= CONFIDENCE_THRESHOLD, model.classes_[best], "Other")
+
+        for desc, label in zip(misses, labels):
+            label = str(label)
+            prediction_cache.put(desc, label)
+            predictions[desc] = label
+
+        logger.info(f"🤖 Classified {len(misses)} new descriptions ({len(predictions) - len(misses)} cached)")
+        return predictions
+
+
+def refine_other_categories(df):
+    """
+    Re-categorizes rows the keyword rules labelled "Other" using the ML classifier.
+
+    Only the "Other" rows are considered, and each distinct cleaned description
+    is predicted once. The normalized amounts are re-derived for rows that change category.
+
+    Args:
+        df: DataFrame with 'Description', 'Amount_Cents', 'Category' and the normalized amount columns
+
+    Returns:
+        The same DataFrame, updated in place
+    """
+    other_mask = df["Category"] == "Other"
+    if not other_mask.any():
+        return df
+
+    descriptions = df.loc[other_mask, "Description"].astype(str)
+    unique_descriptions = pd.unique(descriptions)
+    cleaned = {desc: clean_text(desc) for desc in unique_descriptions}
+    predictions = predict_categories(set(cleaned.values()))
+
+    new_categories = descriptions.map(cleaned).map(predictions)
+    changed = new_categories[new_categories != "Other"]
+    if changed.empty:
+        return df
+
+    df.loc[changed.index, "Category"] = changed
+    set_normalized_amounts(df, changed.index)
+
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the pickled classifier to the array-backed format")
+    parser.add_argument("--out", default=ARRAY_MODEL_DIR, help="directory to write the arrays to")
+    args = parser.parse_args()
+
+    export_array_model(joblib.load(MODEL_PATH), joblib.load(VECTORIZER_PATH), args.out)
+    print(f"Exported {MODEL_PATH} to {args.out}")
@@ -1,25 +1,36 @@
 import pandas as pd
 import plotly.express as px
-import joblib
 from prophet import Prophet
 import plotly.graph_objects as go
 import plotly.figure_factory as ff
+from plotly.offline import get_plotlyjs_version
 import numpy as np
 import calendar
 import datetime
 import json
+import logging
 import sys
 import os
+import hashlib
 import threading
 import time
-from functools import lru_cache
+from functools import lru_cache, partial
 
 # Import functions from utils instead of sum.py
-from utils import categorize, normalize_transaction, clean_text, EXCLUDE_CATEGORIES, load_data, CONFIG
+from utils import (
+    categorize, normalize_transaction, categorize_frame, clean_text, clean_ledger, load_data, read_ledger, iter_ledger,
+    ledger_version, state_path, write_json_atomic, CONFIG, RULES_FINGERPRINT, EXCLUDE_CATEGORIES, INCOME_CATEGORIES,
+    ESSENTIAL_CATEGORIES
+)
+from classifier import load_manifest
+from metrics import span, observe
+from aggregates import LedgerAggregates
+from snapshots import MonthSnapshots
+from indexes import for_ledger
+from recurring import RecurringIndex
+from budgets import record_forecast
 
-# Load model and vectorizer for backward compatibility
-model = joblib.load("Backend\category_classifier_model.pkl")
-vectorizer = joblib.load("Backend\\tfidf_vectorizer.pkl")
+logger = logging.getLogger(__name__)
 
 # Cache for Prophet models
 forecast_cache = {}
@@ -27,10 +38,15 @@ forecast_lock = threading.Lock()
 FORECAST_EXPIRY = 3600  # Cache forecasts for 1 hour
 
 # Function to get or create a cached forecast
-def get_cached_forecast(cache_key, data_func, *args, **kwargs):
+def get_cached_forecast(cache_key, data_func, *args, use_cache=True, **kwargs):
+    """With use_cache=False the forecast is refitted and the shared cache is neither read nor written"""
     global forecast_cache
     current_time = time.time()
     
+    if not use_cache:
+        with span("forecast", cache="bypass"):
+            return data_func(*args, **kwargs)
+    
     with forecast_lock:
         # Remove expired forecasts
         expired_keys = [k for k, v in forecast_cache.items() if current_time - v.get('timestamp', 0) > FORECAST_EXPIRY]
@@ -39,10 +55,12 @@ def get_cached_forecast(cache_key, data_func, *args, **kwargs):
         
         # Check if forecast exists in cache
         if cache_key in forecast_cache:
+            observe("forecast", 0.0, cache="hit")
             return forecast_cache[cache_key]['forecast']
     
     # Create new forecast if not in cache
-    forecast_data = data_func(*args, **kwargs)
+    with span("forecast", cache="miss"):
+        forecast_data = data_func(*args, **kwargs)
     
     with forecast_lock:
         forecast_cache[cache_key] = {
@@ -53,27 +71,69 @@ def get_cached_forecast(cache_key, data_func, *args, **kwargs):
     return forecast_data
 
 
-def forecast_spending(df, months_ahead=3):
-    """Forecast overall spending with caching support"""
+# Charts reference one shared, versioned plotly.js asset instead of each
+# inlining the multi-megabyte bundle; Flask.py serves it at PLOTLY_JS_URL
+PLOTLY_JS_VERSION = get_plotlyjs_version()
+PLOTLY_JS_URL = f"/assets/plotly-{PLOTLY_JS_VERSION}.min.js"
+
+def render_figure(fig):
+    """
+    Serialize a chart to the HTML fragment every widget returns.
+    
+    The fragment only holds the figure data and a Plotly.newPlot call; the
+    page must load PLOTLY_JS_URL first.
+    """
+    with span("to_html"):
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+
+
+def prepare_dashboard_frame(df):
+    """
+    Precompute the columns every dashboard widget reads so no widget has to
+    re-scan the category strings or mutate the shared frame.
+    
+    Args:
+        df: DataFrame with 'Date' and 'Category' columns
+        
+    Returns:
+        The same DataFrame with a categorical 'Category'/'Predicted Category',
+        a 'Month' timestamp column and boolean mask columns
+        ('Is_Income', 'Is_Expense', 'Is_Essential', 'Is_Excluded')
+    """
+    df["Category"] = df["Category"].astype("category")
+    df["Predicted Category"] = df["Category"]
+    df["Month"] = df["Date"].dt.to_period("M").dt.to_timestamp()
+    
+    # isin on a Categorical only compares the categories, not every row
+    df["Is_Income"] = df["Category"].isin(INCOME_CATEGORIES)
+    df["Is_Excluded"] = df["Category"].isin(EXCLUDE_CATEGORIES)
+    df["Is_Expense"] = ~df["Is_Excluded"]
+    df["Is_Essential"] = df["Category"].isin(ESSENTIAL_CATEGORIES)
+    
+    return df
+
+
+def forecast_spending(df, months_ahead=3, use_cache=True, csv_path=None):
+    """Forecast overall spending with caching support; the monthly totals are recorded for csv_path's budgets"""
     # Create a cache key based on the dataframe hash and months ahead
     cache_key = f"overall_forecast_{hash(str(df.shape))}_{months_ahead}"
     
     # Define the actual forecast function
     def _create_forecast():
-        df["Month"] = df["Date"].dt.to_period("M").dt.to_timestamp()
-        
-        # Use the constant from utils
-        expense_df = df[~df["Category"].isin(EXCLUDE_CATEGORIES)]
+        expense_df = df[df["Is_Expense"]]
         
         # Use Normalized_Amount and take absolute value for forecast
         monthly_df = expense_df.groupby("Month")["Normalized_Amount"].sum().abs().reset_index()
         monthly_df.columns = ["ds", "y"]
         
         model = Prophet()
-        model.fit(monthly_df)
+        with span("prophet_fit", rows=len(monthly_df)):
+            model.fit(monthly_df)
         
         future = model.make_future_dataframe(periods=months_ahead, freq="MS")
         forecast = model.predict(future)
+        if csv_path:
+            record_forecast(csv_path, "overall", forecast)
         
         # Plotly interactive forecast chart
         fig = go.Figure()
@@ -121,19 +181,17 @@ def forecast_spending(df, months_ahead=3):
             hovermode="x unified"
         )
         
-        return fig.to_html(full_html=False)
+        return render_figure(fig)
     
     # Get or create the forecast using our caching system
-    return get_cached_forecast(cache_key, _create_forecast)
+    return get_cached_forecast(cache_key, _create_forecast, use_cache=use_cache)
 
 
 def income_vs_expenses(df):
     """Compare income and expenses over time"""
-    df["Month"] = df["Date"].dt.to_period("M").dt.to_timestamp()
-    
     # Group by month and category type
-    income_df = df[df["Predicted Category"].isin(["Income", "Papa Transfer"])]
-    expense_df = df[~df["Predicted Category"].isin(["Income", "Papa Transfer"])]
+    income_df = df[df["Is_Income"]]
+    expense_df = df[~df["Is_Income"]]
     
     income_monthly = income_df.groupby("Month")["Amount"].sum().reset_index()
     income_monthly["Type"] = "Income"
@@ -187,17 +245,14 @@ def income_vs_expenses(df):
         hovermode="x unified"
     )
     
-    return fig.to_html(full_html=False)
+    return render_figure(fig)
 
 
 def essential_vs_discretionary(df):
     """Create a gauge showing the ratio of essential vs discretionary spending"""
-    # Define essential and discretionary categories
-    essential = ["Groceries", "Rent", "Utilities", "Transport", "Tuition", "Pharmacy"]
-    
     # Filter and calculate
-    expense_df = df[~df["Predicted Category"].isin(["Income", "Papa Transfer"])]
-    essential_spending = expense_df[expense_df["Predicted Category"].isin(essential)]["Amount"].sum()
+    expense_df = df[~df["Is_Income"]]
+    essential_spending = expense_df[expense_df["Is_Essential"]]["Amount"].sum()
     total_spending = expense_df["Amount"].sum()
     essential_ratio = essential_spending / total_spending * 100
     
@@ -228,18 +283,16 @@ def essential_vs_discretionary(df):
         height=300
     )
     
-    return fig.to_html(full_html=False)
+    return render_figure(fig)
 
 
 def dining_vs_groceries(df):
     """Compare spending on groceries vs dining out"""
-    df["Month"] = df["Date"].dt.to_period("M").dt.to_timestamp()
-    
     # Filter for relevant categories
     food_df = df[df["Predicted Category"].isin(["Groceries", "Food & Dining"])]
     
     # Group by month and category
-    monthly_food = food_df.groupby(["Month", "Predicted Category"])["Amount"].sum().reset_index()
+    monthly_food = food_df.groupby(["Month", "Predicted Category"], observed=True)["Amount"].sum().reset_index()
     
     # Create figure
     fig = px.line(
@@ -257,15 +310,14 @@ def dining_vs_groceries(df):
         hovermode="x unified"
     )
     
-    return fig.to_html(full_html=False)
+    return render_figure(fig)
 
 
 def spending_calendar(df):
     """Create a calendar heatmap of daily spending"""
     # Create a copy of data with just the date and amount
     current_year = datetime.datetime.now().year
-    calendar_df = df[~df["Predicted Category"].isin(["Income", "Papa Transfer"])].copy()
-    calendar_df = calendar_df[calendar_df["Date"].dt.year == current_year]
+    calendar_df = df[~df["Is_Income"] & (df["Date"].dt.year == current_year)]
     
     # Group by date
     daily_spend = calendar_df.groupby(calendar_df["Date"].dt.date)["Amount"].sum().reset_index()
@@ -308,13 +360,13 @@ def spending_calendar(df):
         height=500
     )
     
-    return fig.to_html(full_html=False)
+    return render_figure(fig)
 
 
 def top_spending_categories(df):
     """Show the top 3 spending categories with details"""
-    expense_df = df[~df["Predicted Category"].isin(["Income", "Papa Transfer"])]
-    category_totals = expense_df.groupby("Predicted Category")["Amount"].sum().reset_index()
+    expense_df = df[~df["Is_Income"]]
+    category_totals = expense_df.groupby("Predicted Category", observed=True)["Amount"].sum().reset_index()
     category_totals = category_totals.sort_values("Amount", ascending=False).head(3)
     
     fig = px.bar(
@@ -335,17 +387,16 @@ def top_spending_categories(df):
         height=400
     )
     
-    return fig.to_html(full_html=False)
+    return render_figure(fig)
 
 
 def category_growth(df):
     """Show month-over-month growth for each category"""
     # Prepare data
-    df["Month"] = df["Date"].dt.to_period("M").dt.to_timestamp()
-    expense_df = df[~df["Predicted Category"].isin(["Income", "Papa Transfer"])]
+    expense_df = df[~df["Is_Income"]]
     
     # Group by month and category
-    monthly_cat = expense_df.groupby(["Month", "Predicted Category"])["Amount"].sum().reset_index()
+    monthly_cat = expense_df.groupby(["Month", "Predicted Category"], observed=True)["Amount"].sum().reset_index()
     
     # Calculate growth rates
     growth_data = []
@@ -390,18 +441,18 @@ def category_growth(df):
         height=250
     )
     
-    return fig.to_html(full_html=False)
+    return render_figure(fig)
 
 
 def sankey_income_allocation(df):
     """Create a Sankey diagram showing flow from income to spending categories"""
     # Filter data
-    income_categories = ["Income", "Papa Transfer"]
+    income_categories = INCOME_CATEGORIES
     expense_categories = [cat for cat in df["Predicted Category"].unique() if cat not in income_categories]
     
     # Calculate total income and expenses by category
-    income_total = df[df["Predicted Category"].isin(income_categories)]["Amount"].sum()
-    expenses_by_cat = df[df["Predicted Category"].isin(expense_categories)].groupby("Predicted Category")["Amount"].sum().reset_index()
+    income_total = df[df["Is_Income"]]["Amount"].sum()
+    expenses_by_cat = df[~df["Is_Income"]].groupby("Predicted Category", observed=True)["Amount"].sum().reset_index()
     
     # Create Sankey data
     labels = income_categories + expense_categories
@@ -440,30 +491,34 @@ def sankey_income_allocation(df):
         height=500
     )
     
-    return fig.to_html(full_html=False)
+    return render_figure(fig)
 
 
-def category_forecast(df, category, months_ahead=3):
-    """Forecast spending for a specific category with caching"""
+def category_forecast(df, category, months_ahead=3, use_cache=True, csv_path=None):
+    """Forecast spending for a specific category with caching; the monthly totals are recorded for csv_path's budgets"""
     # Create a cache key based on category, dataframe shape and months ahead
     cache_key = f"{category}_forecast_{hash(str(df.shape))}_{months_ahead}"
     
     # Define the actual forecast function
     def _create_forecast():
-        df["Month"] = df["Date"].dt.to_period("M").dt.to_timestamp()
         cat_df = df[df["Predicted Category"] == category]
+        # Rollup frames hold one row per day, standing for 'Count' transactions
+        transactions = cat_df["Count"].sum() if "Count" in cat_df else len(cat_df)
         
-        if len(cat_df) < 3:  # Need minimum data for forecasting
+        if transactions < 3:  # Need minimum data for forecasting
             return f"<p>Insufficient data for {category} forecast.</p>"
         
         monthly_df = cat_df.groupby("Month")["Amount"].sum().reset_index()
         monthly_df.columns = ["ds", "y"]
         
         model = Prophet()
-        model.fit(monthly_df)
+        with span("prophet_fit", rows=len(monthly_df)):
+            model.fit(monthly_df)
         
         future = model.make_future_dataframe(periods=months_ahead, freq="MS")
         forecast = model.predict(future)
+        if csv_path:
+            record_forecast(csv_path, category, forecast)
         
         fig = go.Figure()
         
@@ -510,10 +565,10 @@ def category_forecast(df, category, months_ahead=3):
             hovermode="x unified"
         )
         
-        return fig.to_html(full_html=False)
+        return render_figure(fig)
     
     # Get or create the forecast using our caching system
-    return get_cached_forecast(cache_key, _create_forecast)
+    return get_cached_forecast(cache_key, _create_forecast, use_cache=use_cache)
 
 def transaction_table(df):
     """
@@ -697,7 +752,7 @@ def transaction_table(df):
             <h3 class="card-title">Transaction Explorer</h3>
             {filter_html}
             <div id="{table_id}">
-                {fig.to_html(full_html=False)}
+                {render_figure(fig)}
             </div>
             {js_code}
         </div>
@@ -706,101 +761,332 @@ def transaction_table(df):
     
     return complete_html
 
-def generate_dashboard(csv_path):
-    # Try to load config like in sum.py
+# -----------------------
+# Enriched Ledger Cache
+# -----------------------
+# The prepared ledger is also kept on disk, so worker restarts and the sum.py
+# reports reuse it instead of categorizing every row again
+ENRICHED_LEDGER_CACHE = CONFIG.get("ENRICHED_LEDGER_CACHE", True)
+
+def enriched_cache_paths(csv_path):
+    """Paths of the pickled prepared ledger and the JSON key it was built for"""
+    name = hashlib.sha1(os.path.abspath(csv_path).encode("utf-8")).hexdigest()[:12]
+    base = state_path(f"enriched_ledger.{name}")
+    return f"{base}.pkl", f"{base}.json"
+
+def enriched_cache_key(csv_path):
+    """Everything the prepared ledger depends on: the ledger, the rules and the classifier version"""
+    return {"ledger": ledger_version(csv_path), "rules": RULES_FINGERPRINT, "model": load_manifest()["latest"]}
+
+def read_enriched_cache(csv_path, key):
+    """The cached prepared ledger if it was built for `key`, else None"""
+    frame_path, key_path = enriched_cache_paths(csv_path)
     try:
-        with open("creds.json") as creds:
-            config = json.load(creds)
-    except:
-        config = {}  # Empty config if file not found
-    
-    # Load data
-    df = pd.read_csv(csv_path, encoding="ISO-8859-1")
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    df.dropna(subset=["Date", "Description", "Amount"], inplace=True)
+        with open(key_path, encoding="utf-8") as f:
+            if json.load(f) != key:
+                return None
+        return pd.read_pickle(frame_path)
+    except (OSError, ValueError, EOFError):
+        return None
 
-    # Ensure all amounts are positive initially (just like in sum.py)
-    df["Amount"] = df["Amount"].abs()
+def write_enriched_cache(csv_path, key, df):
+    """Stores the prepared ledger, then the key it is valid for"""
+    frame_path, key_path = enriched_cache_paths(csv_path)
+    os.makedirs(os.path.dirname(frame_path), exist_ok=True)
+    tmp_path = f"{frame_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, frame_path)
+        write_json_atomic(key_path, key)
+    except OSError:
+        logger.warning("⚠️ Could not write the enriched ledger cache.", exc_info=True)
 
-    # Use the categorization and normalization from sum.py
-    result = df.apply(normalize_transaction, axis=1)
-    df["Category"] = result["Category"]
-    df["Normalized_Amount"] = result["Normalized_Amount"]
+def load_dashboard_frame(csv_path):
+    """Load the ledger and prepare the columns shared by every widget"""
+    # Computed before reading, so rows appended meanwhile make the cached copy stale
+    key = enriched_cache_key(csv_path) if ENRICHED_LEDGER_CACHE else None
+    if key is not None:
+        with span("enriched_cache") as s:
+            df = read_enriched_cache(csv_path, key)
+            s["cache"] = "miss" if df is None else "hit"
+        if df is not None:
+            return df
+    
+    with span("csv_load") as s:
+        df = read_ledger(csv_path)
+        
+        # Exact, positive amounts (just like in sum.py)
+        clean_ledger(df)
+        s["rows"] = len(df)
+
+    # Rule-based categorization and normalization, with ML fallback for "Other"
+    categorize_frame(df)
     
-    # For backward compatibility, set Predicted Category to be the same as Category
-    df["Predicted Category"] = df["Category"]
+    # Categorical category, shared masks and Month column, computed once for every widget.
+    # "Predicted Category" stays as an alias of Category for backward compatibility.
+    prepare_dashboard_frame(df)
     df["Standardized_Amount"] = df["Normalized_Amount"]  # For backward compatibility
     
-    df["Month"] = df["Date"].dt.to_period("M").astype(str)
+    if key is not None:
+        write_enriched_cache(csv_path, key, df)
+    return df
+
+
+# Ledgers at least this large (in bytes, 0 to disable) are streamed in chunks
+# into a day x category rollup instead of being loaded row by row; only used
+# when MONTH_SNAPSHOTS is off
+STREAMING_LEDGER_BYTES = CONFIG.get("STREAMING_LEDGER_BYTES", 200 * 2 ** 20)
+LEDGER_CHUNKSIZE = CONFIG.get("LEDGER_CHUNKSIZE", 200_000)
+STREAMING_TABLE_ROWS = CONFIG.get("STREAMING_TABLE_ROWS", 5000)
+
+# Widgets that list individual transactions instead of summing them
+ROW_WIDGETS = {"transaction_table"}
+
+# Keep closed months as stored snapshots so a build only reads newly appended rows
+MONTH_SNAPSHOTS = CONFIG.get("MONTH_SNAPSHOTS", True)
+
+def get_month_snapshots(csv_path):
+    """The MonthSnapshots for a ledger, shared by every build in this worker"""
+    return for_ledger(MonthSnapshots, csv_path)
+
+def prepare_rollup_frames(frames):
+    """Prepares (rollup frame, recent transactions) for the widgets"""
+    for df in frames:
+        prepare_dashboard_frame(df)
+        df["Standardized_Amount"] = df["Normalized_Amount"]
+    return frames
+
+def load_snapshot_frames(csv_path):
+    """
+    Closed months come from their stored snapshots and only the open months
+    are categorized, so a build costs what the open months' volume costs.
+    
+    Every widget except ROW_WIDGETS only sums amounts per day, month or
+    category, so it gets the same totals from the day x category rollup as
+    from the full ledger. ROW_WIDGETS get the most recent transactions of
+    the whole history, open months or not.
+    
+    Returns:
+        Tuple of (prepared rollup frame from the closed-month snapshots plus
+        the live open months, prepared frame of the STREAMING_TABLE_ROWS most
+        recent transactions)
+    """
+    rollup_df, rows = get_month_snapshots(csv_path).frames()
+    recent = rows.nlargest(STREAMING_TABLE_ROWS, "Date", keep="last").sort_values("Date", kind="stable")
+    return prepare_rollup_frames((rollup_df, recent))
+
+
+def load_streamed_frames(csv_path, chunksize=LEDGER_CHUNKSIZE):
+    """
+    Stream the ledger through categorization in chunks with bounded memory,
+    for ledgers too large to load when MONTH_SNAPSHOTS is off.
+    
+    Returns:
+        Tuple of (prepared rollup frame, prepared frame of the most recent transactions)
+    """
+    aggregates = LedgerAggregates(recent_rows=STREAMING_TABLE_ROWS)
+    with span("csv_stream") as s:
+        for chunk in iter_ledger(csv_path, chunksize):
+            aggregates.fold(chunk)
+        s["rows"] = aggregates.rows
+    return prepare_rollup_frames((aggregates.frame(), aggregates.recent()))
+
+
+def load_dashboard_frames(csv_path):
+    """
+    Returns:
+        Tuple of (frame for the summing widgets, frame for ROW_WIDGETS): from
+        the month snapshots by default; without MONTH_SNAPSHOTS, the same
+        full ledger twice unless the ledger is large enough to stream
+    """
+    if MONTH_SNAPSHOTS:
+        return load_snapshot_frames(csv_path)
+    try:
+        size = os.path.getsize(csv_path)
+    except OSError:
+        size = 0
+    if STREAMING_LEDGER_BYTES and size >= STREAMING_LEDGER_BYTES:
+        return load_streamed_frames(csv_path)
+    df = load_dashboard_frame(csv_path)
+    return df, df
+
+
+# Prepared frames for the current ledger version, shared by widget requests in this worker
+frame_cache = {}
+frame_lock = threading.Lock()
+
+def get_dashboard_frame(csv_path, rows=False):
+    """
+    Return the prepared ledger, loading it at most once per ledger version.
+    
+    Args:
+        csv_path: Ledger to read
+        rows: Return the frame for ROW_WIDGETS (individual transactions)
+    """
+    version = ledger_version(csv_path)
+    
+    # Held while loading so concurrent widget requests wait for one load
+    with frame_lock, span("dashboard_frame") as s:
+        cached = frame_cache.get(csv_path)
+        if cached is not None and cached[0] == version:
+            s["cache"] = "hit"
+        else:
+            s["cache"] = "miss"
+            cached = frame_cache[csv_path] = (version, *load_dashboard_frames(csv_path))
+        return cached[2] if rows else cached[1]
+
 
+def summary_stats(df):
+    """Total income, expenses, savings and savings rate"""
     # Calculate income and expenses using normalized amounts
     income_df = df[df["Category"] == "Income"]
     papa_transfer_df = df[df["Category"] == "Papa Transfer"] if "Papa Transfer" in df["Category"].unique() else pd.DataFrame()
-    internal_transfer_df = df[df["Category"] == "Internal Transfer"]
     
-    # For income, we use the positive normalized amounts
-    total_income = income_df["Normalized_Amount"].sum()
-    total_papa = papa_transfer_df["Normalized_Amount"].sum() if not papa_transfer_df.empty else 0
+    # For income, we use the positive normalized amounts (summed exactly in cents)
+    total_income = income_df["Normalized_Cents"].sum() / 100
+    total_papa = papa_transfer_df["Normalized_Cents"].sum() / 100 if not papa_transfer_df.empty else 0
     
     # For expenses, we use the negative normalized amounts (they're already negative)
-    expense_df = df[~df["Category"].isin(["Income", "Papa Transfer", "Internal Transfer"])]
-    total_expenses = expense_df["Normalized_Amount"].sum()
+    expense_df = df[df["Is_Expense"]]
+    total_expenses = expense_df["Normalized_Cents"].sum() / 100
     
     # Calculate savings and savings rate 
     savings = total_income + total_papa + total_expenses  # Expenses are already negative
     savings_rate = (savings / (total_income + total_papa)) * 100 if (total_income + total_papa) > 0 else 0
-
-    # Create a copy of df for visualizations
-    df_viz = df.copy()
     
-    # Create expense_df_viz with absolute values for visualization
-    expense_df_viz = expense_df.copy()
-    expense_df_viz["Amount"] = expense_df_viz["Normalized_Amount"].abs()
+    return {
+        "total_income": round(total_income, 2),
+        "total_papa_transfer": round(total_papa, 2),
+        "total_expenses": round(abs(total_expenses), 2),  # Make positive for display
+        "savings": round(savings, 2),
+        "savings_rate": round(savings_rate, 2)
+    }
 
-    # Enhanced visualizations - update to use Category instead of Predicted Category
-    pie_html = px.pie(expense_df_viz, names="Category", values="Amount", 
-                      title="Spend by Category", hole=0.4).to_html(full_html=False)
-    
-    bar_data = expense_df_viz.groupby(["Month", "Category"])["Amount"].sum().reset_index()
-    bar_html = px.bar(bar_data, x="Month", y="Amount", color="Category", 
-                      barmode="stack", title="Monthly Expense Trends").to_html(full_html=False)
-    
-    # Generate other visualizations with normalized amounts
-    forecast_html = forecast_spending(df_viz)
-    income_vs_expenses_html = income_vs_expenses(df_viz)
-    essential_vs_disc_html = essential_vs_discretionary(df_viz)
-    dining_vs_groceries_html = dining_vs_groceries(df_viz)
-    calendar_html = spending_calendar(df_viz)
-    top_categories_html = top_spending_categories(df_viz)
-    growth_html = category_growth(df_viz)
-    sankey_html = sankey_income_allocation(df_viz)
+
+def expense_view(df):
+    """Month, Category and absolute Amount of the expense rows, for visualization"""
+    # Only the three columns the charts read, instead of a copy of every expense row
+    expense_rows = df.loc[df["Is_Expense"], ["Month", "Category", "Normalized_Amount"]]
+    return expense_rows[["Month", "Category"]].assign(Amount=expense_rows["Normalized_Amount"].abs())
+
+
+def spend_by_category(df):
+    """Donut chart of expenses by category"""
+    fig = px.pie(expense_view(df), names="Category", values="Amount", 
+                 title="Spend by Category", hole=0.4)
+    return render_figure(fig)
+
+
+def monthly_expense_trends(df):
+    """Stacked bar chart of monthly expenses by category"""
+    bar_data = expense_view(df).groupby(["Month", "Category"], observed=True)["Amount"].sum().reset_index()
+    bar_data["Month"] = bar_data["Month"].dt.strftime("%Y-%m")
+    fig = px.bar(bar_data, x="Month", y="Amount", color="Category", 
+                 barmode="stack", title="Monthly Expense Trends")
+    return render_figure(fig)
+
+
+def recurring_charges(csv_path):
+    """
+    Table of the recurring charges still expected, largest yearly cost first.
     
-    # Generate transaction table with filtering capabilities
-    transaction_table_html = transaction_table(df_viz)
+    Reads the incremental RecurringIndex instead of the prepared frame, so it
+    costs the same on any ledger size.
+    """
+    charges = for_ledger(RecurringIndex, csv_path).charges(active_only=True)
+    columns = ["Merchant", "Category", "Cadence", "Typical Amount", "Last Charge", "Next Charge", "Yearly Cost"]
+    rows = [
+        [c["merchant"], c["category"], c["cadence"], f"${c['typical_amount']:,.2f}", c["last_date"], c["next_date"],
+         f"${c['annual_cost']:,.2f}"]
+        for c in charges
+    ]
     
-    # Category-specific forecasts
-    rent_forecast_html = category_forecast(df_viz, "Rent")
-    food_forecast_html = category_forecast(df_viz, "Food & Dining")
+    fig = go.Figure(data=[go.Table(
+        header=dict(
+            values=columns,
+            fill_color='#444444',
+            font=dict(color='white', size=14),
+            align=['left', 'left', 'left', 'right', 'left', 'left', 'right']
+        ),
+        cells=dict(
+            values=[list(column) for column in zip(*rows)] if rows else [[] for _ in columns],
+            fill_color=[['#f9f9f9', '#ffffff'] * len(rows)],
+            font=dict(color='#444444', size=12),
+            align=['left', 'left', 'left', 'right', 'left', 'left', 'right'],
+            height=30
+        )
+    )])
+    fig.update_layout(
+        title="Recurring Charges",
+        margin=dict(l=10, r=10, t=40, b=10),
+        height=min(600, 120 + 30 * len(rows))
+    )
+    return render_figure(fig)
+
+
+# Widgets built from a ledger index instead of the prepared frame; they get the ledger path
+INDEX_WIDGETS = {"recurring_charges"}
+# Widgets that fit a Prophet model; they take the ledger path (csv_path) their
+# monthly totals are recorded for, and use_cache=False to bypass the shared forecast cache
+FORECAST_WIDGETS = {"forecast", "rent_forecast", "food_forecast"}
+
+# Every dashboard widget, cheapest first; each takes the prepared frame, except
+# INDEX_WIDGETS, which take the ledger path
+WIDGETS = {
+    "summary_stats": summary_stats,
+    "pie_chart": spend_by_category,
+    "bar_chart": monthly_expense_trends,
+    "income_vs_expenses": income_vs_expenses,
+    "essential_ratio": essential_vs_discretionary,
+    "dining_vs_groceries": dining_vs_groceries,
+    "calendar": spending_calendar,
+    "top_categories": top_spending_categories,
+    "category_growth": category_growth,
+    "income_flow": sankey_income_allocation,
+    "recurring_charges": recurring_charges,
+    "transaction_table": transaction_table,
+    "forecast": forecast_spending,
+    "rent_forecast": partial(category_forecast, category="Rent"),
+    "food_forecast": partial(category_forecast, category="Food & Dining"),
+}
+
+
+def build_widget(name, csv_path):
+    """Compute a single dashboard widget from the ledger at csv_path"""
+    if name in INDEX_WIDGETS:
+        with span("widget", widget=name):
+            return WIDGETS[name](csv_path)
+    
+    df = get_dashboard_frame(csv_path, rows=name in ROW_WIDGETS)
+    with span("widget", rows=len(df), widget=name):
+        if name in FORECAST_WIDGETS:
+            return WIDGETS[name](df, csv_path=csv_path)
+        return WIDGETS[name](df)
+
+
+def generate_dashboard(csv_path, fresh=False):
+    """
+    Compute every dashboard widget.
     
-    return {
-        "pie_chart": pie_html,
-        "bar_chart": bar_html,
-        "forecast": forecast_html,
-        "income_vs_expenses": income_vs_expenses_html,
-        "essential_ratio": essential_vs_disc_html,
-        "dining_vs_groceries": dining_vs_groceries_html,
-        "calendar": calendar_html,
-        "top_categories": top_categories_html,
-        "category_growth": growth_html,
-        "income_flow": sankey_html,
-        "rent_forecast": rent_forecast_html,
-        "food_forecast": food_forecast_html,
-        "transaction_table": transaction_table_html,
-        "summary_stats": {
-            "total_income": round(total_income, 2),
-            "total_papa_transfer": round(total_papa, 2),
-            "total_expenses": round(abs(total_expenses), 2),  # Make positive for display
-            "savings": round(savings, 2),
-            "savings_rate": round(savings_rate, 2)
-        }
-    }
+    Args:
+        csv_path: Ledger to read
+        fresh: Reload the ledger and refit forecasts instead of using this
+               worker's caches (used when profiling); the shared forecast
+               cache is bypassed, not cleared
+    """
+    if not fresh:
+        return {name: build_widget(name, csv_path) for name in WIDGETS}
+    
+    df, rows_df = load_dashboard_frames(csv_path)
+    dashboard = {}
+    for name, widget in WIDGETS.items():
+        if name in INDEX_WIDGETS:
+            dashboard[name] = build_widget(name, csv_path)
+            continue
+        frame = rows_df if name in ROW_WIDGETS else df
+        with span("widget", rows=len(frame), widget=name):
+            if name in FORECAST_WIDGETS:
+                dashboard[name] = widget(frame, use_cache=False, csv_path=csv_path)
+            else:
+                dashboard[name] = widget(frame)
+    return dashboard
@@ -0,0 +1,66 @@
+import os
+import hashlib
+import logging
+
+from flask_caching.backends.filesystemcache import FileSystemCache
+
+logger = logging.getLogger(__name__)
+
+
+class LRUFileSystemCache(FileSystemCache):
+    """
+    FileSystemCache shared by every worker on the host, evicting the least
+    recently used entries once CACHE_THRESHOLD is exceeded.
+
+    Cache hits refresh the entry file's mtime, and pruning removes the oldest
+    mtimes first (the stock backend prunes by expiry time, which is the same
+    for every entry when timeouts are disabled).
+    """
+
+    def get(self, key):
+        value = super().get(key)
+        if value is not None:
+            try:
+                os.utime(self._get_filename(key))
+            except OSError:
+                pass
+        return value
+
+    def _remove_older(self):
+        entries = []
+        for fname in self._list_dir():
+            try:
+                entries.append((os.path.getmtime(fname), fname))
+            except OSError:
+                pass
+
+        for _, fname in sorted(entries):
+            try:
+                os.remove(fname)
+                self._update_count(delta=-1)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.warning(f"⚠️ Could not evict cache file {fname}")
+                return False
+            if not self._over_threshold():
+                break
+        return True
+
+
+def scoped_cache_key(name, data_version, api_key, args=None):
+    """
+    Builds a cache key for one response scope.
+
+    Args:
+        name: Logical name of the cached object (e.g. "dashboard")
+        data_version: Ledger version the object was computed from
+        api_key: Caller's API key; only a hash of it ends up in the key
+        args: Optional mapping of query parameters that change the response
+
+    Returns:
+        Cache key string
+    """
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+    query = "&".join(f"{k}={v}" for k, v in sorted((args or {}).items()))
+    return f"{name}:{key_hash}:{query}:{data_version}"
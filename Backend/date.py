@@ -1,5 +1,6 @@
 import re
 from datetime import datetime
+from functools import lru_cache
 
 def extract_year_from_filename(filename):
     patterns = [
@@ -29,6 +30,7 @@ def extract_year_from_filename(filename):
                 continue
     return 2024  # Default fallback
 
+@lru_cache(maxsize=4096)  # Statements repeat the same few hundred dates
 def format_date(date_str, filename):
     try:
         if re.match(r"\d{2}/\d{2}/\d{4}", date_str):
@@ -5,8 +5,13 @@ import io
 import csv
 import pdfplumber
 from date import format_date
+from utils import parse_cents, append_transactions
 import os 
+import time
+from collections import namedtuple
 from pathlib import Path
+from utils import CONFIG
+from metrics import span, count
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,42 +19,178 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-
-def extract_transactions_chase_card(text, filename):
-    logger.info("🔍 Matched extractor: Chase Credit Card")
-    bank_name = "Chase Credit Card"
-    transactions = []
-    for line in text.splitlines():
-        match = re.match(r"^(\d{2}/\d{2})\s+(.*?)\s+(\d+\.\d{2})$", line.strip())
-        if match:
-            date, desc, amount = match.groups()
-            clean_desc = " ".join(desc.split())
-            date = format_date(date.strip(), filename)
-            transactions.append([date, amount, "Purchase", clean_desc, bank_name])
-    return transactions
-
-def extract_transactions_pnc(text, filename):
+# A statement that takes longer than this to parse is rejected instead of pinning a worker
+PARSE_TIME_BUDGET = CONFIG.get("PARSE_TIME_BUDGET_SECONDS", 10)
+
+
+class ParseTimeout(Exception):
+    """Raised when a statement exceeds PARSE_TIME_BUDGET"""
+
+
+def statement_lines(text, filename, deadline=None):
+    """
+    Yields the stripped lines of a statement, checking the parse deadline as it goes.
+
+    Args:
+        text: Extracted statement text
+        filename: Statement file name, for the error message
+        deadline: time.monotonic() value past which parsing is aborted (None for no limit)
+    """
+    for number, line in enumerate(text.splitlines()):
+        if deadline is not None and number % 256 == 0 and time.monotonic() > deadline:
+            raise ParseTimeout(f"Parsing {filename} took longer than {PARSE_TIME_BUDGET}s; is it a valid statement?")
+        yield line.strip()
+
+
+# -----------------------
+# Extractor Registry
+# -----------------------
+# signature: alternatives, each a tuple of markers that must all appear in the text
+Extractor = namedtuple("Extractor", ["bank", "signature", "priority", "parse"])
+
+
+class ExtractorRegistry:
+    """
+    Bank statement parsers, each with the text markers that identify its
+    statements and a priority (lowest wins when several match).
+
+    Detection scans the text once for every registered marker, so another
+    bank adds a marker to one pattern instead of another full-text search
+    for every upload.
+    """
+
+    def __init__(self):
+        self.extractors = []
+        self._pattern = None
+        self._contains = {}
+
+    def register(self, bank, signature, priority=100):
+        """
+        Decorator registering parse(text, filename, deadline=None) for a bank.
+
+        Args:
+            bank: Bank name, as written to the ledger and used in metrics
+            signature: List of marker tuples; the statement matches if it
+                contains every marker of any one tuple
+            priority: Order among extractors whose signatures match
+        """
+        def decorator(parse):
+            self.extractors.append(Extractor(bank, [tuple(markers) for markers in signature], priority, parse))
+            self.extractors.sort(key=lambda extractor: extractor.priority)
+            self._pattern = None
+            return parse
+        return decorator
+
+    def _compile(self):
+        markers = sorted({marker for e in self.extractors for markers in e.signature for marker in markers},
+                         key=len, reverse=True)
+        # Lookahead so overlapping markers are all found; a marker found also implies the ones it contains
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(marker) for marker in markers) + "))")
+        self._contains = {marker: {other for other in markers if other in marker} for marker in markers}
+
+    def detect(self, text):
+        """
+        Returns:
+            The highest-priority Extractor whose signature matches the text, or None
+        """
+        if self._pattern is None:
+            self._compile()
+        found = set()
+        for match in self._pattern.finditer(text):
+            found |= self._contains[match.group(1)]
+
+        for extractor in self.extractors:
+            if any(found.issuperset(markers) for markers in extractor.signature):
+                return extractor
+        return None
+
+
+registry = ExtractorRegistry()
+register_extractor = registry.register
+
+
+# PNC sections: transaction type, title, and the markers that end its rows
+PNC_SECTIONS = [
+    ("Deposits and Other Additions", "Deposits and Other Additions", ["Banking/Debit Card Withdrawals"]),
+    ("Banking/Debit Card Withdrawals and Purchases", "Banking/Debit Card Withdrawals", ["Online and Electronic Banking Deductions"]),
+    ("Online and Electronic Banking Deductions", "Online and Electronic Banking Deductions", ["Daily Balance", re.compile(r"Page \d+ of \d+")]),
+]
+PNC_HEADER = "Date Amount Description"
+PNC_ROW = re.compile(r"(\d{2}/\d{2})\s+([\d,.]+)(?:\s+(.*))?$")
+
+def _find_marker(line, markers):
+    """Position of the first section end marker (a string or compiled pattern) in a line, or -1"""
+    positions = []
+    for marker in markers:
+        if isinstance(marker, str):
+            position = line.find(marker)
+        else:
+            match = marker.search(line)
+            position = match.start() if match else -1
+        if position >= 0:
+            positions.append(position)
+    return min(positions) if positions else -1
+
+@register_extractor("PNC", [("Virtual Wallet",), ("PNC",)], priority=10)
+def extract_transactions_pnc(text, filename, deadline=None):
+    """
+    Line-oriented, single pass over the statement: each section is a title,
+    then a "Date Amount Description" header, then rows that may wrap onto
+    the following lines until the next row or the section's end marker.
+    """
     bank_name = "PNC"
     transactions = []
-    sections = {
-        "Deposits and Other Additions": r"Deposits and Other Additions.*?Date Amount Description(.*?)Banking/Debit Card Withdrawals",
-        "Banking/Debit Card Withdrawals and Purchases": r"Banking/Debit Card Withdrawals.*?Date Amount Description(.*?)Online and Electronic Banking Deductions",
-        "Online and Electronic Banking Deductions": r"Online and Electronic Banking Deductions.*?Date Amount Description(.*?)(?:Daily Balance|Page \d+ of \d+)"
-    }
-
-    for trans_type, pattern in sections.items():
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            section_text = match.group(1)
-            entries = re.findall(r"(\d{2}/\d{2})\s+([\d,.]+)\s+(.+?)(?=\n\d{2}/\d{2}|\Z)", section_text, re.DOTALL)
-            for date, amount, desc in entries:
-                clean_desc = " ".join(desc.split())
-                date = format_date(date.strip(), filename)
-                transactions.append([date.strip(), amount.replace(",", ""), trans_type, clean_desc, bank_name])
+    pending = set(range(len(PNC_SECTIONS)))
+    section = None      # Index of the section being read
+    in_rows = False     # Past the section's column header
+    rows = []           # Rows of the current section, kept once its end marker is found
+    entry = None        # [date, amount, description parts] of the row being read
+
+    def flush():
+        if entry is not None and entry[2]:
+            date = format_date(entry[0], filename)
+            rows.append([date, parse_cents(entry[1]), PNC_SECTIONS[section][0], " ".join(" ".join(entry[2]).split()), bank_name])
+
+    for line in statement_lines(text, filename, deadline):
+        while line:
+            if section is None:
+                # Look for the title of a section that hasn't been read yet
+                starts = [(line.find(PNC_SECTIONS[i][1]), i) for i in pending]
+                starts = [(position, i) for position, i in starts if position >= 0]
+                if not starts:
+                    break
+                position, section = min(starts)
+                pending.discard(section)
+                line = line[position + len(PNC_SECTIONS[section][1]):]
+            elif not in_rows:
+                position = line.find(PNC_HEADER)
+                if position < 0:
+                    break
+                in_rows = True
+                line = line[position + len(PNC_HEADER):].strip()
+            else:
+                end = _find_marker(line, PNC_SECTIONS[section][2])
+                rows_part = line if end < 0 else line[:end]
+                match = PNC_ROW.match(rows_part)
+                if match:
+                    flush()
+                    entry = [match.group(1), match.group(2), [match.group(3)] if match.group(3) else []]
+                elif entry is not None and rows_part:
+                    entry[2].append(rows_part)
+                if end < 0:
+                    break
+                # The end marker may also be the next section's title, so keep scanning the line
+                flush()
+                transactions.extend(rows)
+                rows, entry, section, in_rows = [], None, None, False
+                line = line[end:]
+
+    # A section that never reaches its end marker is incomplete and skipped
     return transactions
 
 
-def extract_transactions_chase_bank(text, filename):
+@register_extractor("Chase", [("JPMorgan",), ("Chase.com",)], priority=30)
+def extract_transactions_chase_bank(text, filename, deadline=None):
     bank_name = "Chase"
     transactions = []
     entries = re.findall(r"(\d{2}/\d{2})\s+(.+?)\s+(-?[\d,]+\.\d{2})(?:\s+[\d,]+\.\d{2})?", text)
@@ -57,15 +198,15 @@ def extract_transactions_chase_bank(text, filename):
         clean_desc = " ".join(desc.split())
         type_ = "Credit" if "-" not in amount else "Debit"
         date = format_date(date.strip(), filename) 
-        transactions.append([date.strip(), amount.replace(",", ""), type_, clean_desc, bank_name])
+        transactions.append([date.strip(), parse_cents(amount), type_, clean_desc, bank_name])
     return transactions
 
-def extract_transactions_chase_card(text, filename):
+@register_extractor("Chase Credit Card", [("New Balance", "Payment Due Date")], priority=20)
+def extract_transactions_chase_card(text, filename, deadline=None):
     bank_name = "Chase Credit Card"
     transactions = []
 
-    for line in text.splitlines():
-        line = line.strip()
+    for line in statement_lines(text, filename, deadline):
         # Match line with MM/DD followed by description and ending with an amount
         match = re.match(r"^(\d{2}/\d{2})\s+(.*?)\s+(\d+\.\d{2})$", line)
         if match:
@@ -73,30 +214,67 @@ def extract_transactions_chase_card(text, filename):
             clean_desc = " ".join(desc.split())
             type_ = "Purchase"  # These statements typically don’t show credits here
             date = format_date(date.strip(), filename)  
-            transactions.append([date, amount, type_, clean_desc, bank_name])
+            transactions.append([date, parse_cents(amount), type_, clean_desc, bank_name])
 
     return transactions
 
-def extract_transactions_discover_card(text, filename):
+DISCOVER_ROW = re.compile(r"(\d{2}/\d{2}/\d{2})\s+(\d{2}/\d{2}/\d{2})\s+")
+DISCOVER_AMOUNT = re.compile(r"\$\s*(-?\d+\.\d{2})|\$$")
+DISCOVER_WRAPPED_AMOUNT = re.compile(r"-?\d+\.\d{2}")
+
+@register_extractor("Discover", [("Discover", "Activity Period")], priority=40)
+def extract_transactions_discover_card(text, filename, deadline=None):
+    """
+    Line-oriented, single pass over the statement: a row starts at a
+    transaction date and post date, and its description may wrap onto the
+    following lines until the "$ amount" that ends it.
+    """
     bank_name = "Discover"
     transactions = []
-
-    # Match: Trans Date, Post Date, Description, Amount
-    pattern = re.findall(
-        r"(\d{2}/\d{2}/\d{2})\s+(\d{2}/\d{2}/\d{2})\s+(.+?)\$\s*(-?\d+\.\d{2})",
-        text,
-        re.DOTALL
-    )
-
-    for trans_date, post_date, desc, amount in pattern:
-        clean_desc = " ".join(desc.strip().split())
-        type_ = "Credit" if "-" in amount else "Purchase"
-        formatted_date = format_date(trans_date.strip(), filename)
-        transactions.append([formatted_date, amount.replace(",", ""), type_, clean_desc, bank_name])
+    entry = None        # [trans date, description parts] of the row being read
+    dangling = False    # The last line ended with a "$" whose amount wrapped
+
+    def emit(value):
+        clean_desc = " ".join(" ".join(entry[1]).split())
+        if clean_desc:
+            type_ = "Credit" if "-" in value else "Purchase"
+            formatted_date = format_date(entry[0], filename)
+            transactions.append([formatted_date, parse_cents(value), type_, clean_desc, bank_name])
+
+    for line in statement_lines(text, filename, deadline):
+        if dangling:
+            dangling = False
+            match = DISCOVER_WRAPPED_AMOUNT.match(line)
+            if match:
+                emit(match.group(0))
+                entry = None
+                line = line[match.end():]
+
+        while line:
+            start = DISCOVER_ROW.search(line)
+            amount = DISCOVER_AMOUNT.search(line)
+            if start and (amount is None or start.start() < amount.start()):
+                # A new row; one still waiting for its amount was malformed and is dropped
+                entry = [start.group(1), []]
+                line = line[start.end():]
+                continue
+            if entry is None or amount is None:
+                if entry is not None:
+                    entry[1].append(line)
+                break
+
+            entry[1].append(line[:amount.start()])
+            if amount.group(1) is None:
+                dangling = True
+                break
+            emit(amount.group(1))
+            entry = None
+            line = line[amount.end():]
 
     return transactions
 
-def extract_transactions_amex(text, filename):
+@register_extractor("American Express", [("American Express", "SkyMiles")], priority=50)
+def extract_transactions_amex(text, filename, deadline=None):
     bank_name = "American Express"
     transactions = []
 
@@ -106,18 +284,19 @@ def extract_transactions_amex(text, filename):
         payments = re.findall(r"(\d{2}/\d{2}/\d{2})\*?\s+MOBILE PAYMENT - THANK YOU\s+-\$([\d,]+\.\d{2})", payment_section.group(1))
         for date, amount in payments:
             formatted_date = format_date(date.strip(), filename)
-            transactions.append([formatted_date, amount.replace(",", ""), "Payment", "MOBILE PAYMENT - THANK YOU", bank_name])
+            transactions.append([formatted_date, parse_cents(amount), "Payment", "MOBILE PAYMENT - THANK YOU", bank_name])
 
     # Extract purchases
     purchases = re.findall(r"(\d{2}/\d{2}/\d{2})\s+(.+?)\s+\$([\d,]+\.\d{2})", text)
     for date, desc, amount in purchases:
         clean_desc = " ".join(desc.strip().split())
         formatted_date = format_date(date.strip(), filename)
-        transactions.append([formatted_date, amount.replace(",", ""), "Purchase", clean_desc, bank_name])
+        transactions.append([formatted_date, parse_cents(amount), "Purchase", clean_desc, bank_name])
 
     return transactions
 
-def extract_transactions_apple_card(text, filename):
+@register_extractor("Apple Card", [("Apple Card is issued by Goldman Sachs Bank USA",)], priority=60)
+def extract_transactions_apple_card(text, filename, deadline=None):
     bank_name = "Apple Card"
     transactions = []
 
@@ -128,7 +307,7 @@ def extract_transactions_apple_card(text, filename):
         for date, desc, amount in payments:
             clean_desc = " ".join(desc.strip().split())
             date = format_date(date.strip(), filename)
-            transactions.append([date, amount, "Payment", clean_desc, bank_name])
+            transactions.append([date, parse_cents(amount), "Payment", clean_desc, bank_name])
 
     # Extract Purchase Transactions
     transaction_pattern = re.findall(
@@ -139,11 +318,12 @@ def extract_transactions_apple_card(text, filename):
     for date, desc, amount in transaction_pattern:
         clean_desc = " ".join(desc.strip().split())
         date = format_date(date.strip(), filename)
-        transactions.append([date, amount, "Purchase", clean_desc, bank_name])
+        transactions.append([date, parse_cents(amount), "Purchase", clean_desc, bank_name])
 
     return transactions
 
-def extract_transactions_goldman_savings(text, filename):
+@register_extractor("Goldman Sachs Savings", [("Goldman Sachs Bank USA", "Daily Cash Deposit")], priority=70)
+def extract_transactions_goldman_savings(text, filename, deadline=None):
     bank_name = "Goldman Sachs Savings"
     transactions = []
 
@@ -154,30 +334,32 @@ def extract_transactions_goldman_savings(text, filename):
         clean_desc = " ".join(desc.strip().split())
         type_ = "Credit"  # All are deposits or interest, no withdrawals in this statement
         formatted_date = format_date(date.strip(), filename)
-        transactions.append([formatted_date, amount.replace(",", ""), type_, clean_desc, bank_name])
+        transactions.append([formatted_date, parse_cents(amount), type_, clean_desc, bank_name])
 
     return transactions
 def extract_transactions(text, filename, unknown_files):
-    if "Virtual Wallet" in text or "PNC" in text:
-        return extract_transactions_pnc(text, filename)
-    elif "New Balance" in text and "Payment Due Date" in text:
-        return extract_transactions_chase_card(text, filename)
-    elif "JPMorgan" in text or "Chase.com" in text:
-        return extract_transactions_chase_bank(text, filename)
-    elif "Discover" in text and "Activity Period" in text:
-        return extract_transactions_discover_card(text, filename)
-    elif "American Express" in text and "SkyMiles" in text:
-        return extract_transactions_amex(text, filename)
-    elif "Apple Card is issued by Goldman Sachs Bank USA" in text:
-        return extract_transactions_apple_card(text, filename)
-    elif "Goldman Sachs Bank USA" in text and "Daily Cash Deposit" in text:
-        return extract_transactions_goldman_savings(text, filename)
-
-    else:
-        print(f"⚠️ Unknown format in: {filename}")
+    """
+    Parses a statement with the registered extractor its text matches.
+
+    Per-bank documents, rows and parse time are recorded in the
+    "extract_parse" span, and the text size in the extract_bytes counter.
+    """
+    with span("extract_detect"):
+        extractor = registry.detect(text)
+
+    if extractor is None:
+        logger.warning(f"⚠️ Unknown format in: {filename}")
+        count("extract_unknown_documents")
         unknown_files.append(filename)
         return []
 
+    count("extract_bytes", len(text.encode("utf-8")), bank=extractor.bank)
+    deadline = time.monotonic() + PARSE_TIME_BUDGET if PARSE_TIME_BUDGET else None
+    with span("extract_parse", bank=extractor.bank) as s:
+        transactions = extractor.parse(text, filename, deadline)
+        s["rows"] = len(transactions)
+    return transactions
+
 
 # --- Main Processing Function ---
 def process_all_pdfs(folder_path, output_csv):
@@ -195,10 +377,7 @@ def process_all_pdfs(folder_path, output_csv):
             unknown_files.append(file.name)
 
     # Save all to CSV
-    with open(output_csv, mode="w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Date", "Amount", "Type", "Description", "Bank"])
-        writer.writerows(all_transactions)
+    append_transactions(output_csv, all_transactions, mode="w")
 
     logger.info(f"✅ Extraction complete. Saved to {output_csv}")
     if unknown_files:
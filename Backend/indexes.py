@@ -0,0 +1,192 @@
+import os
+import io
+import json
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+from utils import (
+    CONFIG, RULES_FINGERPRINT, LEDGER_COLUMNS, read_ledger, clean_ledger, categorize_frame, ledger_state_path,
+    write_json_atomic
+)
+from metrics import span
+from classifier import load_manifest
+
+logger = logging.getLogger(__name__)
+
+INDEX_CHUNKSIZE = CONFIG.get("LEDGER_CHUNKSIZE", 200_000)
+HEAD_BYTES = 4096  # Leading ledger bytes hashed to notice a rewritten ledger
+
+
+class _LimitedReader:
+    """File wrapper that stops at a fixed byte offset (the last complete ledger line)"""
+
+    def __init__(self, f, remaining):
+        self.f = f
+        self.remaining = remaining
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def __iter__(self):
+        return iter(io.BytesIO(self.read()))
+
+
+class LedgerTail:
+    """
+    Reads only the rows appended to an append-only ledger since a byte offset.
+
+    State built this way records the offset it has consumed and a hash of the
+    ledger's first bytes; if the ledger shrinks, is rewritten, or the
+    categorization rules or classifier version change, the state has to be
+    rebuilt from scratch.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+
+    def _ledger_head(self, length):
+        with open(self.csv_path, "rb") as f:
+            return hashlib.sha256(f.read(min(length, HEAD_BYTES))).hexdigest()
+
+    def _is_continuation(self, state, model):
+        """True if `state` was built from a prefix of the current ledger, with the current rules and classifier"""
+        try:
+            size = os.path.getsize(self.csv_path)
+        except OSError:
+            return False
+        return (state.get("rules") == RULES_FINGERPRINT and state.get("model") == model
+                and state.get("offset", 0) <= size
+                and (not state.get("offset") or state.get("head") == self._ledger_head(state["offset"])))
+
+    def _complete_end(self, offset):
+        """Offset just past the last complete ledger line, so a half-written row waits for the next build"""
+        with open(self.csv_path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size <= offset:
+                return offset
+            f.seek(max(offset, size - 65536))
+            tail = f.read()
+        newline = tail.rfind(b"\n")
+        return size - (len(tail) - newline - 1) if newline >= 0 else offset
+
+    def _new_chunks(self, offset, end):
+        """Yields cleaned chunks of the ledger rows between the two byte offsets"""
+        if end <= offset:
+            return
+        with open(self.csv_path, "rb") as f:
+            f.seek(offset)
+            reader = _LimitedReader(f, end - offset)
+            header = {"header": 0} if offset == 0 else {"header": None, "names": LEDGER_COLUMNS}
+            for chunk in read_ledger(reader, chunksize=INDEX_CHUNKSIZE, **header):
+                yield clean_ledger(chunk)
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+def for_ledger(cls, csv_path):
+    """
+    The worker-wide instance of a LedgerTail subclass for a ledger, so every
+    caller shares its lock and in-memory state.
+    """
+    with _instances_lock:
+        key = (cls, csv_path)
+        if key not in _instances:
+            _instances[key] = cls(csv_path)
+        return _instances[key]
+
+
+class LedgerIndex(LedgerTail, ABC):
+    """
+    A JSON-serializable summary of the ledger, kept current by folding in
+    only the rows appended since the last update.
+
+    Subclasses set `name` (the state file is <name>.<ledger>.json, see
+    ledger_state_path) and implement empty() and fold(data, chunk).
+    update() is cheap when nothing was appended, so readers can call it
+    before every lookup; /upload calls it right after appending so the work
+    happens at ingest.
+    """
+
+    name = None
+
+    def __init__(self, csv_path, state_file=None):
+        super().__init__(csv_path)
+        self.state_file = state_file or ledger_state_path(csv_path, f"{self.name}.json")
+        self._lock = threading.Lock()
+        self._state = None
+        self._state_mtime = None
+
+    @abstractmethod
+    def empty(self):
+        """Returns the index data of an empty ledger"""
+
+    @abstractmethod
+    def fold(self, data, chunk):
+        """Adds one cleaned, categorized chunk of new ledger rows to `data` in place"""
+
+    def _empty_state(self, model=None):
+        return {"rules": RULES_FINGERPRINT, "model": model, "offset": 0, "head": None, "data": self.empty()}
+
+    def _load_state(self):
+        """The saved state, re-read only when another process has written it"""
+        try:
+            mtime = os.stat(self.state_file).st_mtime_ns
+        except OSError:
+            return self._empty_state()
+        if mtime != self._state_mtime:
+            try:
+                with open(self.state_file, encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                return self._empty_state()
+            self._state_mtime = mtime
+        return self._state
+
+    def update(self):
+        """
+        Folds newly appended ledger rows into the index.
+
+        Returns:
+            The index data (shared; callers must not modify it)
+        """
+        if not os.path.isfile(self.csv_path):
+            return self.empty()
+
+        with self._lock, span("ledger_index", index=self.name) as s:
+            # Indexed labels include the classifier's fallback predictions
+            model = load_manifest()["latest"]
+            state = self._load_state()
+            if not self._is_continuation(state, model):
+                if state["offset"]:
+                    logger.info(f"🗂️ Ledger, rules or classifier changed; rebuilding the {self.name} index.")
+                state = self._empty_state(model)
+
+            end = self._complete_end(state["offset"])
+            if end == state["offset"]:
+                s["cache"] = "hit"
+                return state["data"]
+
+            s["cache"] = "miss"
+            s["rows"] = 0
+            try:
+                for chunk in self._new_chunks(state["offset"], end):
+                    s["rows"] += len(chunk)
+                    self.fold(state["data"], categorize_frame(chunk))
+            except Exception:
+                # The cached state may be half-updated; read it from disk next time
+                self._state_mtime = None
+                raise
+
+            state["offset"] = end
+            state["head"] = self._ledger_head(end)
+            write_json_atomic(self.state_file, state)
+            self._state = state
+            self._state_mtime = os.stat(self.state_file).st_mtime_ns
+            return state["data"]
@@ -0,0 +1,161 @@
+import re
+import time
+import threading
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_histograms = {}  # (span name, sorted label items) -> [bucket counts..., +Inf count, sum]
+_rows = {}        # (span name, sorted label items) -> rows processed
+_counters = {}    # (counter name, sorted label items) -> running total
+_request = threading.local()
+
+
+@contextmanager
+def span(name, rows=None, **labels):
+    """
+    Times a block of work and records it under `name`.
+
+    The yielded dict holds the labels and can be updated inside the block,
+    e.g. `s["rows"] = len(df)` or `s["cache"] = "hit"`.
+
+    Args:
+        name: Span name (e.g. "csv_load")
+        rows: Optional number of rows the block processed
+        **labels: Extra labels such as widget="pie_chart" or cache="miss"
+    """
+    attrs = {"rows": rows, **labels}
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        rows = attrs.pop("rows", None)
+        observe(name, time.perf_counter() - start, rows=rows, **attrs)
+
+
+def observe(name, seconds, rows=None, **labels):
+    """Records one finished span in the process-wide histograms and the current request"""
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None)))
+    with _lock:
+        counts = _histograms.get(key)
+        if counts is None:
+            counts = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                counts[i] += 1
+        counts[len(BUCKETS)] += 1
+        counts[-1] += seconds
+        if rows is not None:
+            _rows[key] = _rows.get(key, 0) + rows
+
+    spans = getattr(_request, "spans", None)
+    if spans is not None:
+        spans.append((name, dict(key[1]), seconds))
+
+
+def count(name, value=1, **labels):
+    """Adds to a process-wide counter, exported as spendanalysis_<name>_total"""
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None)))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+# -----------------------
+# Per-request spans (Server-Timing)
+# -----------------------
+def begin_request():
+    """Starts collecting the spans recorded by this thread"""
+    _request.spans = []
+
+
+def end_request():
+    """Stops collecting and returns the spans recorded since begin_request()"""
+    spans = getattr(_request, "spans", None) or []
+    _request.spans = None
+    return spans
+
+
+def _token(text):
+    return re.sub(r"[^A-Za-z0-9_.\-]", "_", text)
+
+
+def server_timing(spans, total=None):
+    """
+    Formats spans as a Server-Timing header value.
+
+    Spans with the same name and labels are summed; the cache label becomes
+    the entry description.
+
+    Args:
+        spans: List of (name, labels, seconds) from end_request()
+        total: Optional total request time in seconds
+
+    Returns:
+        Header value, e.g. 'csv_load;dur=12.3, widget.pie_chart;desc="hit";dur=0.4'
+    """
+    entries = {}
+    for name, labels, seconds in spans:
+        labels = dict(labels)
+        cache = labels.pop("cache", None)
+        entry = ".".join([name] + [labels[k] for k in sorted(labels)])
+        key = (_token(entry), cache)
+        entries[key] = entries.get(key, 0.0) + seconds
+
+    parts = []
+    for (entry, cache), seconds in entries.items():
+        desc = f';desc="{cache}"' if cache else ""
+        parts.append(f"{entry}{desc};dur={seconds * 1000:.1f}")
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# -----------------------
+# Prometheus exposition
+# -----------------------
+def _labels(name, labels, extra=None):
+    items = ([("span", name)] if name else []) + list(labels) + (extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def render_prometheus():
+    """
+    Renders every span histogram, row counter and count() counter in the
+    Prometheus text format.
+
+    Values are per process; with several workers each one reports its own.
+    """
+    with _lock:
+        histograms = {key: list(counts) for key, counts in _histograms.items()}
+        rows = dict(_rows)
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP spendanalysis_span_seconds Time spent in instrumented sections of the request path",
+        "# TYPE spendanalysis_span_seconds histogram",
+    ]
+    for (name, labels), counts in sorted(histograms.items()):
+        for bound, count in zip(BUCKETS, counts):
+            lines.append(f"spendanalysis_span_seconds_bucket{_labels(name, labels, [('le', bound)])} {count}")
+        lines.append(f"spendanalysis_span_seconds_bucket{_labels(name, labels, [('le', '+Inf')])} {counts[len(BUCKETS)]}")
+        lines.append(f"spendanalysis_span_seconds_sum{_labels(name, labels)} {counts[-1]:.6f}")
+        lines.append(f"spendanalysis_span_seconds_count{_labels(name, labels)} {counts[len(BUCKETS)]}")
+
+    lines += [
+        "# HELP spendanalysis_span_rows_total Rows processed by instrumented sections",
+        "# TYPE spendanalysis_span_rows_total counter",
+    ]
+    for (name, labels), count in sorted(rows.items()):
+        lines.append(f"spendanalysis_span_rows_total{_labels(name, labels)} {count}")
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE spendanalysis_{name}_total counter")
+        for (counter, labels), value in sorted(counters.items()):
+            if counter == name:
+                lines.append(f"spendanalysis_{name}_total{_labels(None, labels)} {value}")
+
+    return "\n".join(lines) + "\n"
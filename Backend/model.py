@@ -1,105 +1,258 @@
 import pandas as pd
 import re
+import os
+import json
+import time
+import datetime
+import logging
+import argparse
 from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.metrics import classification_report
 import joblib
 import numpy as np
 from sklearn.metrics import confusion_matrix
 
 # Import from utils module instead of defining redundant functions
-from utils import categorize, clean_text, load_data, CONFIG
-
-# Load data using the centralized function
-df = load_data()
-
-# Apply categorization from utils
-df["Category"] = df["Description"].apply(categorize)
-
-# Clean descriptions using the shared function
-df["Cleaned_Description"] = df["Description"].apply(clean_text)
-
-# Train/test split with stratification to ensure all categories have examples
-X = df["Cleaned_Description"]
-y = df["Category"]
-
-# First, check which categories have too few examples
-category_counts = df["Category"].value_counts()
-print("\nCategory distribution:")
-for category, count in category_counts.items():
-    print(f"{category}: {count}")
-
-# Use stratified sampling for categories with sufficient examples
-try:
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-except ValueError:
-    # If stratification fails due to too few examples in some classes, fall back to regular split
-    print("Warning: Stratified sampling failed, using regular split instead")
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-# Print class distribution in train and test sets
-print("\nTrain set distribution:")
-train_dist = pd.Series(y_train).value_counts()
-for category in category_counts.index:
-    count = train_dist.get(category, 0)
-    print(f"{category}: {count}")
-    
-print("\nTest set distribution:")
-test_dist = pd.Series(y_test).value_counts()
-for category in category_counts.index:
-    count = test_dist.get(category, 0)
-    print(f"{category}: {count}")
-
-# Identify categories with too few examples for reliable classification
-min_examples = 5
-low_count_categories = category_counts[category_counts < min_examples].index.tolist()
-if low_count_categories:
-    print(f"\nWarning: The following categories have fewer than {min_examples} examples:")
-    for category in low_count_categories:
-        print(f"- {category}: {category_counts[category]} examples")
-    print("Consider adding more examples or merging these categories.")
-
-# TF-IDF Vectorization
-vectorizer = TfidfVectorizer()
-X_train_vec = vectorizer.fit_transform(X_train)
-X_test_vec = vectorizer.transform(X_test)
-
-# Train model with class weights to handle imbalanced categories
-model = LogisticRegression(max_iter=1000, class_weight='balanced')
-model.fit(X_train_vec, y_train)
-
-# Evaluate model
-y_pred = model.predict(X_test_vec)
-print("\nClassification Report:\n", classification_report(y_test, y_pred))
-
-# Get unique classes in sorted order
-classes = np.unique(np.concatenate([y_test, y_pred]))
-
-# Generate confusion matrix
-cm = confusion_matrix(y_test, y_pred, labels=classes)
-
-# Print confusion matrix for problematic categories
-print("\nConfusion matrix for problematic categories:")
-problem_categories = []
-for i, category in enumerate(classes):
-    correct = cm[i, i]
-    total = np.sum(cm[i, :])
-    if total > 0 and correct / total < 0.5:  # Less than 50% accuracy
-        problem_categories.append(i)
-
-if problem_categories:
-    # Extract relevant rows and columns
-    sub_cm = cm[problem_categories, :]
-    sub_classes = [classes[i] for i in problem_categories]
-    
-    print("\nActual vs Predicted")
-    print("Actual categories:", sub_classes)
-    print(sub_cm)
-    print("Predicted categories:", list(classes))
-else:
-    print("No major issues found in category predictions.")
-
-# Save the model and vectorizer
-joblib.dump(model, "category_classifier_model.pkl")
-joblib.dump(vectorizer, "tfidf_vectorizer.pkl")
+from utils import (
+    categorize, categorize_unique, clean_text, load_data, read_ledger, map_unique, CONFIG, ALL_CATEGORIES
+)
+from classifier import (
+    MODEL_DIR, ARRAY_MODEL_DIR, MODEL_STORE, MANIFEST_PATH, load_manifest, export_array_model
+)
+
+logger = logging.getLogger(__name__)
+
+
+def label_and_clean(df):
+    """Adds rule-based 'Category' labels and 'Cleaned_Description' to a ledger DataFrame"""
+    # Label with the keyword rules only (load_data may have applied the ML fallback)
+    df["Category"] = map_unique(df["Description"], categorize_unique)
+
+    # Clean descriptions using the shared function, once per distinct description
+    df["Cleaned_Description"] = map_unique(df["Description"], lambda descs: [clean_text(d) for d in descs])
+    return df
+
+
+def make_hashing_vectorizer():
+    """Stateless vectorizer, so new rows never require refitting a vocabulary"""
+    return HashingVectorizer(n_features=2 ** 18, alternate_sign=False, norm="l2")
+
+
+# -----------------------
+# Full retraining (TF-IDF + LogisticRegression)
+# -----------------------
+def train_full(csv_path=None):
+    # Load data using the centralized function
+    df = load_data(csv_path)
+    label_and_clean(df)
+
+    # Train/test split with stratification to ensure all categories have examples
+    X = df["Cleaned_Description"]
+    y = df["Category"]
+
+    # First, check which categories have too few examples
+    category_counts = df["Category"].value_counts()
+    print("\nCategory distribution:")
+    for category, count in category_counts.items():
+        print(f"{category}: {count}")
+
+    # Use stratified sampling for categories with sufficient examples
+    try:
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    except ValueError:
+        # If stratification fails due to too few examples in some classes, fall back to regular split
+        print("Warning: Stratified sampling failed, using regular split instead")
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Print class distribution in train and test sets
+    print("\nTrain set distribution:")
+    train_dist = pd.Series(y_train).value_counts()
+    for category in category_counts.index:
+        count = train_dist.get(category, 0)
+        print(f"{category}: {count}")
+
+    print("\nTest set distribution:")
+    test_dist = pd.Series(y_test).value_counts()
+    for category in category_counts.index:
+        count = test_dist.get(category, 0)
+        print(f"{category}: {count}")
+
+    # Identify categories with too few examples for reliable classification
+    min_examples = 5
+    low_count_categories = category_counts[category_counts < min_examples].index.tolist()
+    if low_count_categories:
+        print(f"\nWarning: The following categories have fewer than {min_examples} examples:")
+        for category in low_count_categories:
+            print(f"- {category}: {category_counts[category]} examples")
+        print("Consider adding more examples or merging these categories.")
+
+    # TF-IDF Vectorization
+    vectorizer = TfidfVectorizer()
+    X_train_vec = vectorizer.fit_transform(X_train)
+    X_test_vec = vectorizer.transform(X_test)
+
+    # Train model with class weights to handle imbalanced categories
+    model = LogisticRegression(max_iter=1000, class_weight='balanced')
+    model.fit(X_train_vec, y_train)
+
+    # Evaluate model
+    y_pred = model.predict(X_test_vec)
+    print("\nClassification Report:\n", classification_report(y_test, y_pred))
+
+    # Get unique classes in sorted order
+    classes = np.unique(np.concatenate([y_test, y_pred]))
+
+    # Generate confusion matrix
+    cm = confusion_matrix(y_test, y_pred, labels=classes)
+
+    # Print confusion matrix for problematic categories
+    print("\nConfusion matrix for problematic categories:")
+    problem_categories = []
+    for i, category in enumerate(classes):
+        correct = cm[i, i]
+        total = np.sum(cm[i, :])
+        if total > 0 and correct / total < 0.5:  # Less than 50% accuracy
+            problem_categories.append(i)
+
+    if problem_categories:
+        # Extract relevant rows and columns
+        sub_cm = cm[problem_categories, :]
+        sub_classes = [classes[i] for i in problem_categories]
+
+        print("\nActual vs Predicted")
+        print("Actual categories:", sub_classes)
+        print(sub_cm)
+        print("Predicted categories:", list(classes))
+    else:
+        print("No major issues found in category predictions.")
+
+    # Save the model and vectorizer next to this module, where classifier.py loads them
+    joblib.dump(model, os.path.join(MODEL_DIR, "category_classifier_model.pkl"))
+    joblib.dump(vectorizer, os.path.join(MODEL_DIR, "tfidf_vectorizer.pkl"))
+
+    # Memory-mappable copy that the server loads without unpickling
+    export_array_model(model, vectorizer, ARRAY_MODEL_DIR)
+
+    # Published as the newest version, so the server switches to it and state
+    # keyed by the classifier version (snapshots, enriched ledger) is rebuilt
+    os.makedirs(MODEL_STORE, exist_ok=True)
+    manifest = load_manifest()
+    version = (manifest["latest"] or 0) + 1
+    manifest["latest"] = version
+    manifest["versions"].append({
+        "version": version,
+        "kind": "full",
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "rows": len(df),
+    })
+    _save_manifest(manifest)
+    print(f"\nPublished full refit as v{version}")
+
+
+# -----------------------
+# Incremental training (HashingVectorizer + SGDClassifier)
+# -----------------------
+def _save_manifest(manifest):
+    tmp_path = f"{MANIFEST_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def load_new_rows(csv_path, rows_trained):
+    """Reads only the ledger rows appended since the last incremental run"""
+    df = read_ledger(csv_path, skiprows=range(1, rows_trained + 1))
+    rows_read = len(df)
+    df = df.dropna(subset=["Description"])
+    return df, rows_read
+
+
+def train_incremental(csv_path=None):
+    """
+    Updates the online classifier from ledger rows added since the last run.
+
+    New rows are first scored with the previous incremental model
+    (test-then-train), then used for one partial_fit pass. Each run writes a
+    new versioned artifact and a report with the training time and accuracy;
+    being the newest version, it supersedes any earlier full refit.
+
+    Args:
+        csv_path: Ledger to read. If None, uses path from config.
+
+    Returns:
+        The report dict for the new version, or None if there were no new rows
+    """
+    csv_path = csv_path or CONFIG.get("CSV_FILE", "Dataset/account.csv")
+    os.makedirs(MODEL_STORE, exist_ok=True)
+
+    manifest = load_manifest()
+    df, rows_read = load_new_rows(csv_path, manifest["rows_trained"])
+    if df.empty:
+        logger.info("🤖 No new rows since the last training run.")
+        return None
+
+    start = time.perf_counter()
+    label_and_clean(df)
+    vectorizer = make_hashing_vectorizer()
+    X = vectorizer.transform(df["Cleaned_Description"])
+    y = df["Category"].to_numpy()
+
+    # Full refits are recorded in the manifest too, but carry no SGD state to continue from
+    incremental = [entry for entry in manifest["versions"] if entry.get("kind", "incremental") == "incremental"]
+    if incremental:
+        previous = joblib.load(os.path.join(MODEL_STORE, incremental[-1]["artifact"]))
+        model = previous["model"]
+        accuracy = float((model.predict(X) == y).mean())
+    else:
+        model = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+        accuracy = None  # Nothing to evaluate against on the first run
+
+    model.partial_fit(X, y, classes=ALL_CATEGORIES)
+    train_seconds = time.perf_counter() - start
+
+    version = (manifest["latest"] or 0) + 1
+    artifact = f"category_sgd_v{version}.joblib"
+    array_artifact = f"category_sgd_v{version}"
+    # The joblib copy keeps optimizer state for the next partial_fit; the server reads the arrays
+    joblib.dump({"model": model, "vectorizer": vectorizer}, os.path.join(MODEL_STORE, artifact))
+    export_array_model(model, vectorizer, os.path.join(MODEL_STORE, array_artifact))
+
+    report = {
+        "version": version,
+        "kind": "incremental",
+        "artifact": artifact,
+        "array_artifact": array_artifact,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "new_rows": len(df),
+        "rows_trained": manifest["rows_trained"] + rows_read,
+        "train_seconds": round(train_seconds, 3),
+        "prequential_accuracy": accuracy,
+    }
+    with open(os.path.join(MODEL_STORE, f"category_sgd_v{version}.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    manifest["latest"] = version
+    manifest["rows_trained"] = report["rows_trained"]
+    manifest["versions"].append(report)
+    _save_manifest(manifest)
+
+    accuracy_text = f"{accuracy:.2%}" if accuracy is not None else "n/a"
+    logger.info(f"🤖 Trained classifier v{version} on {len(df)} new rows in {train_seconds:.2f}s "
+                f"(accuracy on new rows: {accuracy_text})")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the transaction category classifier")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update the online model from newly ingested rows instead of a full refit")
+    parser.add_argument("--csv", help="ledger CSV to train from (defaults to CSV_FILE in creds.json)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="📘 [%(levelname)s] %(message)s")
+
+    if args.incremental:
+        train_incremental(args.csv)
+    else:
+        train_full(args.csv)
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import uuid
+import pstats
+import cProfile
+import datetime
+import threading
+import tracemalloc
+
+from utils import CONFIG
+
+PROFILE_DIR = CONFIG.get("PROFILE_DIR", os.path.join(os.path.dirname(CONFIG.get("CSV_FILE", "Dataset/account.csv")), "profiles"))
+PROFILE_KEEP = CONFIG.get("PROFILE_KEEP", 20)  # Most recent profile files kept on disk
+SAMPLE_INTERVAL = CONFIG.get("PROFILE_SAMPLE_INTERVAL", 0.005)  # Seconds between stack samples
+
+# tracemalloc is process-wide, so profiled requests run one at a time
+_profile_lock = threading.Lock()
+
+
+class StackSampler:
+    """
+    Sampling profiler for one thread: records the thread's call stack every
+    `interval` seconds and counts identical stacks (collapsed-stack format,
+    readable by flamegraph.pl and speedscope).
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="stack-sampler")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+
+def _prune_profiles():
+    files = sorted((os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)), key=os.path.getmtime)
+    for path in files[:-PROFILE_KEEP]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def profile_call(func, label, mode="cprofile"):
+    """
+    Runs func under a profiler and tracemalloc and stores the profile on disk.
+
+    Args:
+        func: Zero-argument callable to profile
+        label: Short name used in the profile file name (e.g. "dashboard")
+        mode: "cprofile" for a deterministic pstats profile, or "sample" for
+              collapsed stacks from a sampling profiler
+
+    Returns:
+        Tuple of (func's return value, report dict with timings, memory peak,
+        the stored file name and the top functions)
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"{label}-{datetime.datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+    with _profile_lock:
+        was_tracing = tracemalloc.is_tracing()
+        if was_tracing:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+
+        if mode == "sample":
+            profiler = StackSampler(threading.get_ident())
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        start = time.perf_counter()
+        try:
+            result = func()
+        finally:
+            wall_seconds = time.perf_counter() - start
+            if mode == "sample":
+                profiler.stop()
+            else:
+                profiler.disable()
+            _, peak = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+
+    report = {
+        "id": profile_id,
+        "mode": mode,
+        "wall_seconds": round(wall_seconds, 4),
+        "peak_memory_bytes": peak,
+    }
+
+    if mode == "sample":
+        report["file"] = f"{profile_id}.collapsed"
+        with open(os.path.join(PROFILE_DIR, report["file"]), "w", encoding="utf-8") as f:
+            f.write(profiler.collapsed())
+        report["samples"] = sum(profiler.counts.values())
+    else:
+        report["file"] = f"{profile_id}.pstats"
+        profiler.dump_stats(os.path.join(PROFILE_DIR, report["file"]))
+        stats = pstats.Stats(profiler)
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:25]
+        report["top_functions"] = [
+            {
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "calls": calls,
+                "total_seconds": round(total, 4),
+                "cumulative_seconds": round(cumulative, 4),
+            }
+            for (filename, line, name), (_, calls, total, cumulative, _) in top
+        ]
+
+    _prune_profiles()
+    return result, report
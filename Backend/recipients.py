@@ -0,0 +1,83 @@
+import heapq
+
+import pandas as pd
+
+from utils import recipient_column
+from indexes import LedgerIndex
+
+# Index entries are [count, total cents, last date]
+SORT_FIELDS = {"count": 0, "total": 1, "last_date": 2}
+
+
+def recipient_totals(df):
+    """
+    Per-recipient transfer statistics of categorized ledger rows.
+
+    Args:
+        df: Categorized DataFrame with 'Date', 'Description', 'Category' and
+            'Amount_Cents' columns
+
+    Returns:
+        DataFrame with 'Recipient', 'Count', 'Total_Cents' and 'Last_Date'
+        ("YYYY-MM-DD"), most frequent first
+    """
+    transfers = df[df["Category"] == "Transfer"]
+    recipients = recipient_column(transfers["Description"])
+    recipients = recipients[recipients.notna() & (recipients != "")]
+    if recipients.empty:
+        return pd.DataFrame(columns=["Recipient", "Count", "Total_Cents", "Last_Date"])
+
+    grouped = transfers.loc[recipients.index].groupby(recipients.rename("Recipient"))
+    out = pd.DataFrame({
+        "Count": grouped.size(),
+        "Total_Cents": grouped["Amount_Cents"].sum(),
+        "Last_Date": grouped["Date"].max().dt.strftime("%Y-%m-%d"),
+    })
+    return out.sort_values("Count", ascending=False, kind="stable").reset_index()
+
+
+class RecipientIndex(LedgerIndex):
+    """
+    Transfer recipients of the whole ledger: recipient -> [count, total
+    cents, last date]. Updated from appended rows only, so lookups never
+    rescan the transfer history.
+    """
+
+    name = "recipients"
+
+    def empty(self):
+        return {}
+
+    def fold(self, data, chunk):
+        for recipient, count, cents, last_date in recipient_totals(chunk).itertuples(index=False):
+            entry = data.get(recipient)
+            if entry is None:
+                data[recipient] = [int(count), int(cents), last_date]
+            else:
+                entry[0] += int(count)
+                entry[1] += int(cents)
+                entry[2] = max(entry[2], last_date)
+
+    @staticmethod
+    def _record(recipient, entry):
+        count, cents, last_date = entry
+        return {"recipient": recipient, "count": count, "total": cents / 100, "last_date": last_date}
+
+    def top(self, n=10, by="count"):
+        """
+        Args:
+            n: Number of recipients
+            by: "count", "total" or "last_date"
+
+        Returns:
+            List of recipient records, largest first
+        """
+        field = SORT_FIELDS[by]
+        data = self.update()
+        return [self._record(recipient, entry)
+                for recipient, entry in heapq.nlargest(n, data.items(), key=lambda item: item[1][field])]
+
+    def lookup(self, recipient):
+        """The record of one recipient (case-insensitive), or None"""
+        entry = self.update().get(recipient.lower())
+        return self._record(recipient.lower(), entry) if entry is not None else None
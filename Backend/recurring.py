@@ -0,0 +1,160 @@
+import datetime
+
+import pandas as pd
+
+from utils import CONFIG, EXCLUDE_CATEGORIES, recipient_column
+from indexes import LedgerIndex
+
+# Cadence -> (period in days, tolerance in days, minimum occurrences)
+CADENCES = {
+    "weekly": (7, 1, 4),
+    "monthly": (30.44, 4, 3),
+    "annual": (365.25, 12, 2),
+}
+# Share of the gaps between charges that must match the cadence
+MIN_REGULAR_SHARE = 0.75
+# Largest standard deviation of the amounts, relative to their mean, for a stable charge
+AMOUNT_TOLERANCE = CONFIG.get("RECURRING_AMOUNT_TOLERANCE", 0.2)
+# Charge days kept per merchant; enough for cadence and stability, bounded for long histories
+HISTORY_DAYS = 24
+
+
+def merchant_key(descriptions):
+    """
+    Normalizes descriptions to a merchant key: lowercase letters only, first
+    three words, so "NETFLIX.COM 866-579" and "Netflix.com #1234" group together.
+    Transfers are keyed by their payee instead ("ZELLE PAYMENT TO JOHN 1234"
+    -> "to john"), so payments to different people stay apart.
+
+    Returns:
+        Series of keys aligned with `descriptions` ("" when nothing is left)
+    """
+    words = descriptions.astype(str).str.lower().str.replace(r"[^a-z ]+", " ", regex=True).str.split()
+    keys = words.str[:3].str.join(" ")
+    payees = recipient_column(descriptions).str.replace(r"[^a-z0-9]+", "", regex=True)
+    has_payee = payees.notna() & (payees != "")
+    return keys.mask(has_payee, "to " + payees)
+
+
+def detect_recurring(history):
+    """
+    Finds merchants charged on a regular cadence with a stable amount.
+
+    Args:
+        history: DataFrame with 'Merchant', 'Day' (date ordinal) and 'Cents',
+            one row per merchant and charge day
+
+    Returns:
+        DataFrame indexed by merchant with 'Cadence', 'Period', 'Count',
+        'Mean_Cents', 'Last_Cents' and 'Last_Day' of the recurring merchants
+    """
+    h = history.sort_values(["Merchant", "Day"], kind="stable")
+    gaps = h.groupby("Merchant")["Day"].diff()
+    grouped = h.groupby("Merchant")
+    stats = pd.DataFrame({
+        "Count": grouped.size(),
+        "Median_Gap": gaps.groupby(h["Merchant"]).median(),
+        "Mean_Cents": grouped["Cents"].mean(),
+        "Std_Cents": grouped["Cents"].std(ddof=0),
+        "Last_Cents": grouped["Cents"].last(),
+        "Last_Day": grouped["Day"].last(),
+    })
+    stats["Cadence"] = None
+    stats["Period"] = float("nan")
+
+    for cadence, (period, tolerance, min_count) in CADENCES.items():
+        regular = ((gaps - period).abs() <= tolerance).groupby(h["Merchant"]).sum() / (stats["Count"] - 1)
+        match = (stats["Cadence"].isna() & (stats["Count"] >= min_count)
+                 & ((stats["Median_Gap"] - period).abs() <= tolerance) & (regular >= MIN_REGULAR_SHARE))
+        stats.loc[match, "Cadence"] = cadence
+        stats.loc[match, "Period"] = period
+
+    stable = stats["Std_Cents"] <= AMOUNT_TOLERANCE * stats["Mean_Cents"]
+    return stats[stats["Cadence"].notna() & stable]
+
+
+class RecurringIndex(LedgerIndex):
+    """
+    Recurring charges and subscriptions, whether or not the categorization
+    rules know the merchant.
+
+    Keeps the last HISTORY_DAYS charge days of every merchant; an update
+    re-evaluates only the merchants that appear in the appended rows.
+    """
+
+    name = "recurring"
+
+    def empty(self):
+        return {"merchants": {}, "recurring": {}}
+
+    def fold(self, data, chunk):
+        rows = chunk[~chunk["Category"].isin(EXCLUDE_CATEGORIES)]
+        keys = merchant_key(rows["Description"])
+        rows = rows[keys != ""]
+        keys = keys[keys != ""]
+        if rows.empty:
+            return
+
+        grouped = rows.groupby([keys.rename("Merchant"), rows["Date"].dt.normalize()], sort=False)
+        daily = pd.DataFrame({
+            "Cents": grouped["Amount_Cents"].sum(),
+            "Rows": grouped.size(),
+            "Description": grouped["Description"].last(),
+            "Category": grouped["Category"].last().astype(str),
+        }).reset_index()
+
+        merchants = data["merchants"]
+        for merchant, group in daily.groupby("Merchant", sort=False):
+            entry = merchants.setdefault(merchant, {"count": 0, "history": []})
+            days = dict(entry["history"])
+            for day, cents in zip(group["Date"].map(datetime.datetime.toordinal), group["Cents"]):
+                days[day] = days.get(day, 0) + int(cents)
+            entry["history"] = sorted(days.items())[-HISTORY_DAYS:]
+            entry["count"] += int(group["Rows"].sum())
+            entry["description"] = group["Description"].iloc[-1]
+            entry["category"] = group["Category"].iloc[-1]
+
+        self._evaluate(data, daily["Merchant"].unique())
+
+    def _evaluate(self, data, touched):
+        merchants, recurring = data["merchants"], data["recurring"]
+        history = pd.DataFrame(
+            [(merchant, day, cents) for merchant in touched for day, cents in merchants[merchant]["history"]],
+            columns=["Merchant", "Day", "Cents"],
+        )
+        found = detect_recurring(history)
+
+        for merchant in touched:
+            recurring.pop(merchant, None)
+        for merchant, row in found.iterrows():
+            entry = merchants[merchant]
+            recurring[merchant] = {
+                "merchant": entry["description"],
+                "category": entry["category"],
+                "cadence": row["Cadence"],
+                "occurrences": entry["count"],
+                "typical_amount": round(row["Mean_Cents"] / 100, 2),
+                "last_amount": int(row["Last_Cents"]) / 100,
+                "last_date": datetime.date.fromordinal(int(row["Last_Day"])).isoformat(),
+                "next_date": datetime.date.fromordinal(int(round(row["Last_Day"] + row["Period"]))).isoformat(),
+                "annual_cost": round(row["Mean_Cents"] * 365.25 / row["Period"] / 100, 2),
+            }
+
+    def charges(self, active_only=False, today=None):
+        """
+        Args:
+            active_only: Drop charges whose next expected date is well past
+            today: Reference date (defaults to today)
+
+        Returns:
+            List of recurring charges, largest annual cost first; each marked
+            "active" if it is still expected
+        """
+        today = today or datetime.date.today()
+        charges = []
+        for key, charge in self.update()["recurring"].items():
+            tolerance = CADENCES[charge["cadence"]][1]
+            active = datetime.date.fromisoformat(charge["next_date"]) + datetime.timedelta(days=tolerance) >= today
+            if active or not active_only:
+                charges.append({"key": key, **charge, "active": active})
+        return sorted(charges, key=lambda charge: charge["annual_cost"], reverse=True)
@@ -0,0 +1,204 @@
+import os
+import time
+import logging
+import threading
+
+from utils import ledger_version
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightLock:
+    """
+    Non-blocking lock shared by threads and by worker processes on the same host.
+
+    The cross-process part is a lock file created with O_EXCL; a lock file older
+    than `timeout` seconds is treated as left behind by a crashed worker.
+    """
+
+    def __init__(self, path, timeout=600):
+        self.path = path
+        self.timeout = timeout
+        self._thread_lock = threading.Lock()
+
+    def acquire(self):
+        if not self._thread_lock.acquire(blocking=False):
+            return False
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode("ascii"))
+                os.close(fd)
+                return True
+            except FileExistsError:
+                try:
+                    if self._is_stale():
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                break
+        self._thread_lock.release()
+        return False
+
+    def _is_stale(self):
+        """True if the lock file is older than the timeout; raises OSError if it is gone"""
+        return time.time() - os.path.getmtime(self.path) > self.timeout
+
+    def locked(self):
+        if self._thread_lock.locked():
+            return True
+        try:
+            return not self._is_stale()
+        except OSError:
+            return False
+
+    def release(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        self._thread_lock.release()
+
+
+class DashboardRefresher:
+    """
+    Serves dashboard widgets from the shared cache with stale-while-revalidate.
+
+    Each widget is cached under its own key together with the ledger version it
+    was built from, so widgets can be fetched independently and become available
+    one by one during a rebuild. When the ledger changes, requests keep getting
+    the previous results (marked stale) while exactly one background rebuild runs.
+    """
+
+    def __init__(self, cache, key_prefix, widgets, build_widget, csv_path, lock_path, wait_timeout=300):
+        self.cache = cache
+        self.key_prefix = key_prefix
+        self.widgets = list(widgets)
+        self.build_widget = build_widget
+        self.csv_path = csv_path
+        self.lock = SingleFlightLock(lock_path)
+        self.wait_timeout = wait_timeout
+        self._watcher = None
+        self._watcher_lock = threading.Lock()
+
+    def cache_key(self, name):
+        return f"{self.key_prefix}:{name}"
+
+    def widget(self, name):
+        """
+        Returns:
+            Tuple of (widget value, stale flag)
+        """
+        with span("widget_cache", widget=name) as s:
+            version = ledger_version(self.csv_path)
+            entry = self.cache.get(self.cache_key(name))
+
+            if entry is not None:
+                if entry["version"] != version:
+                    s["cache"] = "stale"
+                    self.refresh_async()
+                    return entry["data"], True
+                s["cache"] = "hit"
+                return entry["data"], False
+
+            # Never built: compute just this widget now rather than the whole dashboard
+            s["cache"] = "miss"
+            data = self.build_widget(name, self.csv_path)
+            self.cache.set(self.cache_key(name), {"version": version, "data": data})
+            return data, False
+
+    def current(self):
+        """
+        Returns:
+            Tuple of (dict of every widget, stale flag)
+        """
+        with span("dashboard_cache") as s:
+            entries = self._entries()
+            if None not in entries.values():
+                version = ledger_version(self.csv_path)
+                stale = any(entry["version"] != version for entry in entries.values())
+                s["cache"] = "stale" if stale else "hit"
+                if stale:
+                    self.refresh_async()
+                return {name: entry["data"] for name, entry in entries.items()}, stale
+            s["cache"] = "miss"
+
+        # Nothing to serve yet: build now, or wait for the rebuild already in flight
+        # The deadline applies even after our own rebuild, in case the cache dropped its writes
+        deadline = time.time() + self.wait_timeout
+        while True:
+            self.refresh(raise_errors=True)
+            entries = self._entries()
+            if None not in entries.values():
+                break
+            if time.time() > deadline:
+                raise TimeoutError("Timed out waiting for the dashboard to be built")
+            time.sleep(0.5)
+        version = ledger_version(self.csv_path)
+        stale = any(entry["version"] != version for entry in entries.values())
+        return {name: entry["data"] for name, entry in entries.items()}, stale
+
+    def _entries(self):
+        values = self.cache.get_many(*[self.cache_key(name) for name in self.widgets])
+        return dict(zip(self.widgets, values))
+
+    def refresh(self, raise_errors=False):
+        """
+        Rebuilds outdated widgets if no other thread or worker is already doing it.
+
+        Args:
+            raise_errors: Re-raise build errors instead of only logging them
+
+        Returns:
+            True if this call did the rebuild, False if one was already in flight
+        """
+        if not self.lock.acquire():
+            return False
+        try:
+            # Keep going until every cached widget matches the ledger on disk, but build
+            # each version only once so a cache that drops writes can't keep us here
+            built = None
+            while True:
+                version = ledger_version(self.csv_path)
+                outdated = [name for name, entry in self._entries().items()
+                            if entry is None or entry["version"] != version]
+                if not outdated or version == built:
+                    break
+                start = time.perf_counter()
+                for name in outdated:
+                    data = self.build_widget(name, self.csv_path)
+                    self.cache.set(self.cache_key(name), {"version": version, "data": data})
+                built = version
+                logger.info(f"🔄 Rebuilt {len(outdated)} dashboard widgets for ledger version {version} in {time.perf_counter() - start:.1f}s")
+        except Exception:
+            if raise_errors:
+                raise
+            logger.exception("💥 Background dashboard rebuild failed.")
+        finally:
+            self.lock.release()
+        return True
+
+    def refresh_async(self):
+        """Starts a background rebuild; a no-op if one is already running"""
+        if self.lock.locked():
+            return
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def watch(self, interval):
+        """
+        Polls the ledger version and pre-warms the cache whenever it changes.
+        Starts one watcher thread per process; later calls are no-ops.
+        """
+        def _loop():
+            while True:
+                version = ledger_version(self.csv_path)
+                if any(entry is None or entry["version"] != version for entry in self._entries().values()):
+                    self.refresh()
+                time.sleep(interval)
+
+        with self._watcher_lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=_loop, daemon=True, name="dashboard-refresher")
+                self._watcher.start()
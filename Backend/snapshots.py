@@ -0,0 +1,280 @@
+import os
+import json
+import itertools
+import uuid
+import calendar
+import datetime
+import logging
+import threading
+
+import pandas as pd
+
+from utils import (
+    CONFIG, RULES_FINGERPRINT, LEDGER_COLUMNS, INCOME_CATEGORIES, EXCLUDE_CATEGORIES, ESSENTIAL_CATEGORIES,
+    read_ledger, clean_ledger, categorize_frame, ledger_state_path, write_json_atomic
+)
+from classifier import load_manifest
+from aggregates import rollup, rollup_frame, merge_rollups, ROLLUP_KEYS, ROLLUP_SUMS
+from indexes import LedgerTail
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# A month is closed (no more statements expected) this many days after it ends
+SNAPSHOT_GRACE_DAYS = CONFIG.get("SNAPSHOT_GRACE_DAYS", 45)
+# Most recent closed-month transactions kept as rows, for widgets that list transactions
+SNAPSHOT_RECENT_ROWS = CONFIG.get("STREAMING_TABLE_ROWS", 5000)
+
+
+def month_is_closed(month, today=None):
+    """
+    Args:
+        month: Month as "YYYY-MM"
+        today: Reference date (defaults to today)
+
+    Returns:
+        True once SNAPSHOT_GRACE_DAYS have passed since the month's last day
+    """
+    year, number = map(int, month.split("-"))
+    last_day = datetime.date(year, number, calendar.monthrange(year, number)[1])
+    return (today or datetime.date.today()) > last_day + datetime.timedelta(days=SNAPSHOT_GRACE_DAYS)
+
+
+def month_summary(month_rollup):
+    """
+    Computes a month's snapshot record from its day x category rollup rows.
+
+    Income, expenses and savings follow dashboard.summary_stats; the essential
+    ratio follows the essential-spending gauge.
+
+    Returns:
+        Dict with per-category cents and counts, income/expense/savings cents,
+        the essential ratio (percent) and the row count
+    """
+    category = month_rollup["Category"]
+    is_income = category.isin(INCOME_CATEGORIES)
+    by_category = month_rollup.groupby("Category")[["Normalized_Cents", "Count"]].sum()
+
+    income = int(month_rollup.loc[is_income, "Normalized_Cents"].sum())
+    expenses = int(month_rollup.loc[~category.isin(EXCLUDE_CATEGORIES), "Normalized_Cents"].sum())
+    spending = int(month_rollup.loc[~is_income, "Amount_Cents"].sum())
+    essential = int(month_rollup.loc[~is_income & category.isin(ESSENTIAL_CATEGORIES), "Amount_Cents"].sum())
+
+    return {
+        "rows": int(month_rollup["Count"].sum()),
+        "categories": {
+            name: {"cents": int(row["Normalized_Cents"]), "count": int(row["Count"])}
+            for name, row in by_category.iterrows()
+        },
+        "income_cents": income,
+        "expense_cents": -expenses,
+        "savings_cents": income + expenses,  # Expenses are negative
+        "essential_ratio": round(essential / spending * 100, 2) if spending else None,
+    }
+
+
+class MonthSnapshots(LedgerTail):
+    """
+    Materialized per-month aggregates of an append-only ledger.
+
+    Rows of closed months are categorized once, rolled up by day and category
+    and stored with a month_summary() record; they are never recomputed.
+    Rows of still-open months are kept aside and categorized live on every
+    build, as are the SNAPSHOT_RECENT_ROWS latest closed-month rows, so
+    transaction lists still reach back past the open months. Only ledger
+    bytes appended since the last build are read, so the cost of a build
+    follows the open months' volume, not the ledger's age.
+
+    State lives next to the ledger (see ledger_state_path):
+    month_snapshots.<ledger>.json (snapshots, the ledger offset already
+    consumed) and CSVs of the open months' and recent closed rows. Snapshotted labels
+    include the classifier's fallback predictions, so everything is rebuilt
+    from scratch if the categorization rules or the classifier version
+    change, or the ledger is rewritten rather than appended to.
+    """
+
+    def __init__(self, csv_path, state_file=None):
+        super().__init__(csv_path)
+        self.state_file = state_file or ledger_state_path(csv_path, "month_snapshots.json")
+        self._lock = threading.Lock()
+
+    # -----------------------
+    # State
+    # -----------------------
+    def _empty_state(self, model=None):
+        return {"rules": RULES_FINGERPRINT, "model": model, "offset": 0, "head": None, "open_rows": None,
+                "recent_rows": None, "months": {}}
+
+    def _open_rows_path(self, name):
+        return os.path.join(os.path.dirname(self.state_file), name)
+
+    def _load_state(self):
+        """
+        Returns:
+            Tuple of (state dict, list with the cleaned open rows, if any,
+            cleaned recent closed-month rows)
+        """
+        model = load_manifest()["latest"]
+        empty = pd.DataFrame(columns=LEDGER_COLUMNS)
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return self._empty_state(model), [], empty
+
+        # State from before recent rows were kept can't fill the transaction list either
+        if not self._is_continuation(state, model) or "recent_rows" not in state:
+            logger.info("📦 Ledger, categorization rules or classifier changed; rebuilding month snapshots.")
+            return self._empty_state(model), [], empty
+
+        try:
+            open_rows = [self._read_rows(state["open_rows"])] if state["open_rows"] else []
+            recent = self._read_rows(state["recent_rows"]) if state["recent_rows"] else empty
+        except (OSError, ValueError):
+            # Without the open rows the offset can't be trusted; start over
+            logger.warning("⚠️ Open-month rows are missing; rebuilding month snapshots.")
+            return self._empty_state(model), [], empty
+        return state, open_rows, recent
+
+    def _read_rows(self, name):
+        return clean_ledger(read_ledger(self._open_rows_path(name)))
+
+    def _write_rows(self, kind, rows):
+        """Writes raw ledger rows to a new state CSV and returns its file name"""
+        name = f"{os.path.splitext(os.path.basename(self.state_file))[0]}.{kind}.{uuid.uuid4().hex[:8]}.csv"
+        path = self._open_rows_path(name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if rows.empty:
+            pd.DataFrame(columns=LEDGER_COLUMNS).to_csv(path, index=False)
+        else:
+            rows[LEDGER_COLUMNS].assign(Date=rows["Date"].dt.strftime("%Y-%m-%d")).to_csv(
+                path, index=False, float_format="%.2f")
+        return name
+
+    def _save(self, state, open_rows, recent):
+        """Writes the open and recent rows to new files, then points the state file at them"""
+        previous = [state["open_rows"], state["recent_rows"]]
+        state["open_rows"] = self._write_rows("open_rows", open_rows)
+        state["recent_rows"] = self._write_rows("recent_rows", recent)
+        write_json_atomic(self.state_file, state)
+
+        for name in filter(None, previous):
+            try:
+                os.remove(self._open_rows_path(name))
+            except OSError:
+                pass
+
+    # -----------------------
+    # Build
+    # -----------------------
+    def update(self, today=None):
+        """
+        Folds newly appended ledger rows into the snapshots.
+
+        Returns:
+            Tuple of (dict of closed-month records keyed by "YYYY-MM", DataFrame
+            of the raw, cleaned rows of the open months, DataFrame of the
+            SNAPSHOT_RECENT_ROWS latest raw, cleaned closed-month rows)
+        """
+        with self._lock, span("month_snapshots") as s:
+            state, previous_open, recent = self._load_state()
+            end = self._complete_end(state["offset"])
+
+            # Chunk by chunk, so the first build of a long history stays bounded too
+            closed_rollups, open_parts, recent_parts = [], [], [recent]
+            s["rows"] = 0
+            for chunk in itertools.chain(previous_open, self._new_chunks(state["offset"], end)):
+                s["rows"] += len(chunk)
+                months = chunk["Date"].dt.strftime("%Y-%m")
+                closed = months.map({month: month_is_closed(month, today) for month in months.unique()}).astype(bool)
+                if closed.any():
+                    closed_rows = chunk[closed]
+                    closed_rollups.append(rollup(categorize_frame(closed_rows.copy())))
+                    recent_parts.append(closed_rows.nlargest(SNAPSHOT_RECENT_ROWS, "Date", keep="last"))
+                open_parts.append(chunk[~closed])
+
+            open_rows = pd.concat(open_parts, ignore_index=True) if open_parts else pd.DataFrame(columns=LEDGER_COLUMNS)
+            newly_closed = self._snapshot(state, closed_rollups)
+            if newly_closed:
+                recent = pd.concat([part for part in recent_parts if not part.empty], ignore_index=True)
+                recent = recent.nlargest(SNAPSHOT_RECENT_ROWS, "Date", keep="last").sort_values("Date", kind="stable")
+            if end != state["offset"] or newly_closed:
+                state["head"] = self._ledger_head(end)
+                state["offset"] = end
+                self._save(state, open_rows, recent)
+                if newly_closed:
+                    logger.info(f"📦 Snapshotted closed months: {', '.join(sorted(newly_closed))}")
+
+            return state["months"], open_rows, recent
+
+    def _snapshot(self, state, closed_rollups):
+        """Merges rollups of newly closed rows into their month's snapshot record"""
+        if not closed_rollups:
+            return set()
+
+        new_rollup = merge_rollups(closed_rollups)
+        touched = set()
+        for month, part in new_rollup.groupby(new_rollup["Date"].dt.strftime("%Y-%m")):
+            previous = state["months"].get(month)
+            if previous is not None:
+                # A late statement for a month that was already closed
+                part = merge_rollups([self._records_to_rollup(previous["rollup"]), part])
+            record = month_summary(part)
+            record["rollup"] = [
+                [day.strftime("%Y-%m-%d"), category, int(amount), int(normalized), int(count)]
+                for day, category, amount, normalized, count
+                in part[ROLLUP_KEYS + ROLLUP_SUMS + ["Count"]].itertuples(index=False)
+            ]
+            state["months"][month] = record
+            touched.add(month)
+        return touched
+
+    @staticmethod
+    def _records_to_rollup(records):
+        df = pd.DataFrame(records, columns=ROLLUP_KEYS + ROLLUP_SUMS + ["Count"])
+        df["Date"] = pd.to_datetime(df["Date"], format="%Y-%m-%d")
+        return df
+
+    def frames(self, today=None):
+        """
+        Returns:
+            Tuple of (rollup frame of the whole ledger: stored closed months plus
+            the open months categorized now, categorized rows of the open months
+            and the SNAPSHOT_RECENT_ROWS latest closed-month rows, oldest first)
+        """
+        months, open_rows, recent = self.update(today)
+        parts = [self._records_to_rollup(record["rollup"]) for _, record in sorted(months.items())]
+
+        if not open_rows.empty:
+            categorize_frame(open_rows)
+            parts.append(rollup(open_rows))
+
+        if parts:
+            df = pd.concat(parts, ignore_index=True).sort_values(ROLLUP_KEYS, kind="stable").reset_index(drop=True)
+        else:
+            df = pd.DataFrame(columns=ROLLUP_KEYS + ROLLUP_SUMS + ["Count"])
+
+        if recent.empty:
+            return rollup_frame(df), open_rows
+        categorize_frame(recent)
+        rows = pd.concat([recent, open_rows], ignore_index=True) if not open_rows.empty else recent
+        return rollup_frame(df), rows
+
+    def summaries(self, today=None):
+        """
+        Returns:
+            List of month records (without rollup rows), oldest first; open
+            months are computed live and marked "closed": False
+        """
+        months, open_rows, _ = self.update(today)
+        records = [
+            {"month": month, "closed": True, **{k: v for k, v in record.items() if k != "rollup"}}
+            for month, record in sorted(months.items())
+        ]
+
+        if not open_rows.empty:
+            open_rollup = rollup(categorize_frame(open_rows))
+            for month, part in open_rollup.groupby(open_rollup["Date"].dt.strftime("%Y-%m")):
+                records.append({"month": month, "closed": False, **month_summary(part)})
+            records.sort(key=lambda record: record["month"])
+        return records
@@ -1,85 +1,194 @@
+"""
+Headless reports over the ledger, for nightly batches and the terminal.
+
+Reads the state the server already keeps, and computes totals with the
+dashboard's own formulas:
+
+- summary and categories only sum, so they read the same frame as the
+  dashboard's summing widgets (the month snapshots by default, where only
+  the open months are categorized);
+- recipients reads the recipient index, unless a date scope is given;
+- transfers, other and scoped recipients list individual rows, so they read
+  the full prepared ledger through its on-disk enriched-ledger cache.
+
+Usage:
+    python sum.py summary
+    python sum.py categories --month 2025-03 --format csv
+    python sum.py transfers --start 2025-01-01 --end 2025-06-30
+    python sum.py recipients --top 10 --format json
+    python sum.py other --year 2025
+"""
+import sys
+import json
+import argparse
 import pandas as pd
-import re
-from collections import Counter
 
 # Import shared functionality from utils module
-from utils import (
-    load_data, 
-    categorize, 
-    normalize_transaction, 
-    extract_recipients, 
-    CONFIG,
-    EXPENSE_CATEGORIES,
-    INCOME_CATEGORIES
-)
-
-# Load preprocessed data using the utility function
-df = load_data()
-
-# Calculate total amount by category using the normalized amounts
-category_totals = df.groupby('Category')['Normalized_Amount'].sum().sort_values()
-
-# Print category totals
-for category, total in category_totals.items():
-    print(f"{category:<20} ${total:>14,.2f}")
-
-# Show original totals for comparison/verification
-orig_totals = df.groupby('Category')['Amount'].sum().sort_values()
-for category, total in orig_totals.items():
-    print(f"{category:<20} ${total:>14,.2f}")
-
-# Display internal transfers
-internal_transfers = df[df['Category'] == 'Internal Transfer'].sort_values('Date')
-if len(internal_transfers) > 0:
-    for _, row in internal_transfers.iterrows():
-        date_str = row['Date'].strftime('%Y-%m-%d')
-        print(f"{date_str:<12} ${row['Amount']:>9,.2f} {row['Type']:<10} {row['Description'][:50]}")
-    
-    # Calculate net effect of internal transfers
-    net_internal = internal_transfers['Amount'].sum()
-    print(f"\nNet effect of internal transfers: ${net_internal:,.2f}")
-    print(f"Total internal transfers: {len(internal_transfers)} transactions")
-else:
-    print("No internal transfers found")
-
-# Display transactions categorized as "Other"
-other_transactions = df[df['Category'] == 'Other'].sort_values('Date')
-for _, row in other_transactions.iterrows():
-    date_str = row['Date'].strftime('%Y-%m-%d')
-    print(f"{date_str:<12} ${row['Amount']:>9,.2f} {row['Type']:<10} {row['Description'][:50]}")
-
-# Display transfer transactions with recipient analysis
-transfer_transactions = df[df['Category'] == 'Transfer'].sort_values('Date')
-if len(transfer_transactions) > 0:
-    for _, row in transfer_transactions.iterrows():
-        date_str = row['Date'].strftime('%Y-%m-%d')
-        print(f"{date_str:<12} ${row['Amount']:>9,.2f} {row['Type']:<10} {row['Description'][:50]}")
-
-    # Show the top recipients of transfers (extract names from descriptions)
-    try:
-        # Use the extract_recipients utility function
-        recipients = extract_recipients(transfer_transactions['Description'])
-        
-        # Count occurrences of each recipient
-        recipient_counts = Counter(recipients)
-        
-        if recipient_counts:
-            print("\nTop transfer recipients:")
-            for recipient, count in recipient_counts.most_common(5):
-                print(f"- {recipient.title()}: {count} transfers")
-    except:
-        pass  # Skip this analysis if there's any error
-else:
-    print("No transfer transactions found")
-
-# Calculate true savings (income minus expenses, excluding internal transfers)
-total_income = df[df['Category'] == 'Income']['Normalized_Amount'].sum()
-total_expenses = df[(df['Category'] != 'Income') & (df['Category'] != 'Internal Transfer')]['Normalized_Amount'].sum()
-savings = total_income + total_expenses  # Expenses are negative, so we add
-
-print(f"\nTotal Income: ${total_income:,.2f}")
-print(f"Total Expenses: ${abs(total_expenses):,.2f}")
-print(f"Total Savings: ${savings:,.2f}")
-print(f"Savings Rate: {(savings/total_income*100 if total_income > 0 else 0):,.2f}%")
+from utils import CONFIG
+from dashboard import load_dashboard_frame, load_dashboard_frames, summary_stats
+from indexes import for_ledger
+from recipients import RecipientIndex, recipient_totals
+
+TRANSFER_CATEGORIES = ["Internal Transfer", "Transfer"]
+ROW_COLUMNS = ["Date", "Amount", "Type", "Description", "Bank", "Category"]
+# Reports that only sum amounts, so a day x category rollup serves them
+ROLLUP_REPORTS = {"summary", "categories"}
+
+
+# -----------------------
+# Scope
+# -----------------------
+def scope_frame(df, start=None, end=None, month=None, year=None):
+    """
+    Restricts the ledger to a date scope.
+
+    Args:
+        df: Prepared ledger
+        start, end: Inclusive "YYYY-MM-DD" bounds
+        month: "YYYY-MM"
+        year: Calendar year
+
+    Returns:
+        The rows inside every given bound
+    """
+    mask = pd.Series(True, index=df.index)
+    if start:
+        mask &= df["Date"] >= pd.Timestamp(start)
+    if end:
+        mask &= df["Date"] < pd.Timestamp(end) + pd.Timedelta(days=1)
+    if month:
+        mask &= df["Date"].dt.strftime("%Y-%m") == month
+    if year:
+        mask &= df["Date"].dt.year == year
+    return df[mask]
+
+
+def load_report_frame(args):
+    """
+    The ledger frame a report reads, restricted to the requested scope.
+
+    Returns:
+        Prepared rollup or ledger frame, or None for an unscoped recipients
+        report, which reads the recipient index instead
+    """
+    scoped = any([args.start, args.end, args.month, args.year])
+    if args.report == "recipients" and not scoped:
+        return None
+    if args.report in ROLLUP_REPORTS:
+        df = load_dashboard_frames(args.csv)[0]
+    else:
+        df = load_dashboard_frame(args.csv)
+    return scope_frame(df, args.start, args.end, args.month, args.year)
+
+
+# -----------------------
+# Reports
+# -----------------------
+def summary_report(df, args):
+    """Income, expenses, savings and savings rate, as on the dashboard"""
+    rows = df["Count"].sum() if "Count" in df else len(df)
+    return {"rows": int(rows), **summary_stats(df)}
+
+
+def category_report(df, args):
+    """Normalized and original totals per category"""
+    grouped = df.groupby("Category", observed=True)
+    totals = pd.DataFrame({
+        "Normalized_Amount": grouped["Normalized_Cents"].sum() / 100,
+        "Amount": grouped["Amount_Cents"].sum() / 100,
+        "Count": grouped["Count"].sum() if "Count" in df else grouped.size(),
+    })
+    return totals.sort_values("Normalized_Amount").reset_index()
+
+
+def rows_report(df, categories):
+    rows = df.loc[df["Category"].isin(categories), ROW_COLUMNS].sort_values("Date", kind="stable")
+    return rows.assign(Category=rows["Category"].astype(str)).reset_index(drop=True)
+
+
+def transfer_report(df, args):
+    """Internal Transfer and Transfer rows"""
+    return rows_report(df, TRANSFER_CATEGORIES)
+
+
+def other_report(df, args):
+    """Rows neither the rules nor the classifier could categorize"""
+    return rows_report(df, ["Other"])
+
+
+def recipient_report(df, args):
+    """Most frequent recipients of transfers, with their totals and last transfer"""
+    if df is None:
+        records = for_ledger(RecipientIndex, args.csv).top(args.top)
+        totals = pd.DataFrame(records, columns=["recipient", "count", "total", "last_date"])
+        totals.columns = ["Recipient", "Count", "Amount", "Last_Date"]
+    else:
+        totals = recipient_totals(df).head(args.top)
+        totals["Amount"] = totals["Total_Cents"] / 100
+    return pd.DataFrame({
+        "Recipient": totals["Recipient"].str.title(),
+        "Transfers": totals["Count"],
+        "Amount": totals["Amount"],
+        "Last_Date": totals["Last_Date"],
+    })
+
+
+REPORTS = {
+    "summary": summary_report,
+    "categories": category_report,
+    "transfers": transfer_report,
+    "recipients": recipient_report,
+    "other": other_report,
+}
+
+
+# -----------------------
+# Output
+# -----------------------
+def format_frame(report, fmt):
+    """Formats a report frame column by column instead of row by row"""
+    if "Date" in report:
+        report = report.assign(Date=report["Date"].dt.strftime("%Y-%m-%d"))
+    if fmt == "json":
+        return report.to_json(orient="records", indent=2)
+    if fmt == "csv":
+        return report.to_csv(index=False, float_format="%.2f")
+
+    formatters = {
+        column: "${:,.2f}".format for column in ("Amount", "Normalized_Amount") if column in report
+    }
+    if "Description" in report:
+        report = report.assign(Description=report["Description"].str.slice(0, 50))
+    return report.to_string(index=False, formatters=formatters) if not report.empty else "No matching transactions"
+
+
+def format_report(report, fmt):
+    if isinstance(report, pd.DataFrame):
+        return format_frame(report, fmt)
+    if fmt == "json":
+        return json.dumps(report, indent=2)
+    if fmt == "csv":
+        return "\n".join(["key,value"] + [f"{key},{value}" for key, value in report.items()])
+    return "\n".join(
+        f"{key:<22} {value:>14,.2f}" if isinstance(value, float) else f"{key:<22} {value:>14,}"
+        for key, value in report.items()
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ledger reports that agree with the dashboard")
+    parser.add_argument("report", choices=REPORTS, help="report to print")
+    parser.add_argument("--csv", default=CONFIG.get("CSV_FILE", "Dataset/account.csv"), help="ledger to read")
+    parser.add_argument("--format", choices=["table", "json", "csv"], default="table", help="output format")
+    parser.add_argument("--start", help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last date to include (YYYY-MM-DD)")
+    parser.add_argument("--month", help="only this month (YYYY-MM)")
+    parser.add_argument("--year", type=int, help="only this year")
+    parser.add_argument("--top", type=int, default=5, help="recipients to list")
+    args = parser.parse_args(argv)
+
+    print(format_report(REPORTS[args.report](load_report_frame(args), args), args.format))
 
 
+if __name__ == "__main__":
+    sys.exit(main())
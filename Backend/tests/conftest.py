@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+from utils import append_transactions
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Keeps derived state and the categorization cache out of the real Dataset folder"""
+    monkeypatch.setitem(utils.CONFIG, "STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setitem(utils.CONFIG, "CATEGORY_CACHE_FILE", str(tmp_path / "category_cache.json"))
+    # Keyword rules only, so categories don't depend on the trained model
+    monkeypatch.setitem(utils.CONFIG, "ML_FALLBACK", False)
+
+
+# Ledger rows as the extractors return them: [date, cents, type, description, bank]
+LEDGER_ROWS = [
+    ["2024-01-03", 1599, "Purchase", "NETFLIX.COM 866-579", "Chase Credit Card"],
+    ["2024-01-05", 4213, "Purchase", "KROGER #512", "Chase Credit Card"],
+    ["2024-01-09", 2500, "Debit", "ZELLE PAYMENT TO JOHN 1234", "PNC"],
+    ["2024-01-15", 120000, "Debit", "RENT PAYMENT MCLEAN", "PNC"],
+    ["2024-01-20", 5000, "Debit", "ZELLE TO MARY SMITH", "PNC"],
+    ["2024-02-03", 1599, "Purchase", "Netflix.com #1234", "Chase Credit Card"],
+    ["2024-02-07", 3877, "Purchase", "KROGER #512", "Chase Credit Card"],
+    ["2024-02-10", 2500, "Debit", "ZELLE PAYMENT TO JOHN 1234", "PNC"],
+    ["2024-02-15", 120000, "Debit", "RENT PAYMENT MCLEAN", "PNC"],
+    ["2024-02-21", 250000, "Deposits and Other Additions", "PAYROLL ACME CORP", "PNC"],
+    ["2024-03-03", 1599, "Purchase", "NETFLIX.COM 866-579", "Chase Credit Card"],
+    ["2024-03-08", 980, "Purchase", "STARBUCKS STORE 88", "Chase Credit Card"],
+    ["2024-03-12", 7500, "Debit", "ZELLE TO MARY SMITH", "PNC"],
+    ["2024-03-15", 120000, "Debit", "RENT PAYMENT MCLEAN", "PNC"],
+]
+
+# Rows appended after the first build, including a merchant and recipient not seen before
+APPENDED_ROWS = [
+    ["2024-04-03", 1599, "Purchase", "NETFLIX.COM 866-579", "Chase Credit Card"],
+    ["2024-04-06", 4499, "Purchase", "KROGER #512", "Chase Credit Card"],
+    ["2024-04-11", 2500, "Debit", "ZELLE PAYMENT TO JOHN 1234", "PNC"],
+    ["2024-04-12", 9900, "Debit", "ZELLE TO ALEX 77", "PNC"],
+    ["2024-04-15", 120000, "Debit", "RENT PAYMENT MCLEAN", "PNC"],
+    ["2024-04-18", 89900, "Purchase", "BEST BUY 00123", "Chase Credit Card"],
+]
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    """Path of a small ledger CSV written with append_transactions"""
+    path = str(tmp_path / "account.csv")
+    append_transactions(path, LEDGER_ROWS, mode="w")
+    return path
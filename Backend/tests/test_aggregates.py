@@ -0,0 +1,50 @@
+import pandas as pd
+
+from utils import load_data, iter_ledger, append_transactions
+from aggregates import LedgerAggregates, rollup, merge_rollups, ROLLUP_KEYS
+
+from conftest import APPENDED_ROWS
+
+
+def test_chunked_rollup_equals_whole_ledger(ledger):
+    append_transactions(ledger, APPENDED_ROWS)
+    df = load_data(ledger)
+
+    aggregates = LedgerAggregates()
+    for chunk in iter_ledger(ledger, chunksize=3):
+        aggregates.fold(chunk)
+    frame = aggregates.frame()
+
+    expected = rollup(df).sort_values(ROLLUP_KEYS, kind="stable").reset_index(drop=True)
+    pd.testing.assert_frame_equal(frame[expected.columns], expected, check_dtype=False)
+    assert aggregates.rows == len(df)
+    assert frame["Count"].sum() == len(df)
+    assert frame["Normalized_Cents"].sum() == df["Normalized_Cents"].sum()
+    assert frame["Amount"].sum() == df["Amount_Cents"].sum() / 100
+
+
+def test_monthly_category_sums_match_rows(ledger):
+    df = load_data(ledger)
+    frame = LedgerAggregates().fold(df.copy()).frame()
+
+    def monthly(rows):
+        return rows.groupby([rows["Date"].dt.strftime("%Y-%m"), rows["Category"].astype(str)])["Normalized_Cents"].sum()
+
+    pd.testing.assert_series_equal(monthly(frame), monthly(df), check_dtype=False)
+
+
+def test_recent_rows_span_chunks(ledger):
+    append_transactions(ledger, APPENDED_ROWS)
+    aggregates = LedgerAggregates(recent_rows=4)
+    for chunk in iter_ledger(ledger, chunksize=5):
+        aggregates.fold(chunk)
+    recent = aggregates.recent()
+    assert recent["Date"].dt.strftime("%Y-%m-%d").tolist() == [row[0] for row in APPENDED_ROWS[-4:]]
+
+
+def test_merge_rollups_adds_shared_keys(ledger):
+    df = load_data(ledger)
+    halves = [rollup(df.iloc[::2]), rollup(df.iloc[1::2])]
+    merged = merge_rollups(halves).sort_values(ROLLUP_KEYS).reset_index(drop=True)
+    whole = rollup(df).sort_values(ROLLUP_KEYS).reset_index(drop=True)
+    pd.testing.assert_frame_equal(merged, whole, check_dtype=False)
@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import anomalies
+from anomalies import AnomalyIndex, running_stats, fold_stats, sketch_buckets, sketch_quantile
+from utils import append_transactions
+
+
+def welford(keys, values, prior=None):
+    """
+    Row-by-row Welford update.
+
+    Returns:
+        Tuple of ((count, mean, std) of the earlier values of each row's key,
+        final key -> [count, mean, M2])
+    """
+    stats = {key: list(entry) for key, entry in (prior or {}).items()}
+    out = []
+    for key, x in zip(keys, values):
+        n, mean, m2 = stats.get(key, (0, 0.0, 0.0))
+        out.append((n, mean, math.sqrt(m2 / n) if n else 0.0))
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        stats[key] = [n, mean, m2 + delta * (x - mean)]
+    return out, stats
+
+
+@pytest.mark.parametrize("scale", [1.0, 1e9])
+def test_running_stats_matches_welford(scale):
+    rng = np.random.default_rng(0)
+    keys = pd.Series(rng.choice(["a", "b", "c", "d"], size=2000))
+    x = pd.Series(scale + rng.lognormal(3, 1, size=2000).round(2) * 100)
+
+    prior = {}
+    fold_stats(keys[:1000], x[:1000], prior)
+    n, mean, std = running_stats(keys[1000:], x[1000:], prior)
+
+    _, welford_prior = welford(keys[:1000], x[:1000])
+    expected, _ = welford(keys[1000:], x[1000:], welford_prior)
+    assert n.tolist() == [row[0] for row in expected]
+    np.testing.assert_allclose(mean, [row[1] for row in expected], rtol=1e-9)
+    np.testing.assert_allclose(std, [row[2] for row in expected], rtol=1e-6, atol=1e-6)
+
+
+def test_sketch_quantile_is_within_gamma():
+    cents = np.random.default_rng(1).lognormal(7, 1.5, size=10_000).round()
+    buckets, counts = np.unique(sketch_buckets(cents), return_counts=True)
+    sketch = {str(bucket): int(count) for bucket, count in zip(buckets, counts)}
+    for q in (50, 95, 99):
+        exact = np.percentile(cents, q, method="lower")
+        assert abs(sketch_quantile(sketch, q) / exact - 1) <= anomalies.SKETCH_GAMMA - 1
+    assert sketch_quantile({}, 50) is None
+
+
+def test_large_charge_is_flagged(ledger, monkeypatch):
+    monkeypatch.setattr(anomalies, "ANOMALY_MIN_HISTORY", 3)
+    append_transactions(ledger, [
+        ["2024-04-06", 3990, "Purchase", "KROGER #512", "Chase Credit Card"],
+        ["2024-04-20", 62000, "Purchase", "KROGER #512", "Chase Credit Card"],
+    ])
+    flagged = [row for row in AnomalyIndex(ledger).flagged() if row["merchant"] == "kroger"]
+    assert [row["amount"] for row in flagged] == [620.0]
+    assert "this merchant's average" in " ".join(flagged[0]["reasons"])
@@ -0,0 +1,79 @@
+import datetime
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import budgets
+from budgets import BudgetIndex, record_forecast, load_forecast, forecast_path
+
+
+@pytest.fixture(autouse=True)
+def budget_config(monkeypatch):
+    monkeypatch.setattr(budgets, "BUDGETS", {"Rent": 1000.0, "Food & Dining": 50.0, "Groceries": 100.0})
+
+
+def test_month_spend_per_category(ledger):
+    spent = BudgetIndex(ledger).update()
+    assert spent["2024-01"]["Groceries"] == 4213
+    assert spent["2024-02"]["Rent"] == 120000
+    assert "Income" not in spent["2024-02"]
+
+
+def test_status_of_open_month(ledger):
+    status = BudgetIndex(ledger).status("2024-03", today=datetime.date(2024, 3, 15))
+    assert (status["days_elapsed"], status["days_in_month"]) == (15, 31)
+
+    rent = status["categories"]["Rent"]
+    assert rent["status"] == "over"
+    assert rent["remaining"] == -200.0
+
+    food = status["categories"]["Food & Dining"]
+    assert food["spent"] == 9.8
+    assert food["burn_rate"] == round(9.8 / 15, 2)
+    assert food["projected"] == round(9.8 / 15 * 31, 2)
+    assert food["status"] == "ok"
+
+    assert status["categories"]["Groceries"]["spent"] == 0
+    assert status["total"]["spent"] == 1209.8
+    assert status["total"]["forecast"] is None
+
+
+def test_status_of_past_and_future_months(ledger):
+    index = BudgetIndex(ledger)
+    assert index.status("2024-02", today=datetime.date(2024, 3, 15))["days_elapsed"] == 29
+    assert index.status("2024-04", today=datetime.date(2024, 3, 15))["days_elapsed"] == 0
+
+
+def test_forecast_raises_projection(ledger):
+    forecast = pd.DataFrame({"ds": pd.to_datetime(["2024-03-01", "2024-04-01"]), "yhat": [48.0, -5.0]})
+    record_forecast(ledger, "Food & Dining", forecast)
+    assert load_forecast(ledger, "Food & Dining") == {"2024-03": 48.0, "2024-04": 0.0}
+
+    food = BudgetIndex(ledger).status("2024-03", today=datetime.date(2024, 3, 15))["categories"]["Food & Dining"]
+    assert food["forecast"] == 48.0
+    assert food["status"] == "at_risk"
+
+
+def test_each_forecast_has_its_own_file(ledger, tmp_path):
+    other = str(tmp_path / "benchmark" / "ledger.csv")
+    record_forecast(ledger, "overall", pd.DataFrame({"ds": pd.to_datetime(["2024-03-01"]), "yhat": [900.0]}))
+    record_forecast(ledger, "Food & Dining", pd.DataFrame({"ds": pd.to_datetime(["2024-03-01"]), "yhat": [40.0]}))
+    record_forecast(other, "overall", pd.DataFrame({"ds": pd.to_datetime(["2024-03-01"]), "yhat": [5.0]}))
+
+    assert len({forecast_path(ledger, "overall"), forecast_path(ledger, "Food & Dining"), forecast_path(other, "overall")}) == 3
+    assert os.path.basename(forecast_path(ledger, "Food & Dining")).startswith("food_dining.")
+    with open(forecast_path(ledger, "overall"), encoding="utf-8") as f:
+        assert json.load(f) == {"2024-03": 900.0}
+    assert load_forecast(other, "overall") == {"2024-03": 5.0}
+    assert load_forecast(ledger, "Rent") == {}
+
+
+def test_failed_forecast_write_is_logged(ledger, monkeypatch, caplog):
+    def fail(path, data):
+        raise OSError("disk full")
+    monkeypatch.setattr(budgets, "write_json_atomic", fail)
+    record_forecast(ledger, "overall", pd.DataFrame({"ds": pd.to_datetime(["2024-03-01"]), "yhat": [900.0]}))
+    assert "disk full" in caplog.text
+    assert load_forecast(ledger, "overall") == {}
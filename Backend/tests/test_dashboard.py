@@ -0,0 +1,28 @@
+import pandas as pd
+
+from utils import INCOME_CATEGORIES, EXCLUDE_CATEGORIES, ESSENTIAL_CATEGORIES, load_data
+from dashboard import prepare_dashboard_frame
+
+
+def test_masks_and_month_match_per_widget_logic(ledger):
+    df = load_data(ledger)
+    categories = df["Category"].astype(str)
+    prepare_dashboard_frame(df)
+
+    # What each widget used to compute from the category strings on its own
+    assert df["Is_Income"].tolist() == categories.isin(INCOME_CATEGORIES).tolist()
+    assert df["Is_Excluded"].tolist() == categories.isin(EXCLUDE_CATEGORIES).tolist()
+    assert df["Is_Expense"].tolist() == (~categories.isin(EXCLUDE_CATEGORIES)).tolist()
+    assert df["Is_Essential"].tolist() == categories.isin(ESSENTIAL_CATEGORIES).tolist()
+    assert df["Month"].dt.strftime("%Y-%m").tolist() == df["Date"].dt.strftime("%Y-%m").tolist()
+    assert (df["Month"].dt.day == 1).all()
+    assert df["Predicted Category"].astype(str).tolist() == categories.tolist()
+    assert isinstance(df["Category"].dtype, pd.CategoricalDtype)
+
+
+def test_masks_cover_every_category(ledger):
+    df = prepare_dashboard_frame(load_data(ledger))
+    assert set(df.loc[df["Is_Income"], "Category"]) == {"Income"}
+    assert not (df["Is_Expense"] & df["Is_Excluded"]).any()
+    assert (df["Is_Expense"] | df["Is_Excluded"]).all()
+    assert set(df.loc[df["Is_Essential"], "Category"]) == {"Rent", "Groceries"}
@@ -0,0 +1,100 @@
+import re
+import time
+
+import pytest
+
+from date import format_date
+from utils import parse_cents
+from benchmark import STATEMENT_BANKS, generate_statement_text, generate_pathological_text
+from extract import (
+    ParseTimeout, registry, extract_transactions, extract_transactions_pnc, extract_transactions_discover_card
+)
+
+FILENAME = "Statement_20240131.pdf"
+
+
+# -----------------------
+# Reference parsers
+# -----------------------
+# The DOTALL regex parsers the line scanners replaced, kept as oracles for well-formed statements
+def regex_pnc(text, filename):
+    sections = {
+        "Deposits and Other Additions": r"Deposits and Other Additions.*?Date Amount Description(.*?)Banking/Debit Card Withdrawals",
+        "Banking/Debit Card Withdrawals and Purchases": r"Banking/Debit Card Withdrawals.*?Date Amount Description(.*?)Online and Electronic Banking Deductions",
+        "Online and Electronic Banking Deductions": r"Online and Electronic Banking Deductions.*?Date Amount Description(.*?)(?:Daily Balance|Page \d+ of \d+)"
+    }
+    transactions = []
+    for trans_type, pattern in sections.items():
+        match = re.search(pattern, text, re.DOTALL)
+        if match:
+            entries = re.findall(r"(\d{2}/\d{2})\s+([\d,.]+)\s+(.+?)(?=\n\d{2}/\d{2}|\Z)", match.group(1), re.DOTALL)
+            for date, amount, desc in entries:
+                transactions.append([format_date(date.strip(), filename).strip(), parse_cents(amount), trans_type,
+                                     " ".join(desc.split()), "PNC"])
+    return transactions
+
+
+def regex_discover(text, filename):
+    transactions = []
+    rows = re.findall(r"(\d{2}/\d{2}/\d{2})\s+(\d{2}/\d{2}/\d{2})\s+(.+?)\$\s*(-?\d+\.\d{2})", text, re.DOTALL)
+    for trans_date, post_date, desc, amount in rows:
+        type_ = "Credit" if "-" in amount else "Purchase"
+        transactions.append([format_date(trans_date.strip(), filename), parse_cents(amount), type_,
+                             " ".join(desc.strip().split()), "Discover"])
+    return transactions
+
+
+# -----------------------
+# Line parsers
+# -----------------------
+@pytest.mark.parametrize("seed", range(3))
+def test_pnc_matches_regex_parser(seed):
+    text = generate_statement_text("PNC", 300, seed=seed)
+    transactions = extract_transactions_pnc(text, FILENAME)
+    assert len(transactions) == 300
+    assert transactions == regex_pnc(text, FILENAME)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_discover_matches_regex_parser(seed):
+    text = generate_statement_text("Discover", 300, seed=seed)
+    transactions = extract_transactions_discover_card(text, FILENAME)
+    assert len(transactions) == 300
+    # The regex paired the "Activity Period" dates with the first row, so it only sees rows without the header
+    body = "\n".join(line for line in text.splitlines() if not line.startswith("Activity Period"))
+    assert transactions == regex_discover(body, FILENAME)
+
+
+@pytest.mark.parametrize("bank, parse", [("PNC", extract_transactions_pnc),
+                                         ("Discover", extract_transactions_discover_card)])
+def test_pathological_statement_parses_quickly(bank, parse):
+    text = generate_pathological_text(bank, 20_000)
+    start = time.monotonic()
+    parse(text, FILENAME)
+    assert time.monotonic() - start < 5
+
+
+@pytest.mark.parametrize("bank, parse", [("PNC", extract_transactions_pnc),
+                                         ("Discover", extract_transactions_discover_card)])
+def test_parse_deadline_raises(bank, parse):
+    with pytest.raises(ParseTimeout):
+        parse(generate_statement_text(bank, 50), FILENAME, deadline=time.monotonic() - 1)
+
+
+# -----------------------
+# Registry
+# -----------------------
+@pytest.mark.parametrize("bank", STATEMENT_BANKS)
+def test_registry_routes_statement_to_its_bank(bank):
+    text = generate_statement_text(bank, 20)
+    assert registry.detect(text).bank == bank
+
+    transactions = extract_transactions(text, FILENAME, [])
+    assert transactions
+    assert {row[4] for row in transactions} == {bank}
+
+
+def test_unknown_statement_is_reported():
+    unknown_files = []
+    assert extract_transactions("Some other bank\n01/02 COFFEE 3.50", FILENAME, unknown_files) == []
+    assert unknown_files == [FILENAME]
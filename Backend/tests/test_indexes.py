@@ -0,0 +1,144 @@
+import pandas as pd
+import pytest
+
+from utils import append_transactions, recipient_column, load_data, ledger_state_path
+from indexes import LedgerIndex
+from recipients import RecipientIndex, recipient_totals
+from recurring import RecurringIndex, merchant_key
+from anomalies import AnomalyIndex
+from budgets import BudgetIndex
+
+from conftest import LEDGER_ROWS, APPENDED_ROWS
+
+INDEXES = [RecipientIndex, RecurringIndex, AnomalyIndex, BudgetIndex]
+
+
+def assert_same(a, b):
+    """Index data equality, with floats compared approximately"""
+    if isinstance(a, dict):
+        assert a.keys() == b.keys()
+        for key in a:
+            assert_same(a[key], b[key])
+    elif isinstance(a, list):
+        assert len(a) == len(b)
+        for x, y in zip(a, b):
+            assert_same(x, y)
+    elif isinstance(a, float):
+        assert a == pytest.approx(b)
+    else:
+        assert a == b
+
+
+def rebuilt(cls, csv_path, tmp_path):
+    return cls(csv_path, state_file=str(tmp_path / f"rebuilt.{cls.name}.json")).update()
+
+
+# -----------------------
+# Incremental updates
+# -----------------------
+@pytest.mark.parametrize("cls", INDEXES)
+def test_index_after_append_equals_full_rebuild(cls, ledger, tmp_path):
+    index = cls(ledger)
+    index.update()
+    append_transactions(ledger, APPENDED_ROWS)
+    assert_same(index.update(), rebuilt(cls, ledger, tmp_path))
+
+
+@pytest.mark.parametrize("cls", INDEXES)
+def test_index_rebuilds_when_ledger_is_rewritten(cls, ledger, tmp_path):
+    index = cls(ledger)
+    index.update()
+    append_transactions(ledger, LEDGER_ROWS[::-1] + APPENDED_ROWS, mode="w")
+    assert_same(index.update(), rebuilt(cls, ledger, tmp_path))
+
+
+@pytest.mark.parametrize("cls", INDEXES)
+def test_index_rebuilds_when_classifier_changes(cls, ledger, monkeypatch):
+    index = cls(ledger)
+    index.update()
+    folded = []
+    original_fold = index.fold
+    monkeypatch.setattr(index, "fold", lambda data, chunk: folded.append(len(chunk)) or original_fold(data, chunk))
+
+    index.update()
+    assert folded == []
+
+    monkeypatch.setattr("indexes.load_manifest", lambda: {"latest": 7})
+    index.update()
+    assert sum(folded) == len(LEDGER_ROWS)
+    assert index._load_state()["model"] == 7
+
+
+@pytest.mark.parametrize("cls", INDEXES)
+def test_index_state_is_reloaded_from_disk(cls, ledger):
+    data = cls(ledger).update()
+    assert_same(cls(ledger).update(), data)
+
+
+def test_half_written_row_waits_for_next_update(ledger):
+    index = RecipientIndex(ledger)
+    before = list(index.update()["mary"])
+    with open(ledger, "a", newline="") as f:
+        f.write("2024-03-20,5.00,Debit,ZELLE TO MARY")
+    assert index.update()["mary"] == before
+
+    with open(ledger, "a", newline="") as f:
+        f.write(" SMITH,PNC\n")
+    assert index.update()["mary"] == [before[0] + 1, before[1] + 500, "2024-03-20"]
+
+
+def test_state_file_is_per_ledger(tmp_path):
+    a = ledger_state_path(str(tmp_path / "a" / "account.csv"), "budgets.json")
+    b = ledger_state_path(str(tmp_path / "b" / "account.csv"), "budgets.json")
+    assert a != b
+    assert a.endswith(".json") and "budgets." in a
+
+
+def test_ledger_index_is_abstract(ledger):
+    with pytest.raises(TypeError):
+        LedgerIndex(ledger)
+
+
+# -----------------------
+# Recipients
+# -----------------------
+def test_recipient_column_keeps_prefix_priority():
+    descriptions = pd.Series([
+        "ZELLE PAYMENT TO JOHN 1234",
+        "Zelle to Mary Smith",
+        "Online Transfer to SAV 123",
+        "TRANSFER TO SAVINGS ZELLE TO BOB",
+        "KROGER #512",
+    ])
+    assert recipient_column(descriptions).tolist()[:4] == ["john", "mary", "sav", "bob"]
+    assert pd.isna(recipient_column(descriptions).iloc[4])
+
+
+def test_recipient_index_matches_totals(ledger):
+    append_transactions(ledger, APPENDED_ROWS)
+    totals = recipient_totals(load_data(ledger))
+    index = RecipientIndex(ledger)
+    assert set(totals["Recipient"]) == {"john", "mary", "alex"}
+    assert {r["recipient"]: (r["count"], r["total"], r["last_date"]) for r in index.top(n=100)} == {
+        row.Recipient: (row.Count, row.Total_Cents / 100, row.Last_Date) for row in totals.itertuples()
+    }
+    assert index.top(n=1, by="total")[0]["recipient"] == "mary"
+
+
+# -----------------------
+# Recurring charges
+# -----------------------
+def test_merchant_key_groups_merchants_and_keeps_payees():
+    keys = merchant_key(pd.Series([
+        "NETFLIX.COM 866-579", "Netflix.com #1234", "ZELLE PAYMENT TO JOHN 1234", "ZELLE TO MARY-ANN", "1234",
+    ]))
+    assert keys.tolist() == ["netflix com", "netflix com", "to john", "to maryann", ""]
+
+
+def test_recurring_index_finds_monthly_charges(ledger):
+    append_transactions(ledger, APPENDED_ROWS)
+    charges = {charge["key"]: charge for charge in RecurringIndex(ledger).charges(today=pd.Timestamp("2024-04-20").date())}
+    assert charges["netflix com"]["cadence"] == "monthly"
+    assert charges["netflix com"]["typical_amount"] == 15.99
+    assert charges["netflix com"]["active"]
+    assert "best buy" not in charges
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+import classifier
+import model
+from classifier import load_classifier, load_manifest, ArrayModel
+from utils import append_transactions
+
+from conftest import APPENDED_ROWS
+
+
+@pytest.fixture
+def model_dirs(tmp_path, monkeypatch):
+    """Points every model artifact path at tmp_path"""
+    paths = {
+        "MODEL_DIR": str(tmp_path / "model"),
+        "ARRAY_MODEL_DIR": str(tmp_path / "model" / "category_classifier"),
+        "MODEL_STORE": str(tmp_path / "models"),
+        "MANIFEST_PATH": str(tmp_path / "models" / "manifest.json"),
+    }
+    os.makedirs(paths["MODEL_DIR"])
+    for name, path in paths.items():
+        monkeypatch.setattr(model, name, path)
+        monkeypatch.setattr(classifier, name, path)
+    monkeypatch.setattr(classifier, "MODEL_PATH", os.path.join(paths["MODEL_DIR"], "category_classifier_model.pkl"))
+    monkeypatch.setattr(classifier, "VECTORIZER_PATH", os.path.join(paths["MODEL_DIR"], "tfidf_vectorizer.pkl"))
+    monkeypatch.setattr(classifier, "_loaded_version", "unloaded")
+    return paths
+
+
+def test_newest_artifact_wins(ledger, model_dirs):
+    model.train_incremental(ledger)
+    assert load_manifest()["latest"] == 1
+    incremental, _ = load_classifier()
+    assert incremental.coef.shape[0] == 2 ** 18
+
+    # A full refit after an incremental run is published as the newest version and loaded
+    model.train_full(ledger)
+    manifest = load_manifest()
+    assert manifest["latest"] == 2
+    assert manifest["versions"][-1]["kind"] == "full"
+    full, vectorizer = load_classifier()
+    assert isinstance(full, ArrayModel)
+    assert full.coef.shape[0] == len(vectorizer.vocab)
+
+    # The next incremental run continues from the last SGD model and supersedes the refit
+    append_transactions(ledger, APPENDED_ROWS)
+    report = model.train_incremental(ledger)
+    assert report["version"] == 3
+    assert report["prequential_accuracy"] is not None
+    assert load_classifier()[0].coef.shape[0] == 2 ** 18
+
+
+def test_incremental_training_logs_instead_of_printing(ledger, model_dirs, capsys, caplog):
+    caplog.set_level("INFO", logger="model")
+    model.train_incremental(ledger)
+    model.train_incremental(ledger)
+    assert capsys.readouterr().out == ""
+    assert "Trained classifier v1" in caplog.text
+    assert "No new rows" in caplog.text
@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+from refresher import SingleFlightLock, DashboardRefresher
+
+
+class DictCache:
+    """The slice of the Flask-Caching API the refresher uses"""
+
+    def __init__(self, drop_writes=False):
+        self.data = {}
+        self.drop_writes = drop_writes
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def get_many(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value):
+        if not self.drop_writes:
+            self.data[key] = value
+
+
+def refresher_for(ledger, tmp_path, cache, wait_timeout=300):
+    built = []
+
+    def build_widget(name, csv_path):
+        built.append(name)
+        return f"{name} data"
+
+    refresher = DashboardRefresher(cache, "dashboard", ["summary", "trend"], build_widget, ledger,
+                                   str(tmp_path / "refresh.lock"), wait_timeout=wait_timeout)
+    return refresher, built
+
+
+def test_lock_is_single_flight(tmp_path):
+    lock = SingleFlightLock(str(tmp_path / "refresh.lock"))
+    assert lock.acquire()
+    assert lock.locked()
+    assert not SingleFlightLock(lock.path).acquire()
+    lock.release()
+    assert not lock.locked()
+
+
+def test_stale_lock_file_is_not_held(tmp_path):
+    path = str(tmp_path / "refresh.lock")
+    with open(path, "w") as f:
+        f.write("12345")
+    lock = SingleFlightLock(path, timeout=60)
+    assert lock.locked()
+
+    # A worker that crashed mid-rebuild must not block refresh_async forever
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert not lock.locked()
+    assert lock.acquire()
+    lock.release()
+
+
+def test_current_builds_every_widget_once(ledger, tmp_path):
+    refresher, built = refresher_for(ledger, tmp_path, DictCache())
+    data, stale = refresher.current()
+    assert data == {"summary": "summary data", "trend": "trend data"}
+    assert not stale
+    assert built == ["summary", "trend"]
+
+    refresher.current()
+    assert built == ["summary", "trend"]
+
+
+def test_current_times_out_when_the_cache_drops_writes(ledger, tmp_path):
+    refresher, built = refresher_for(ledger, tmp_path, DictCache(drop_writes=True), wait_timeout=0)
+    with pytest.raises(TimeoutError):
+        refresher.current()
+    assert built == ["summary", "trend"]
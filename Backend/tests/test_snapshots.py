@@ -0,0 +1,129 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+import snapshots
+import dashboard
+from utils import load_data, append_transactions
+from aggregates import rollup_frame
+from snapshots import MonthSnapshots, month_is_closed
+
+from conftest import APPENDED_ROWS
+
+# With the default grace period, January and February 2024 are closed; March and April are open
+TODAY = datetime.date(2024, 4, 20)
+
+
+def monthly_totals(df):
+    return df.groupby([df["Date"].dt.strftime("%Y-%m"), df["Category"].astype(str)])["Normalized_Cents"].sum()
+
+
+def snapshots_for(csv_path, tmp_path, name="month_snapshots.json"):
+    return MonthSnapshots(csv_path, state_file=str(tmp_path / "state" / name))
+
+
+def test_month_is_closed_after_grace_period():
+    assert month_is_closed("2024-01", today=datetime.date(2024, 3, 17))
+    assert not month_is_closed("2024-01", today=datetime.date(2024, 3, 16))
+
+
+def test_frames_match_full_ledger(ledger, tmp_path):
+    append_transactions(ledger, APPENDED_ROWS)
+    df, rows = snapshots_for(ledger, tmp_path).frames(today=TODAY)
+
+    pd.testing.assert_series_equal(monthly_totals(df), monthly_totals(load_data(ledger)), check_dtype=False)
+    assert df["Count"].sum() == len(load_data(ledger))
+    assert set(rows["Date"].dt.strftime("%Y-%m")) == {"2024-01", "2024-02", "2024-03", "2024-04"}
+
+
+def test_closed_months_are_stored_once(ledger, tmp_path):
+    months, _, _ = snapshots_for(ledger, tmp_path).update(today=TODAY)
+    assert sorted(months) == ["2024-01", "2024-02"]
+    assert months["2024-02"]["income_cents"] == 250000
+    assert months["2024-01"]["rows"] == 5
+
+    append_transactions(ledger, APPENDED_ROWS)
+    again, open_rows, _ = snapshots_for(ledger, tmp_path).update(today=TODAY)
+    assert again["2024-01"] == months["2024-01"]
+    assert len(open_rows) == 4 + len(APPENDED_ROWS)
+
+
+def test_late_row_for_closed_month_is_merged(ledger, tmp_path):
+    state = snapshots_for(ledger, tmp_path)
+    state.update(today=TODAY)
+    append_transactions(ledger, [["2024-01-28", 2000, "Purchase", "KROGER #512", "Chase Credit Card"]])
+
+    months, _, _ = state.update(today=TODAY)
+    assert months["2024-01"]["rows"] == 6
+    assert months["2024-01"]["categories"]["Groceries"] == {"cents": -6213, "count": 2}
+
+    df, _ = state.frames(today=TODAY)
+    pd.testing.assert_series_equal(monthly_totals(df), monthly_totals(load_data(ledger)), check_dtype=False)
+
+
+def test_month_closing_moves_open_rows_into_snapshots(ledger, tmp_path):
+    state = snapshots_for(ledger, tmp_path)
+    state.update(today=TODAY)
+    months, open_rows, _ = state.update(today=datetime.date(2024, 6, 1))
+    assert sorted(months) == ["2024-01", "2024-02", "2024-03"]
+    assert open_rows.empty
+
+
+def test_rows_reach_back_past_the_open_months(ledger, tmp_path, monkeypatch):
+    append_transactions(ledger, APPENDED_ROWS)
+    state = snapshots_for(ledger, tmp_path)
+    state.update(today=TODAY)
+
+    _, rows = snapshots_for(ledger, tmp_path).frames(today=TODAY)
+    full = load_data(ledger)
+    assert sorted(rows["Date"].dt.strftime("%Y-%m-%d")) == sorted(full["Date"].dt.strftime("%Y-%m-%d"))
+    assert rows["Category"].astype(str).value_counts().to_dict() == full["Category"].astype(str).value_counts().to_dict()
+
+    monkeypatch.setattr(snapshots, "SNAPSHOT_RECENT_ROWS", 2)
+    _, _, recent = snapshots_for(ledger, tmp_path, "capped.json").update(today=TODAY)
+    assert recent["Date"].dt.strftime("%Y-%m-%d").tolist() == ["2024-02-15", "2024-02-21"]
+
+
+def test_dashboard_table_lists_the_whole_history(ledger, tmp_path, monkeypatch):
+    append_transactions(ledger, APPENDED_ROWS)
+    monkeypatch.setattr(dashboard, "get_month_snapshots", lambda csv_path: snapshots_for(csv_path, tmp_path))
+    monkeypatch.setattr(snapshots, "month_is_closed", lambda month, today=None: month < "2024-03")
+    _, rows = dashboard.load_snapshot_frames(ledger)
+    assert len(rows) == len(load_data(ledger))
+    assert rows["Date"].is_monotonic_increasing
+    assert "Standardized_Amount" in rows and "Is_Expense" in rows
+
+
+def test_category_forecast_counts_transactions_not_rollup_rows():
+    rollup_df = dashboard.prepare_rollup_frames((rollup_frame(pd.DataFrame({
+        "Date": pd.to_datetime(["2024-01-05", "2024-02-05"]), "Category": ["Rent", "Rent"],
+        "Amount_Cents": [200000, 100000], "Normalized_Cents": [-200000, -100000], "Count": [2, 1],
+    })),))[0]
+    few = rollup_df.assign(Count=1)
+    assert "Insufficient data" in dashboard.category_forecast(few, "Rent", use_cache=False)
+    assert "Insufficient data" not in dashboard.category_forecast(rollup_df, "Rent", use_cache=False)
+
+
+def test_summaries_mark_open_months(ledger, tmp_path):
+    records = snapshots_for(ledger, tmp_path).summaries(today=TODAY)
+    assert [(record["month"], record["closed"]) for record in records] == [
+        ("2024-01", True), ("2024-02", True), ("2024-03", False)
+    ]
+    assert records[2]["expense_cents"] == 1599 + 980 + 7500 + 120000
+
+
+@pytest.mark.parametrize("change", ["rules", "model"])
+def test_rebuilds_when_rules_or_model_change(ledger, tmp_path, monkeypatch, change):
+    snapshots_for(ledger, tmp_path).update(today=TODAY)
+    if change == "rules":
+        monkeypatch.setattr(snapshots, "RULES_FINGERPRINT", "changed")
+        monkeypatch.setattr("indexes.RULES_FINGERPRINT", "changed")
+    else:
+        monkeypatch.setattr(snapshots, "load_manifest", lambda: {"latest": "retrained"})
+
+    state = snapshots_for(ledger, tmp_path)
+    months, _, _ = state.update(today=TODAY)
+    assert sorted(months) == ["2024-01", "2024-02"]
+    assert state._load_state()[0].get("rules" if change == "rules" else "model") == (
+        "changed" if change == "rules" else "retrained")
@@ -0,0 +1,39 @@
+import time
+import tempfile
+
+import pytest
+
+import utils
+
+# Flask.py creates its widget cache at import; keep it out of the working directory
+utils.CONFIG.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="widget-cache-"))
+
+import Flask
+from Flask import issue_stream_token, valid_stream_token, _token_signature
+
+
+def test_token_is_valid_for_its_scope_only(monkeypatch):
+    monkeypatch.setattr(Flask, "API_KEY", "secret")
+    token, expires = issue_stream_token("dashboard-stream")
+    assert expires > time.time()
+    assert valid_stream_token(token, "dashboard-stream")
+    assert not valid_stream_token(token, "other-scope")
+    tampered = token[:-1] + ("1" if token.endswith("0") else "0")
+    assert not valid_stream_token(tampered, "dashboard-stream")
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    monkeypatch.setattr(Flask, "API_KEY", "secret")
+    expires = int(time.time()) - 1
+    assert not valid_stream_token(f"{expires}.{_token_signature('dashboard-stream', expires)}", "dashboard-stream")
+
+
+def test_no_tokens_without_an_api_key(monkeypatch):
+    monkeypatch.setattr(Flask, "API_KEY", "")
+    with pytest.raises(ValueError):
+        issue_stream_token("dashboard-stream")
+
+    # Anyone can sign with the empty key, so nothing signed with it is accepted
+    expires = int(time.time()) + 60
+    forged = f"{expires}.{_token_signature('dashboard-stream', expires)}"
+    assert not valid_stream_token(forged, "dashboard-stream")
@@ -0,0 +1,49 @@
+import os
+import json
+
+import sum as reports
+
+from conftest import LEDGER_ROWS
+
+
+def run_report(capsys, *argv):
+    reports.main(list(argv))
+    return capsys.readouterr().out
+
+
+def test_summary_matches_ledger_cents(ledger, capsys):
+    expenses = sum(cents for _, cents, _, desc, _ in LEDGER_ROWS if not desc.startswith("PAYROLL"))
+    summary = json.loads(run_report(capsys, "summary", "--csv", ledger, "--format", "json"))
+    assert summary["rows"] == len(LEDGER_ROWS)
+    assert summary["total_income"] == 2500.0
+    assert summary["total_expenses"] == expenses / 100
+    assert summary["savings"] == round(2500.0 - expenses / 100, 2)
+
+
+def test_summing_reports_read_the_month_snapshots(ledger, capsys, tmp_path):
+    run_report(capsys, "summary", "--csv", ledger)
+    run_report(capsys, "categories", "--csv", ledger)
+    state = os.listdir(tmp_path / "state")
+    assert any(name.startswith("month_snapshots.") for name in state)
+    assert not any(name.startswith("enriched_ledger.") for name in state)
+
+
+def test_transfer_report_is_the_same_from_the_enriched_cache(ledger, capsys, tmp_path):
+    first = run_report(capsys, "transfers", "--csv", ledger, "--format", "json")
+    assert len(json.loads(first)) == 4
+    assert any(name.startswith("enriched_ledger.") for name in os.listdir(tmp_path / "state"))
+    assert run_report(capsys, "transfers", "--csv", ledger, "--format", "json") == first
+
+
+def test_category_report_for_one_month(ledger, capsys):
+    rows = json.loads(run_report(capsys, "categories", "--csv", ledger, "--month", "2024-03", "--format", "json"))
+    totals = {row["Category"]: (row["Amount"], row["Count"]) for row in rows}
+    assert totals == {"Rent": (1200.0, 1), "Transfer": (75.0, 1), "Subscription": (15.99, 1), "Food & Dining": (9.8, 1)}
+
+
+def test_recipient_report(ledger, capsys):
+    rows = json.loads(run_report(capsys, "recipients", "--csv", ledger, "--top", "1", "--format", "json"))
+    assert rows == [{"Recipient": "John", "Transfers": 2, "Amount": 50.0, "Last_Date": "2024-02-10"}]
+
+    scoped = json.loads(run_report(capsys, "recipients", "--csv", ledger, "--month", "2024-03", "--format", "json"))
+    assert scoped == [{"Recipient": "Mary", "Transfers": 1, "Amount": 75.0, "Last_Date": "2024-03-12"}]
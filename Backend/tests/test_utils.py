@@ -0,0 +1,79 @@
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+import utils
+from utils import parse_cents, format_cents, to_cents, append_transactions, read_ledger, clean_ledger, map_unique
+
+
+@pytest.mark.parametrize("text, cents", [
+    ("1,234.56", 123456),
+    ("-12.30", -1230),
+    ("$9.87", 987),
+    ("0.1", 10),
+    ("42", 4200),
+    ("-0.05", -5),
+])
+def test_parse_cents(text, cents):
+    assert parse_cents(text) == cents
+
+
+@pytest.mark.parametrize("cents", [0, 5, -5, 1230, -1230, 123456, 10 ** 12 + 1])
+def test_format_cents_round_trips(cents):
+    assert parse_cents(format_cents(cents)) == cents
+
+
+def test_to_cents_is_exact_where_float_sums_drift():
+    amounts = pd.Series([0.1, 0.2, 19.99, 1234.56] * 1000)
+    cents = to_cents(amounts)
+    assert cents.dtype == "int64"
+    assert cents.sum() == (10 + 20 + 1999 + 123456) * 1000
+
+
+def test_ledger_round_trip_keeps_exact_cents(tmp_path):
+    path = str(tmp_path / "account.csv")
+    rows = [["2024-01-03", 1999, "Purchase", "KROGER", "Chase"], ["2024-01-04", -1, "Credit", "REFUND", "Chase"]]
+    append_transactions(path, rows, mode="w")
+    append_transactions(path, [["2024-01-05", 123456, "Debit", "RENT", "PNC"]])
+
+    df = clean_ledger(read_ledger(path))
+    assert df["Amount_Cents"].tolist() == [1999, 1, 123456]
+    assert df["Amount"].tolist() == [19.99, 0.01, 1234.56]
+    assert df["Date"].dt.strftime("%Y-%m-%d").tolist() == ["2024-01-03", "2024-01-04", "2024-01-05"]
+
+
+def test_read_ledger_infers_non_iso_dates_and_drops_unreadable(tmp_path, caplog):
+    path = tmp_path / "account.csv"
+    path.write_text(
+        "Date,Amount,Type,Description,Bank\n"
+        "2024-01-03,10.00,Purchase,A,Chase\n"
+        "01/04/2024,20.00,Purchase,B,Chase\n"
+        "not a date,30.00,Purchase,C,Chase\n",
+        encoding="utf-8",
+    )
+
+    df = clean_ledger(read_ledger(str(path)))
+    assert df["Date"].dt.strftime("%Y-%m-%d").tolist() == ["2024-01-03", "2024-01-04"]
+    assert "Skipping 1 ledger rows" in caplog.text
+
+
+def test_map_unique_keeps_missing_values():
+    values = pd.Series(["a", None, "b", "a"])
+    result = map_unique(values, lambda unique: [text.upper() for text in unique])
+    assert list(result[[0, 2, 3]]) == ["A", "B", "A"]
+    assert pd.isna(result[1])
+
+
+def test_category_cache_saves_from_concurrent_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "_category_cache", {"KROGER #512": "Groceries"})
+    threads = [threading.Thread(target=utils._save_category_cache) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(utils.category_cache_path(), encoding="utf-8") as f:
+        assert json.load(f)["categories"] == {"KROGER #512": "Groceries"}
+    assert not list(tmp_path.glob("*.tmp"))
@@ -1,7 +1,16 @@
 import pandas as pd
+import numpy as np
 import re
+import csv
 import json
 import os
+import hashlib
+import logging
+import threading
+
+from metrics import span
+
+logger = logging.getLogger(__name__)
 
 # Load configuration once
 def load_config():
@@ -28,6 +37,110 @@ EXPENSE_CATEGORIES = [
 
 INCOME_CATEGORIES = ['Income', 'Papa Transfer']
 EXCLUDE_CATEGORIES = ["Income", "Papa Transfer", "Internal Transfer"]
+ESSENTIAL_CATEGORIES = ["Groceries", "Rent", "Utilities", "Transport", "Tuition", "Pharmacy"]
+
+# Keyword rules, checked in order; the first category with a matching keyword wins.
+# Internal transfers come first and include the configured account numbers.
+CATEGORY_RULES = [
+    ("Internal Transfer", [
+        f"transfer from {CONFIG.get('number1', '')}", 
+        f"transfer from {CONFIG.get('number2', '')}", 
+        f"Online Transfer To {CONFIG.get('number3', '')}", 
+        "transfer"
+    ]),
+    ("Groceries", ["meijer", "walmart", "costco", "kroger", "grocery", "aldi", "whole foods"]),
+    ("Food & Dining", ["uber eats", "doordash", "grubhub", "restaurant", "dining", "mcdonald's", 
+                       "coffee", "cafe", "chick-fil-a", "raising canes", "chipotle", "aramark", 
+                       "china food", "fortune noodle house", "starbucks", "subway", "the 86", 
+                       "deli", "halal food", "thai express", "adeep india", "drunken", "adriaticos", 
+                       "cheesecake", "united dairy farm", "popeyes"]),
+    ("Transport", ["uber", "lyft", "ride", "taxi", "masabi_sorta", "american airlines", "masabi"]),
+    ("Subscription", ["netflix", "spotify", "subscription", "apple.com", "openai", "chatgpt", 
+                      "crunchyroll", "chegg"]),
+    ("Rent", ["rent", "lease", "apartment", "rebecca", "mclean", "Rebecca "]),
+    ("Transfer", ["zelle to", "venmo", "paypal", "zel to", "zelle payment to", 
+                  "domestic incoming wire fee"]),
+    ("Income", ["salary", "payroll", "deposit", "income", "fedwire", "zelle from", 
+                "zel from", "desposit", "zelle payment from", "credit", "new checking",
+                "Daily Cash Deposit"]),
+    ("Cash Withdrawal", ["atm", "cash", "withdrawal"]),
+    ("Shopping", ["amazon", "online", "purchase", "target", "clifton market", "the 86", 
+                  "ravine", "amzn", "prime video", "viv makret", "bana market"]),
+    ("Utilities", ["dukeenergycorpor", "vzwrlss", "visible"]),
+    ("Tuition", ["universitycinti", "univ cinti", "university of cincinnati", "uc", 
+                 "univ of cinti"]),
+    ("Vending Machine", ["parlevel texas"]),
+    ("Investments", ["robinhood"]),
+    ("Entertainment", ["fandango", "amc"]),
+    ("Pharmacy", ["cvs"]),
+    ("Games", ["epic", "steamgames", "playstationnetwork", "nvidia"]),
+    ("Returns", ["Interest"]),
+]
+
+# Every label the rules, the config lists or the classifier can produce
+ALL_CATEGORIES = sorted(
+    {category for category, _ in CATEGORY_RULES}
+    | set(EXPENSE_CATEGORIES) | set(INCOME_CATEGORIES) | set(EXCLUDE_CATEGORIES)
+)
+
+# Changes whenever the rules or the account numbers in creds.json change
+RULES_FINGERPRINT = hashlib.sha256(json.dumps(CATEGORY_RULES).encode("utf-8")).hexdigest()[:16]
+
+# Ledger CSV schema. Bank and Type repeat a handful of values, so they are
+# stored as categoricals; dates are always written as ISO dates by extract.py.
+LEDGER_COLUMNS = ["Date", "Amount", "Type", "Description", "Bank"]
+LEDGER_DTYPES = {
+    "Amount": "float64",
+    "Type": "category",
+    "Description": "object",
+    "Bank": "category",
+}
+LEDGER_DATE_FORMAT = "%Y-%m-%d"
+
+# Fixed-point amounts: integer cents, so sums are exact
+def parse_cents(amount):
+    """
+    Parses an amount as printed on a statement into integer cents.
+    
+    Args:
+        amount: Text such as "1,234.56", "-12.30" or "$9.87"
+        
+    Returns:
+        Signed int number of cents (e.g. 123456, -1230, 987)
+    """
+    text = str(amount).replace(",", "").replace("$", "").strip()
+    negative = text.startswith("-")
+    whole, _, fraction = text.lstrip("+-").partition(".")
+    cents = int(whole or 0) * 100 + int((fraction + "00")[:2])
+    return -cents if negative else cents
+
+def format_cents(cents):
+    """Formats integer cents as the decimal text stored in the ledger CSV (e.g. "-12.30")"""
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+def to_cents(amounts):
+    """Converts a Series of decimal amounts with at most two decimals to int64 cents"""
+    return (amounts * 100).round().astype("int64")
+
+# Append extracted transactions to the ledger CSV
+def append_transactions(csv_path, transactions, mode="a"):
+    """
+    Writes extractor rows ([date, cents, type, description, bank]) to the ledger.
+    
+    Args:
+        csv_path: Ledger CSV; the header is written if the file is new
+        transactions: Rows as returned by the extract_transactions_* functions
+        mode: "a" to append, "w" to replace the ledger
+    """
+    write_header = mode == "w" or not os.path.isfile(csv_path)
+    with open(csv_path, mode, newline="") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(LEDGER_COLUMNS)
+        writer.writerows(
+            [date, format_cents(cents), type_, desc, bank] for date, cents, type_, desc, bank in transactions
+        )
 
 # Centralized categorization function
 def categorize(description):
@@ -42,61 +155,104 @@ def categorize(description):
     """
     desc = description.lower()
     
-    # Check for internal transfers first with actual account numbers
-    if any(keyword in desc for keyword in [
-        f"transfer from {CONFIG.get('number1', '')}", 
-        f"transfer from {CONFIG.get('number2', '')}", 
-        f"Online Transfer To {CONFIG.get('number3', '')}", 
-        "transfer"
-    ]):
-        return "Internal Transfer"
-        
-    if any(keyword in desc for keyword in ["meijer", "walmart", "costco", "kroger", "grocery", "aldi", "whole foods"]):
-        return "Groceries"
-    elif any(keyword in desc for keyword in ["uber eats", "doordash", "grubhub", "restaurant", "dining", "mcdonald's", 
-                                           "coffee", "cafe", "chick-fil-a", "raising canes", "chipotle", "aramark", 
-                                           "china food", "fortune noodle house", "starbucks", "subway", "the 86", 
-                                           "deli", "halal food", "thai express", "adeep india", "drunken", "adriaticos", 
-                                           "cheesecake", "united dairy farm", "popeyes"]):
-        return "Food & Dining"
-    elif any(keyword in desc for keyword in ["uber", "lyft", "ride", "taxi", "masabi_sorta", "american airlines", "masabi"]):
-        return "Transport"
-    elif any(keyword in desc for keyword in ["netflix", "spotify", "subscription", "apple.com", "openai", "chatgpt", 
-                                           "crunchyroll", "chegg"]):
-        return "Subscription"
-    elif any(keyword in desc for keyword in ["rent", "lease", "apartment", "rebecca", "mclean", "Rebecca "]):
-        return "Rent"
-    elif any(keyword in desc for keyword in ["zelle to", "venmo", "paypal", "zel to", "zelle payment to", 
-                                            "domestic incoming wire fee"]):
-        return "Transfer"
-    elif any(keyword in desc for keyword in ["salary", "payroll", "deposit", "income", "fedwire", "zelle from", 
-                                            "zel from", "desposit", "zelle payment from", "credit", "new checking",
-                                            "Daily Cash Deposit"]):
-        return "Income"
-    elif any(keyword in desc for keyword in ["atm", "cash", "withdrawal"]):
-        return "Cash Withdrawal"
-    elif any(keyword in desc for keyword in ["amazon", "online", "purchase", "target", "clifton market", "the 86", 
-                                           "ravine", "amzn", "prime video", "viv makret", "bana market"]):
-        return "Shopping"
-    elif any(keyword in desc for keyword in ["dukeenergycorpor", "vzwrlss", "visible"]):
-        return "Utilities"
-    elif any(keyword in desc for keyword in ["universitycinti", "univ cinti", "university of cincinnati", "uc", 
-                                           "univ of cinti"]):
-        return "Tuition"
-    elif "parlevel texas" in desc:
-        return "Vending Machine"
-    elif any(keyword in desc for keyword in ["robinhood"]):
-        return "Investments"
-    elif any(keyword in desc for keyword in ["fandango", "amc"]):
-        return "Entertainment"
-    elif any(keyword in desc for keyword in ["cvs"]):
-        return "Pharmacy"
-    elif any(keyword in desc for keyword in ["epic", "steamgames", "playstationnetwork", "nvidia"]):
-        return "Games"
-    elif any(keyword in desc for keyword in ["Interest"]):
-        return "Returns"
-    else:
-        return "Other"
+    for category, keywords in CATEGORY_RULES:
+        if any(keyword in desc for keyword in keywords):
+            return category
+    
+    return "Other"
+
+# Persistent description -> category cache
+def category_cache_path():
+    """Path of the on-disk categorization cache, next to the ledger unless configured"""
+    csv_dir = os.path.dirname(CONFIG.get("CSV_FILE", "Dataset/account.csv"))
+    return CONFIG.get("CATEGORY_CACHE_FILE", os.path.join(csv_dir, "category_cache.json"))
+
+_category_cache = None
+_category_cache_lock = threading.Lock()
+
+# Derived state kept next to the ledger (snapshots, indexes)
+def state_path(name):
+    """Path of a derived-state file in STATE_DIR (a "state" folder next to the ledger unless configured)"""
+    csv_dir = os.path.dirname(CONFIG.get("CSV_FILE", "Dataset/account.csv"))
+    return os.path.join(CONFIG.get("STATE_DIR", os.path.join(csv_dir, "state")), name)
+
+def ledger_state_path(csv_path, name):
+    """
+    Path of a derived-state file that belongs to one ledger, so state built
+    from different ledgers (or the benchmark's) never collides: in STATE_DIR
+    if configured, else a "state" folder next to that ledger, and named
+    after the ledger's absolute path.
+    """
+    root, ext = os.path.splitext(name)
+    ledger = hashlib.sha1(os.path.abspath(csv_path).encode("utf-8")).hexdigest()[:12]
+    directory = CONFIG.get("STATE_DIR", os.path.join(os.path.dirname(csv_path), "state"))
+    return os.path.join(directory, f"{root}.{ledger}{ext}")
+
+def write_json_atomic(path, data):
+    """Writes JSON via a temporary file and os.replace, so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def _load_category_cache():
+    """Loads the cache from disk, discarding it if it was built with different rules"""
+    global _category_cache
+    if _category_cache is None:
+        _category_cache = {}
+        try:
+            with open(category_cache_path(), encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("fingerprint") == RULES_FINGERPRINT:
+                _category_cache = stored.get("categories", {})
+        except (OSError, ValueError):
+            pass
+    return _category_cache
+
+def _save_category_cache():
+    """Writes the cache atomically so concurrent readers never see a partial file"""
+    try:
+        write_json_atomic(category_cache_path(), {"fingerprint": RULES_FINGERPRINT, "categories": _category_cache})
+    except OSError:
+        pass  # The cache is an optimization; categorization still works without it
+
+def categorize_unique(descriptions):
+    """
+    Categorizes a list of distinct descriptions, using the persistent cache.
+    
+    Args:
+        descriptions: Iterable of unique description strings
+        
+    Returns:
+        List of categories in the same order
+    """
+    with _category_cache_lock, span("categorize_rules", rows=len(descriptions)) as s:
+        cache = _load_category_cache()
+        misses = [desc for desc in descriptions if desc not in cache]
+        s["cache"] = "miss" if misses else "hit"
+        for desc in misses:
+            cache[desc] = categorize(desc)
+        if misses:
+            _save_category_cache()
+        return [cache[desc] for desc in descriptions]
+
+# Apply a function once per distinct value
+def map_unique(series, func):
+    """
+    Applies func to each distinct value of a Series and maps the results back.
+    
+    Args:
+        series: Pandas Series with many repeated values
+        func: Function taking a list of unique values and returning a list of results
+        
+    Returns:
+        Numpy array of results aligned with the Series (NaN where the Series is missing)
+    """
+    codes, uniques = pd.factorize(series)
+    # Missing values get code -1; the extra trailing NaN keeps them from indexing the last result
+    results = np.append(np.asarray(func(list(uniques)), dtype=object), np.nan)
+    return results[codes]
 
 # Centralized text cleaning
 def clean_text(text):
@@ -136,6 +292,144 @@ def normalize_transaction(row):
         'Normalized_Amount': amount
     })
 
+# Categorize and normalize a whole ledger
+def categorize_frame(df):
+    """
+    Adds 'Category', 'Normalized_Cents' and 'Normalized_Amount' columns to a ledger DataFrame.
+    
+    Rows the keyword rules leave as "Other" are sent to the ML classifier in
+    a single batch (disable with "ML_FALLBACK": false in creds.json).
+    
+    Args:
+        df: DataFrame with 'Description' and positive 'Amount' columns, and
+            ideally 'Amount_Cents' from clean_ledger()
+        
+    Returns:
+        The same DataFrame, updated in place
+    """
+    with span("categorize", rows=len(df)):
+        if 'Amount_Cents' not in df:
+            df['Amount_Cents'] = to_cents(df['Amount'])
+        
+        # Each distinct description is categorized once; ledgers repeat merchants heavily
+        df['Category'] = map_unique(df['Description'], categorize_unique)
+        
+        # Expenses are negative, everything else stays positive
+        set_normalized_amounts(df)
+        
+        if CONFIG.get("ML_FALLBACK", True):
+            # Imported here because classifier depends on this module
+            from classifier import refine_other_categories
+            refine_other_categories(df)
+        
+        # A few dozen labels repeated over every row
+        df['Category'] = df['Category'].astype("category")
+    
+    return df
+
+# Signed amounts from the categories
+def set_normalized_amounts(df, index=None):
+    """
+    Derives 'Normalized_Cents' and 'Normalized_Amount' (negative for expense
+    categories) from 'Amount_Cents', for every row or only the rows in `index`.
+    """
+    rows = df if index is None else df.loc[index]
+    cents = rows['Amount_Cents'].where(~rows['Category'].isin(EXPENSE_CATEGORIES), -rows['Amount_Cents'])
+    if index is None:
+        df['Normalized_Cents'] = cents
+        df['Normalized_Amount'] = cents / 100
+    else:
+        df.loc[index, 'Normalized_Cents'] = cents
+        df.loc[index, 'Normalized_Amount'] = cents / 100
+    return df
+
+# Drop incomplete rows and make amounts exact
+def clean_ledger(df):
+    """
+    Drops rows missing a date, description or amount, and adds 'Amount_Cents'
+    (exact, positive int64 cents); 'Amount' becomes the matching positive float.
+    
+    Args:
+        df: DataFrame from read_ledger()
+        
+    Returns:
+        The same DataFrame, updated in place
+    """
+    df.dropna(subset=["Date", "Description", "Amount"], inplace=True)
+    df["Amount_Cents"] = to_cents(df["Amount"]).abs()
+    df["Amount"] = df["Amount_Cents"] / 100
+    return df
+
+# Version of the ledger on disk
+def ledger_version(file_path=None):
+    """
+    Returns a token that changes whenever the ledger file is modified.
+    
+    Args:
+        file_path: Path to CSV file. If None, uses path from config.
+        
+    Returns:
+        String built from the file's size and modification time, or "missing"
+    """
+    if not file_path:
+        file_path = CONFIG.get("CSV_FILE", "Dataset/account.csv")
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return "missing"
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+# Read the ledger CSV with its schema
+def read_ledger(file_path, chunksize=None, **kwargs):
+    """
+    Reads the ledger CSV with explicit column types instead of inferring them.
+    
+    Args:
+        file_path: Path to CSV file
+        chunksize: If set, return an iterator of DataFrames of this many rows
+        **kwargs: Extra arguments for pd.read_csv (e.g. skiprows)
+        
+    Returns:
+        DataFrame with a datetime 'Date' (NaT where unparseable), float 'Amount'
+        and categorical 'Type' and 'Bank' columns (or an iterator of them)
+    """
+    def parse_dates(df):
+        raw = df["Date"]
+        dates = pd.to_datetime(raw, format=LEDGER_DATE_FORMAT, errors="coerce")
+        # Hand-edited rows, older exports and unparsed statement dates aren't ISO; infer those one by one
+        failed = dates.isna() & raw.notna()
+        if failed.any():
+            dates[failed] = pd.to_datetime(raw[failed], format="mixed", errors="coerce")
+            unreadable = int((dates.isna() & raw.notna()).sum())
+            if unreadable:
+                logger.warning(f"⚠️ Skipping {unreadable} ledger rows with an unreadable date.")
+        df["Date"] = dates
+        return df
+    
+    reader = pd.read_csv(file_path, encoding="ISO-8859-1", dtype=LEDGER_DTYPES, chunksize=chunksize, **kwargs)
+    if chunksize is None:
+        return parse_dates(reader)
+    return (parse_dates(chunk) for chunk in reader)
+
+# Stream the ledger in categorized chunks
+def iter_ledger(file_path=None, chunksize=200_000):
+    """
+    Reads, cleans and categorizes the ledger one chunk at a time, so callers
+    can fold it into running aggregates without holding every row in memory.
+    
+    Args:
+        file_path: Path to CSV file. If None, uses path from config.
+        chunksize: Rows per chunk
+        
+    Yields:
+        DataFrames preprocessed like load_data()
+    """
+    if not file_path:
+        file_path = CONFIG.get("CSV_FILE", "Dataset/account.csv")
+    
+    for chunk in read_ledger(file_path, chunksize=chunksize):
+        yield categorize_frame(clean_ledger(chunk))
+
 # Load and preprocess data
 def load_data(file_path=None):
     """
@@ -150,43 +444,57 @@ def load_data(file_path=None):
     if not file_path:
         file_path = CONFIG.get("CSV_FILE", "Dataset/account.csv")
     
-    try:
-        df = pd.read_csv(file_path, encoding="ISO-8859-1")
-    except:
-        df = pd.read_csv("account.csv")  # Fallback to direct file
+    with span("csv_load") as s:
+        try:
+            df = read_ledger(file_path)
+        except:
+            df = read_ledger("account.csv")  # Fallback to direct file
 
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    df.dropna(subset=["Date", "Description"], inplace=True)
-    df["Amount"] = df["Amount"].abs()
+        clean_ledger(df)
+        s["rows"] = len(df)
     
     # Apply categorization and normalization
-    result = df.apply(normalize_transaction, axis=1)
-    df['Category'] = result['Category']
-    df['Normalized_Amount'] = result['Normalized_Amount']
+    categorize_frame(df)
     
     return df
 
 # Extract recipient names from transfer descriptions
+# The token after the first "zelle payment to ", "zelle to " or "transfer to "
+# Transfer prefixes in priority order: a description containing several uses the first listed
+RECIPIENT_PATTERNS = [
+    re.compile(re.escape(prefix) + r"([^ ]*)", re.IGNORECASE)
+    for prefix in ("zelle payment to ", "zelle to ", "transfer to ")
+]
+
+def recipient_column(descriptions):
+    """
+    Extracts the recipient of each transfer description, one vectorized pass
+    per prefix over the descriptions no earlier prefix matched.
+    
+    Args:
+        descriptions: Series of description strings
+        
+    Returns:
+        Series aligned with `descriptions`: the lowercased recipient, or NaN
+    """
+    descriptions = descriptions.astype(str)
+    recipients = pd.Series(np.nan, index=descriptions.index, dtype=object)
+    for pattern in RECIPIENT_PATTERNS:
+        missing = recipients.isna()
+        if not missing.any():
+            break
+        recipients[missing] = descriptions[missing].str.extract(pattern, expand=False)
+    return recipients.str.lower()
+
 def extract_recipients(transfer_descriptions):
     """
     Extracts recipient names from transfer descriptions.
     
     Args:
-        transfer_descriptions: List of transfer description strings
+        transfer_descriptions: List or Series of transfer description strings
         
     Returns:
         List of extracted recipient names
     """
-    recipients = []
-    for desc in transfer_descriptions:
-        desc_lower = desc.lower()
-        if "zelle payment to " in desc_lower:
-            recipient = desc_lower.split("zelle payment to ")[1].split(" ")[0]
-            recipients.append(recipient)
-        elif "zelle to " in desc_lower:
-            recipient = desc_lower.split("zelle to ")[1].split(" ")[0]
-            recipients.append(recipient)
-        elif "transfer to " in desc_lower:
-            recipient = desc_lower.split("transfer to ")[1].split(" ")[0]
-            recipients.append(recipient)
-    return recipients
\ No newline at end of file
+    recipients = recipient_column(pd.Series(transfer_descriptions, dtype=object))
+    return recipients.dropna().tolist()
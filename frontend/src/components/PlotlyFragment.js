@@ -0,0 +1,61 @@
+import React, { useEffect, useRef } from 'react';
+
+// One <script> tag per asset URL, shared by every chart on the page
+const loadedScripts = {};
+
+export const loadScript = (src) => {
+  if (!loadedScripts[src]) {
+    loadedScripts[src] = new Promise((resolve, reject) => {
+      const script = document.createElement('script');
+      script.src = src;
+      script.async = true;
+      script.onload = resolve;
+      script.onerror = () => {
+        delete loadedScripts[src];
+        reject(new Error(`Failed to load ${src}`));
+      };
+      document.head.appendChild(script);
+    });
+  }
+  return loadedScripts[src];
+};
+
+// Renders a chart fragment from the API. The fragment only carries figure data
+// and a Plotly.newPlot call, so it waits for the shared plotly.js asset. Scripts
+// inserted through innerHTML never run, so they are re-created once it's loaded.
+const PlotlyFragment = ({ html, plotlyJs }) => {
+  const containerRef = useRef(null);
+
+  useEffect(() => {
+    const container = containerRef.current;
+    if (!container) {
+      return undefined;
+    }
+    container.innerHTML = html;
+    if (!plotlyJs) {
+      return undefined;
+    }
+
+    let cancelled = false;
+    loadScript(plotlyJs)
+      .then(() => {
+        if (cancelled) {
+          return;
+        }
+        container.querySelectorAll('script').forEach((inert) => {
+          const script = document.createElement('script');
+          script.text = inert.text;
+          inert.replaceWith(script);
+        });
+      })
+      .catch((err) => console.error('Failed to load plotly.js:', err));
+
+    return () => {
+      cancelled = true;
+    };
+  }, [html, plotlyJs]);
+
+  return <div ref={containerRef} />;
+};
+
+export default PlotlyFragment;
@@ -2,29 +2,59 @@ import React, { useState, useEffect } from 'react';
 import { Card } from 'primereact/card';
 import { ProgressSpinner } from 'primereact/progressspinner';
 import { Message } from 'primereact/message';
-import { getDashboardData } from '../services/api';
+import PlotlyFragment from '../components/PlotlyFragment';
+import { openDashboardStream, assetUrl } from '../services/api';
+
+// Widgets rendered on this page; only these are requested from the stream
+const PAGE_WIDGETS = [
+  'summary_stats', 'pie_chart', 'bar_chart', 'income_vs_expenses',
+  'essential_ratio', 'dining_vs_groceries', 'recurring_charges', 'transaction_table', 'forecast',
+];
 
 const Dashboard = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [dashboardData, setDashboardData] = useState(null);
+  const [stale, setStale] = useState(false);
+  const [plotlyJs, setPlotlyJs] = useState(null);
 
   useEffect(() => {
-    const fetchDashboardData = async () => {
-      try {
-        setLoading(true);
-        const data = await getDashboardData();
-        setDashboardData(data);
-        setError(null);
-      } catch (err) {
-        console.error('Failed to fetch dashboard data:', err);
-        setError('Failed to load dashboard data. Please check your API key in settings.');
-      } finally {
-        setLoading(false);
-      }
+    let source;
+    let cancelled = false;
+    const handleError = (err) => {
+      console.error('Failed to fetch dashboard data:', err);
+      setError('Failed to load dashboard data. Please check your API key in settings.');
+      setLoading(false);
     };
 
-    fetchDashboardData();
+    setDashboardData({});
+
+    // Each widget is rendered as soon as its event arrives
+    openDashboardStream(PAGE_WIDGETS, {
+      onAssets: (assets) => setPlotlyJs(assetUrl(assets.plotly_js)),
+      onWidget: (widget) => {
+        setLoading(false);
+        setDashboardData((previous) => ({ ...previous, [widget.widget]: widget.data }));
+        if (widget.stale) {
+          setStale(true);
+        }
+      },
+      onDone: () => setLoading(false),
+      onError: handleError,
+    })
+      .then((opened) => {
+        if (cancelled) {
+          opened.close();
+        } else {
+          source = opened;
+        }
+      })
+      .catch(handleError);
+
+    return () => {
+      cancelled = true;
+      if (source) source.close();
+    };
   }, []);
 
   const formatCurrency = (value) => {
@@ -52,6 +82,18 @@ const Dashboard = () => {
     return <Message severity="info" text="No dashboard data available. Upload some transactions to get started." className="w-full" />;
   }
 
+  // Placeholder shown while a widget is still being fetched
+  const renderWidget = (name) => {
+    if (dashboardData[name] === undefined) {
+      return (
+        <div className="flex justify-content-center align-items-center" style={{ height: '200px' }}>
+          <ProgressSpinner style={{ width: '40px', height: '40px' }} />
+        </div>
+      );
+    }
+    return <PlotlyFragment html={dashboardData[name]} plotlyJs={plotlyJs} />;
+  };
+
   // Access summary statistics
   const { summary_stats } = dashboardData;
 
@@ -59,80 +101,92 @@ const Dashboard = () => {
     <div className="grid">
       <div className="col-12">
         <h1 className="mb-4">Spending Dashboard</h1>
+        {stale && (
+          <Message severity="info" text="New transactions are being processed. Showing the previous results until the update finishes." className="w-full mb-3" />
+        )}
       </div>
 
       {/* Summary Stats */}
-      <div className="col-12 grid">
-        <div className="col-12 md:col-6 lg:col-3">
-          <Card className="stat-card">
-            <div className="title">Total Income</div>
-            <div className="value">{formatCurrency(summary_stats.total_income)}</div>
-          </Card>
-        </div>
-        <div className="col-12 md:col-6 lg:col-3">
-          <Card className="stat-card">
-            <div className="title">Total Expenses</div>
-            <div className="value">{formatCurrency(summary_stats.total_expenses)}</div>
-          </Card>
+      {summary_stats && (
+        <div className="col-12 grid">
+          <div className="col-12 md:col-6 lg:col-3">
+            <Card className="stat-card">
+              <div className="title">Total Income</div>
+              <div className="value">{formatCurrency(summary_stats.total_income)}</div>
+            </Card>
+          </div>
+          <div className="col-12 md:col-6 lg:col-3">
+            <Card className="stat-card">
+              <div className="title">Total Expenses</div>
+              <div className="value">{formatCurrency(summary_stats.total_expenses)}</div>
+            </Card>
+          </div>
+          <div className="col-12 md:col-6 lg:col-3">
+            <Card className="stat-card">
+              <div className="title">Savings</div>
+              <div className="value">{formatCurrency(summary_stats.savings)}</div>
+            </Card>
+          </div>
+          <div className="col-12 md:col-6 lg:col-3">
+            <Card className="stat-card">
+              <div className="title">Savings Rate</div>
+              <div className="value">{summary_stats.savings_rate}%</div>
+            </Card>
+          </div>
         </div>
-        <div className="col-12 md:col-6 lg:col-3">
-          <Card className="stat-card">
-            <div className="title">Savings</div>
-            <div className="value">{formatCurrency(summary_stats.savings)}</div>
-          </Card>
-        </div>
-        <div className="col-12 md:col-6 lg:col-3">
-          <Card className="stat-card">
-            <div className="title">Savings Rate</div>
-            <div className="value">{summary_stats.savings_rate}%</div>
-          </Card>
-        </div>
-      </div>
+      )}
 
       {/* Spending by Category */}
       <div className="col-12 md:col-6">
         <div className="chart-container">
           <h3>Spending by Category</h3>
-          <div dangerouslySetInnerHTML={{ __html: dashboardData.pie_chart }} />
+          {renderWidget('pie_chart')}
         </div>
       </div>
       <div className="col-12 md:col-6">
         <div className="chart-container">
           <h3>Monthly Expense Trends</h3>
-          <div dangerouslySetInnerHTML={{ __html: dashboardData.bar_chart }} />
+          {renderWidget('bar_chart')}
         </div>
       </div>
 
       {/* Forecasting */}
       <div className="col-12">
         <div className="chart-container">
-          <div dangerouslySetInnerHTML={{ __html: dashboardData.forecast }} />
+          {renderWidget('forecast')}
         </div>
       </div>
 
       {/* Income vs Expenses */}
       <div className="col-12">
         <div className="chart-container">
-          <div dangerouslySetInnerHTML={{ __html: dashboardData.income_vs_expenses }} />
+          {renderWidget('income_vs_expenses')}
         </div>
       </div>
 
       {/* Additional Charts */}
       <div className="col-12 md:col-6">
         <div className="chart-container">
-          <div dangerouslySetInnerHTML={{ __html: dashboardData.essential_ratio }} />
+          {renderWidget('essential_ratio')}
         </div>
       </div>
       <div className="col-12 md:col-6">
         <div className="chart-container">
-          <div dangerouslySetInnerHTML={{ __html: dashboardData.dining_vs_groceries }} />
+          {renderWidget('dining_vs_groceries')}
+        </div>
+      </div>
+
+      {/* Recurring Charges */}
+      <div className="col-12">
+        <div className="chart-container">
+          {renderWidget('recurring_charges')}
         </div>
       </div>
 
       {/* Transaction Table */}
       <div className="col-12">
         <div className="chart-container">
-          <div dangerouslySetInnerHTML={{ __html: dashboardData.transaction_table }} />
+          {renderWidget('transaction_table')}
         </div>
       </div>
     </div>
@@ -68,4 +68,56 @@ export const getDashboardData = async () => {
   return response.data;
 };
 
+// List of dashboard widgets that can be fetched independently
+export const getDashboardManifest = async () => {
+  if (!api.defaults.headers.common['X-API-Key']) {
+    throw new Error('API key not set. Please configure it in Settings.');
+  }
+
+  const response = await api.get('/dashboard/manifest');
+  return response.data;
+};
+
+// Fetch a single dashboard widget; resolves to { widget, data, stale }
+export const getDashboardWidget = async (name) => {
+  const response = await api.get(`/dashboard/${name}`);
+  return response.data;
+};
+
+// Absolute URL of a static asset served by the API (e.g. the shared plotly.js bundle)
+export const assetUrl = (path) => `${api.defaults.baseURL}${path}`;
+
+// Stream dashboard widgets over Server-Sent Events as the server finishes them.
+// EventSource can't send headers, so the stream is opened with a short-lived
+// token fetched with the API key; the key itself never goes in a URL.
+// Resolves to the EventSource.
+export const openDashboardStream = async (widgets, { onAssets, onWidget, onDone, onError }) => {
+  if (!api.defaults.headers.common['X-API-Key']) {
+    throw new Error('API key not set. Please configure it in Settings.');
+  }
+
+  const { data } = await api.post('/dashboard/stream/token');
+  const params = new URLSearchParams({ token: data.token, widgets: widgets.join(',') });
+  const source = new EventSource(`${api.defaults.baseURL}/dashboard/stream?${params}`);
+
+  source.addEventListener('assets', (event) => {
+    if (onAssets) onAssets(JSON.parse(event.data));
+  });
+  source.addEventListener('widget', (event) => onWidget(JSON.parse(event.data)));
+  source.addEventListener('widget-error', (event) => {
+    const { widget, error } = JSON.parse(event.data);
+    console.error(`Failed to build dashboard widget ${widget}:`, error);
+  });
+  source.addEventListener('done', () => {
+    source.close();
+    if (onDone) onDone();
+  });
+  source.onerror = (event) => {
+    source.close();
+    if (onError) onError(event);
+  };
+
+  return source;
+};
+
 export default api;